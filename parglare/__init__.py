@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 # flake8: NOQA
+import sys
 from parglare.parser import Parser, Token, pos_to_line_col, \
     Node, NodeTerm, NodeNonTerm
-from parglare.tables import LALR, SLR, SHIFT, REDUCE, ACCEPT
-from parglare.glr import GLRParser
+from parglare.tables import LALR, SLR, CANONICAL_LR, MINIMAL_LR, SHIFT, \
+    REDUCE, ACCEPT
 from parglare.grammar import Grammar, NonTerminal, Terminal, \
     RegExRecognizer, StringRecognizer, EMPTY, STOP
 from parglare.common import get_collector
@@ -11,3 +12,14 @@ from parglare.exceptions import ParserInitError, ParseError, GrammarError, \
     DisambiguationError
 
 from .version import __version__
+
+if sys.version_info < (3, 7):
+    from parglare.glr import GLRParser
+else:
+    def __getattr__(name):
+        # GLR parser is imported on the first use (PEP 562).
+        if name == 'GLRParser':
+            from parglare.glr import GLRParser
+            return GLRParser
+        raise AttributeError(
+            "module '{}' has no attribute '{}'".format(__name__, name))
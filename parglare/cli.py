@@ -3,7 +3,9 @@ import sys
 import click
 from parglare import Grammar, ParseError, GrammarError, GLRParser
 from parglare.export import grammar_pda_export
-from parglare.tables import create_load_table
+from parglare.tables import create_load_table, get_table_key, \
+    get_table_file_name
+from parglare.tables.persist import save_table
 from parglare.termui import prints, a_print, h_print
 import parglare.termui as t
 
@@ -30,15 +32,39 @@ def pglr(ctx, debug, no_colors, prefer_shifts, prefer_shifts_over_empty):
 
 @pglr.command()
 @click.argument('grammar_file', type=click.Path())
+@click.option('--binary', default=False, is_flag=True,
+              help="Save LR table in the binary format.")
+@click.option('--compressed', default=False, is_flag=True,
+              help="Save LR table in the compressed format.")
 @click.pass_context
-def compile(ctx, grammar_file):
+def compile(ctx, grammar_file, binary, compressed):
     debug = ctx.obj['debug']
     colors = ctx.obj['colors']
     prefer_shifts = ctx.obj['prefer_shifts']
     prefer_shifts_over_empty = ctx.obj['prefer_shifts_over_empty']
     h_print('Compiling...')
-    compile_get_grammar_table(grammar_file, debug, colors, prefer_shifts,
-                              prefer_shifts_over_empty)
+    grammar, table = compile_get_grammar_table(grammar_file, debug, colors,
+                                               prefer_shifts,
+                                               prefer_shifts_over_empty)
+    tables = [(table, 1, prefer_shifts, prefer_shifts_over_empty)]
+    if grammar.get_symbol('LAYOUT'):
+        # The table of the layout parser is created with the parameters used
+        # by the parser and saved to `<grammar>.LAYOUT.pgt`.
+        start_production = grammar.get_production_id('LAYOUT')
+        layout_table = create_load_table(
+            grammar, start_production=start_production, prefer_shifts=True,
+            prefer_shifts_over_empty=True, force_create=True, in_layout=True,
+            debug=debug)
+        tables.append((layout_table, start_production, True, True))
+    if binary or compressed:
+        for table, start_production, prefer_shifts, \
+                prefer_shifts_over_empty in tables:
+            key = get_table_key(
+                grammar, start_production=start_production,
+                prefer_shifts=prefer_shifts,
+                prefer_shifts_over_empty=prefer_shifts_over_empty)
+            save_table(get_table_file_name(grammar, start_production), table,
+                       binary=binary, compressed=compressed, key=key)
 
 
 @pglr.command()
@@ -1,97 +1,159 @@
 from parglare.grammar import EMPTY, NonTerminal
+from parglare.tables import LR_0, LR_1  # noqa: F401
+from parglare.tables.termset import get_terminal_index, TerminalSet
 
-LR_0 = 0
-LR_1 = 1
 
-
-def closure(state, itemset_type, first_sets=None):
+def closure(state, itemset_type, first_sets=None, closures=None):
     """
     For the given LRState calculates its LR(0)/LR(1) itemset closure.
 
+    Non-kernel items depend only on the non-terminals after the dot in the
+    kernel items so they are taken from memoized LR(0) closures. For LR(1)
+    itemsets only follow sets are calculated for each state.
+
     Args:
     state(LRState):
     itemset_type(int): LR_0 or LR_1
-    first_sets(dict of sets): Used in LR_1 itemsets calculation.
+    first_sets(dict of int): FIRST sets bitmasks used in LR_1 itemsets
+        calculation. If not given they are calculated.
+    closures(Closures): Memoized closures shared between states of the
+        grammar. If not given a new instance is created.
     """
     from parglare.tables import LRItem
 
-    while True:
+    if closures is None:
+        closures = Closures(state.grammar, first_sets)
 
-        has_additions = False
-        to_add = []
-        for item in state.items:
-            gs = item.symbol_at_position
-            if isinstance(gs, NonTerminal):
-                for p in state.grammar.productions:
-
-                    if p.symbol == gs:
-
-                        if itemset_type is LR_1:
-                            # Calculate follow set that is possible after the
-                            # non-terminal at the given position of the current
-                            # item.
-                            follow = _new_item_follow(item, first_sets)
-                            new_item = LRItem(p, 0, follow)
-                        else:
-                            new_item = LRItem(p, 0)
-
-                        if new_item not in state.items \
-                                and new_item not in to_add:
-
-                            # If the item doesn't exists yet add it.
-                            to_add.append(new_item)
-                            has_additions = True
-
-                        else:
-                            # If the item already exists, this newly created
-                            # item might still have a wider follows set. If so,
-                            # update with the current new item follows set if
-                            # we are building LR_1 items set.
-                            if itemset_type is LR_1:
-                                try:
-                                    existing_item = state.items[
-                                        state.items.index(new_item)]
-                                except ValueError:
-                                    existing_item = to_add[
-                                        to_add.index(new_item)]
-
-                                if not follow.issubset(existing_item.follow):
-                                    existing_item.follow.update(follow)
-                                    has_additions = True
-
-        if has_additions:
-            state.items.extend(to_add)
-        else:
-            break
-
-
-def _new_item_follow(item, first_sets):
-    """
-    Returns follow set of possible terminals after the item's current
-    non-terminal.
+    # Non-terminals after the dot in kernel items in the order of appearance.
+    symbols = []
+    for item in state.items:
+        if item.is_kernel:
+            symbol = item.symbol_at_position
+            if isinstance(symbol, NonTerminal) and symbol not in symbols:
+                symbols.append(symbol)
 
-    Args:
-    item (LRItem): The source item which is causing the creation of the
-        new item.
-    first_sets(dict of sets): The dict of set of first items keyed by
-        a grammar symbol.
-    """
+    productions = closures.productions(tuple(symbols))
 
-    new_follow = set()
-    for s in item.production.rhs[item.position + 1:]:
-        new_follow.update(first_sets[s])
-        if EMPTY not in new_follow:
-            # If EMPTY can't be derived at current position then we have found
-            # the whole follow set.
-            break
-        else:
-            # If the EMPTY is possible at current position in this loop we must
-            # continue to include firsts of the next grammar symbol. EMPTY
-            # can't be a member of the follow set.
-            new_follow.remove(EMPTY)
+    # Non-kernel items might exist if the closure is recalculated.
+    existing = {item.production.prod_id: item
+                for item in state.items if not item.is_kernel}
+    if existing:
+        items = [existing[p.prod_id] for p in productions]
     else:
-        # If the rest of production can be EMPTY we shall inherit all elements
-        # of the source item follow set.
-        new_follow.update(item.follow)
-
-    return new_follow
+        items = [LRItem(p, 0, TerminalSet(closures.index))
+                 for p in productions]
+        state.items.extend(items)
+
+    if itemset_type is LR_1:
+        # All items of the same non-terminal get the same follow
+        # contributions. Calculate follow sets of non-terminals and propagate
+        # them along non-kernel items whose rest of production can derive
+        # EMPTY. Follow sets of items may be shared with the kernel items of
+        # the next states (see LRItem.get_pos_inc) so the current follow set
+        # of each item is taken into account.
+        follows = {}
+        propagate = []
+        for item in state.items:
+            symbol, first, nullable = closures.item_follow(item.production,
+                                                           item.position)
+            if symbol is None:
+                continue
+            follow = follows.get(symbol, 0) | first
+            if nullable:
+                follow |= item.follow.bits
+                if not item.is_kernel:
+                    propagate.append((item.production.symbol, symbol))
+            follows[symbol] = follow
+
+        update = True
+        while update:
+            update = False
+            for from_symbol, to_symbol in propagate:
+                from_follow = follows[from_symbol]
+                to_follow = follows[to_symbol]
+                if from_follow & ~to_follow:
+                    follows[to_symbol] = to_follow | from_follow
+                    update = True
+
+        for item in items:
+            item.follow.bits |= follows[item.production.symbol]
+
+
+class Closures(object):
+    """
+    Memoized LR(0) closures of the grammar used in LR items set calculation.
+
+    Attributes:
+    grammar(Grammar):
+    index(TerminalIndex): Terminal ids used for terminal sets bitmasks.
+    first_sets(dict of int): FIRST sets bitmasks used in LR_1 itemsets
+        calculation.
+    productions_by_lhs(dict): Lists of grammar productions keyed by the LHS
+        non-terminal.
+    """
+    __slots__ = ['grammar', 'index', 'first_sets', 'productions_by_lhs',
+                 '_closures', '_item_follows']
+
+    def __init__(self, grammar, first_sets=None):
+        from parglare.tables import first_bits
+        self.grammar = grammar
+        self.index = get_terminal_index(grammar)
+        self.first_sets = first_bits(grammar) \
+            if first_sets is None else first_sets
+
+        self.productions_by_lhs = {}
+        for production in grammar.productions:
+            self.productions_by_lhs.setdefault(production.symbol, [])\
+                .append(production)
+
+        self._closures = {}
+        self._item_follows = {}
+
+    def productions(self, symbols):
+        """
+        Returns productions of non-kernel items for the given tuple of
+        non-terminals after the dot in kernel items. Productions are ordered
+        breadth-first by the non-terminal they are found for.
+        """
+        productions = self._closures.get(symbols)
+        if productions is None:
+            productions = []
+            symbols_queue = list(symbols)
+            for symbol in symbols_queue:
+                for production in self.productions_by_lhs.get(symbol, []):
+                    productions.append(production)
+                    if production.rhs:
+                        next_symbol = production.rhs[0]
+                        if isinstance(next_symbol, NonTerminal) \
+                                and next_symbol not in symbols_queue:
+                            symbols_queue.append(next_symbol)
+            self._closures[symbols] = productions
+        return productions
+
+    def item_follow(self, production, position):
+        """
+        For the item given by the production and the position returns a
+        tuple of the non-terminal after the dot (or None), the bitmask of
+        terminals that can follow it in the production and a flag if the
+        rest of production can derive EMPTY.
+        """
+        key = (production.prod_id, position)
+        item_follow = self._item_follows.get(key)
+        if item_follow is None:
+            rhs = production.rhs
+            symbol = rhs[position] if position < len(rhs) else None
+            if isinstance(symbol, NonTerminal):
+                empty = self.index.terminal_bits[EMPTY]
+                first = 0
+                nullable = True
+                for s in rhs[position + 1:]:
+                    first |= self.first_sets[s]
+                    if not first & empty:
+                        nullable = False
+                        break
+                    first &= ~empty
+                item_follow = (symbol, first, nullable)
+            else:
+                item_follow = (None, None, False)
+            self._item_follows[key] = item_follow
+        return item_follow
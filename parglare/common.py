@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import functools
 import sys
 from parglare.termui import s_attention as _a
 
@@ -180,6 +181,22 @@ def get_collector():
     return objects
 
 
+def cached(parse):
+    """
+    Decorator of the parser `parse` method which returns the results from the
+    parser `result_cache` if given (see `parglare.result_cache`).
+    """
+    @functools.wraps(parse)
+    def cached_parse(parser, input_str, position=0, file_name=None,
+                     extra=None):
+        cache = parser.result_cache
+        if cache is None or extra is not None or parser.error_recovery \
+                or parser.debug:
+            return parse(parser, input_str, position, file_name, extra)
+        return cache.parse(parse, parser, input_str, position, file_name)
+    return cached_parse
+
+
 def pos_to_line_col(input_str, position):
     """
     Returns position in the (line,column) form.
@@ -3,9 +3,8 @@ import codecs
 from itertools import takewhile
 from parglare import Parser
 from parglare import termui as t
-from .parser import SHIFT, REDUCE, ACCEPT, pos_to_line_col, Token
-from .common import replace_newlines as _, position_context
-from .export import dot_escape
+from .parser import SHIFT, REDUCE, ACCEPT, pos_to_line_col
+from .common import replace_newlines as _, position_context, cached
 from .termui import prints, h_print, a_print
 
 
@@ -29,6 +28,11 @@ class GLRParser(Parser):
     """
     def __init__(self, *args, **kwargs):
 
+        # Beam search. If the number of active heads at a shift level is
+        # bigger than max_heads, heads with the lowest score are dropped.
+        self.max_heads = kwargs.pop('max_heads', None)
+        self.head_score = kwargs.pop('head_score', None) or default_head_score
+
         table = kwargs.get('table', None)
         lexical_disambiguation = kwargs.get('lexical_disambiguation', None)
         if table is None:
@@ -62,6 +66,7 @@ class GLRParser(Parser):
         """
         pass
 
+    @cached
     def parse(self, input_str, position=0, file_name=None, extra=None):
         """
         Parses the given input string.
@@ -85,7 +90,6 @@ class GLRParser(Parser):
 
         # Error reporting and recovery
         self.errors = []
-        self.in_error_reporting = False
         self.expected = set()
         self.tokens_ahead = []
         self.last_shifted_heads = []
@@ -94,17 +98,35 @@ class GLRParser(Parser):
         # pending reductions). Used to perform reductions in a depth-first
         # manner.
         self.reducing_stack = []
-        # For optimization, keep only state ids for quick check before
-        # searching.
-        self.reducing_stack_states = []
+        # Index of the reducing stack. A multiset of heads on the reducing
+        # stack keyed by state id. Used for a quick check and search of loops
+        # without walking the whole stack.
+        self.reducing_stack_states = {}
 
         # Heads that are fully reduced and thus are candidates for the next
         # shifting or accepting. Fully reduced heads (heads without any pending
         # reduction) from reducing_stack are merged to these heads.
         self.reduced_heads = {}
 
+        # Layout and tokens recognized ahead keyed by position. Recognition
+        # depends only on the position so it is shared by all heads at the
+        # same position, i.e. each terminal is recognized only once.
+        self.layout_ahead = {}
+        self.tokens_ahead_cache = {}
+        self.share_lookaheads = False
+
         # Heads created during shift operations.
         self.shifted_heads = []
+        # Heads created at the current shift level keyed by state id.
+        self.shifted_heads_per_state = {}
+
+        # Number of active heads (reduced heads that are candidates for
+        # shifting) per shift level. Used for performance analysis.
+        self.active_heads_per_level = []
+        # The number of heads dropped due to max_heads limit during this
+        # parse. If greater than zero some of the possible parses might be
+        # lost. Also available on the returned results.
+        self.pruned_heads = 0
 
         # Accepted (finished) heads
         self.accepted_heads = []
@@ -120,40 +142,14 @@ class GLRParser(Parser):
 
         # The main loop
         while True:
-            if not self.in_error_reporting:
-                self.last_shifted_heads = list(self.shifted_heads)
+            self.last_shifted_heads = list(self.shifted_heads)
             self._do_reductions()
-            if self.in_error_reporting:
-                # Expected symbols are only those that can cause reduced head
-                # to shift.
-                self.expected = set([
-                    h.token_ahead.symbol for h in self.reduced_heads
-                    if h.token_ahead.symbol in h.state.actions
-                    and SHIFT in [action.action
-                                  for action
-                                  in h.state.actions[h.token_ahead.symbol]]])
+            self._do_shifts_accepts()
+            if not self.shifted_heads and not self.accepted_heads:
                 if self.debug:
-                    a_print("*** LEAVING ERROR REPORTING MODE.",
-                            new_line=True)
-                    h_print("Tokens expected:",
-                            ', '.join([t.name for t in self.expected]),
-                            level=1)
-                    h_print("Tokens found:", self.tokens_ahead, level=1)
-
-                self.reduced_heads = {}
-                self.in_error_reporting = False
-
-                # After leaving error reporting mode, register error and try
-                # recovery if enabled
-                context = self.last_shifted_heads[0]
-                self.errors.append(
-                    self._create_error(
-                        context, self.expected,
-                        tokens_ahead=self.tokens_ahead,
-                        symbols_before=list(
-                            {h.state.symbol
-                             for h in self.last_shifted_heads}),
-                        last_heads=self.last_shifted_heads))
+                    a_print("*** ERROR REPORTING.", new_line=True)
+                self._report_error()
+
                 if self.error_recovery:
                     if self.debug:
                         a_print("*** STARTING ERROR RECOVERY.",
@@ -169,25 +165,18 @@ class GLRParser(Parser):
                         break
                 else:
                     break
-            else:
-                self._do_shifts_accepts()
-                if not self.shifted_heads and not self.accepted_heads:
-                    if self.debug:
-                        a_print("*** ENTERING ERROR REPORTING MODE.",
-                                new_line=True)
-                    self._enter_error_reporting()
-                    continue
 
-                if not self.shifted_heads:
-                    break
+            if not self.shifted_heads:
+                break
 
         if self.debug and self.debug_trace:
             self._export_dot_trace()
 
         if self.accepted_heads:
             # Return results
-            results = [x.results for head in self.accepted_heads
-                       for x in head.parents]
+            results = GLRResults(x.results for head in self.accepted_heads
+                                 for x in head.parents)
+            results.pruned_heads = self.pruned_heads
             if self.debug:
                 a_print("*** {} sucessful parse(s).".format(len(results)))
 
@@ -208,43 +197,43 @@ class GLRParser(Parser):
             a_print("** REDUCING", new_line=True)
             self._debug_active_heads(self.shifted_heads)
 
-        if not self.in_error_reporting:
-            # First we shall find lookaheads for all shifted heads and split
-            # heads on lexical ambiguity.
-            shifted_heads = []
-            while self.shifted_heads:
-                head = self.shifted_heads.pop()
-                if head.token_ahead is not None:
-                    # This might happen if this head is produced by error
-                    # recovery
-                    shifted_heads.append(head)
-                    continue
+        # First we shall find lookaheads for all shifted heads and split
+        # heads on lexical ambiguity.
+        self.layout_ahead = {}
+        self.tokens_ahead_cache = {}
+        # Sharing pays off only if there are multiple heads.
+        self.share_lookaheads = len(self.shifted_heads) > 1
+        shifted_heads = []
+        while self.shifted_heads:
+            head = self.shifted_heads.pop()
+            if head.token_ahead is not None:
+                # This might happen if this head is produced by error
+                # recovery
+                shifted_heads.append(head)
+                continue
 
-                if debug:
-                    h_print("Finding lookaheads", new_line=True)
-                self._skipws(head, self.input_str)
+            if debug:
+                h_print("Finding lookaheads", new_line=True)
+            self._skipws(head, self.input_str)
 
-                tokens = self._next_tokens(head)
+            tokens = self._next_tokens(head)
 
+            if debug:
+                self._debug_context(
+                    head.position,
+                    head.layout_content_ahead,
+                    lookahead_tokens=tokens,
+                    expected_symbols=head.state.actions.keys())
+
+            if tokens:
+                while tokens:
+                    # For lexical ambiguity create a new head for each new
+                    # token recognized ahead.
+                    shifted_heads.append(head.for_token(tokens.pop()))
+            else:
+                # Can't find lookahead. This head can't progress
                 if debug:
-                    self._debug_context(
-                        head.position,
-                        head.layout_content_ahead,
-                        lookahead_tokens=tokens,
-                        expected_symbols=head.state.actions.keys())
-
-                if tokens:
-                    while tokens:
-                        # For lexical ambiguity create a new head for each new
-                        # token recognized ahead.
-                        shifted_heads.append(head.for_token(tokens.pop()))
-                else:
-                    # Can't find lookahead. This head can't progress
-                    if debug:
-                        h_print('No lookaheads found. Killing head.')
-
-        else:
-            shifted_heads = self.shifted_heads
+                    h_print('No lookaheads found. Killing head.')
 
         while shifted_heads:
             head = shifted_heads.pop()
@@ -260,7 +249,10 @@ class GLRParser(Parser):
                 # No more reduction for top of the stack head.
                 # Pop of the stack and merge to reduced heads.
                 head = self.reducing_stack.pop()[0]
-                self.reducing_stack_states.pop()
+                state_heads = self.reducing_stack_states[head.state.state_id]
+                state_heads.pop()
+                if not state_heads:
+                    del self.reducing_stack_states[head.state.state_id]
                 if self.debug:
                     h_print('No more reductions for head:', str(head),
                             level=1, new_line=True)
@@ -272,6 +264,26 @@ class GLRParser(Parser):
                 else:
                     reduced_head.merge_head(head, self)
 
+    def _layout_cache(self):
+        """
+        Layout ahead depends only on the position so, if there are multiple
+        heads, it is calculated once for all heads at the same position.
+        """
+        return self.layout_ahead if self.share_lookaheads else None
+
+    def _tokens_cache(self, position):
+        """
+        Recognition results depend only on the terminal and the position so,
+        if there are multiple heads, they are cached and shared by all heads
+        at the same position.
+        """
+        if not self.share_lookaheads:
+            return None
+        cache = self.tokens_ahead_cache.get(position)
+        if cache is None:
+            cache = self.tokens_ahead_cache[position] = {}
+        return cache
+
     def _do_shifts_accepts(self):
         """
         Do shifts and accepts of the reduced heads
@@ -282,6 +294,11 @@ class GLRParser(Parser):
             a_print("** SHIFTING", new_line=True)
             self._debug_active_heads(self.reduced_heads.values())
 
+        self.active_heads_per_level.append(len(self.reduced_heads))
+        if self.max_heads and len(self.reduced_heads) > self.max_heads:
+            self._prune_heads()
+
+        self.shifted_heads_per_state = {}
         while self.reduced_heads:
             head, __ = self.reduced_heads.popitem()
             actions = head.state.actions.get(head.token_ahead.symbol)
@@ -299,6 +316,20 @@ class GLRParser(Parser):
                 else:
                     self._shift(head, action.state)
 
+    def _prune_heads(self):
+        """
+        Keep only max_heads reduced heads with the highest score.
+        """
+        heads = list(self.reduced_heads)
+        keep = set(id(h) for h in sorted(heads, key=self.head_score,
+                                         reverse=True)[:self.max_heads])
+        self.reduced_heads = {h: h for h in heads if id(h) in keep}
+        self.pruned_heads += len(heads) - len(keep)
+
+        if self.debug:
+            a_print("Active heads limit reached. Pruned {} head(s)."
+                    .format(len(heads) - len(keep)), new_line=True)
+
     def _prepare_reductions(self, head):
         """
         Finds all possible reduction for the given head and make a new stack
@@ -329,13 +360,16 @@ class GLRParser(Parser):
             prod_len = len(production.rhs)
             if prod_len == 0:
                 # Special case, empty reduction
-                reductions.append((head, production, [],
+                reductions.append((head, production, None,
                                    head.position, head.position))
             else:
                 # Find roots of possible reductions by going backwards for
                 # prod_len steps following all possible paths. Collect
-                # subresults along the way to be used with semantic actions
-                to_process = [(head, [], prod_len, None)]
+                # subresults along the way to be used with semantic actions.
+                # Subresults are collected in a linked list of (result, tail)
+                # pairs so that paths can share their common suffix. Lists
+                # are materialized only when reduction is executed.
+                to_process = [(head, None, prod_len, None)]
                 if debug:
                     h_print("Calculate reduction paths of length {}:"
                             .format(prod_len), level=1)
@@ -362,7 +396,7 @@ class GLRParser(Parser):
                         if debug:
                             h_print("", str(parent.head), level=3)
 
-                        new_results = [parent.results] + results
+                        new_results = (parent.results, results)
 
                         if first_parent is None:
                             first_parent = parent
@@ -391,7 +425,8 @@ class GLRParser(Parser):
                                 reductions,
                                 level=1)
         self.reducing_stack.append((head, reductions))
-        self.reducing_stack_states.append(head.state.state_id)
+        self.reducing_stack_states.setdefault(head.state.state_id, [])\
+            .append(head)
 
     def _reduce(self, head, reduction):
         """
@@ -400,6 +435,7 @@ class GLRParser(Parser):
 
         root_head, production, results, \
             start_position, end_position = reduction
+        results = subresults_to_list(results)
         if start_position is None:
             start_position = end_position = root_head.position
         state = root_head.state.gotos[production.symbol]
@@ -435,14 +471,16 @@ class GLRParser(Parser):
             # rejecting cyclic reductions for non-empty reductions.
             if self.debug:
                 h_print('Check loops. Reduce stack states:',
-                        self.reducing_stack_states,
+                        list(self.reducing_stack_states),
                         level=1)
-            if new_head.state.state_id in self.reducing_stack_states:
+            state_heads = self.reducing_stack_states.get(
+                new_head.state.state_id)
+            if state_heads:
                 if root_head.shift_level == new_head.shift_level:
                     # Empty reduction. If we already have this on the reduce
                     # stack we shall make a GSS loop and remove this head from
                     # further reductions.
-                    for shead, __ in reversed(self.reducing_stack):
+                    for shead in reversed(state_heads):
                         if new_head == shead:
                             # If found we shall make a GSS loop only if the
                             # reduction is empty.
@@ -465,7 +503,7 @@ class GLRParser(Parser):
                     # Non-empty reduction If the same state has been reduced,
                     # we have looping by cyclic grammar and should report and
                     # reject invalid state.
-                    for shead, __ in reversed(self.reducing_stack):
+                    for shead in reversed(state_heads):
                         if new_head == shead \
                                 and root_head == shead.parents[0].parent:
                             if self.debug:
@@ -480,6 +518,7 @@ class GLRParser(Parser):
             if self.debug:
                 a_print("New head: ", new_head, level=1, new_line=True)
                 if self.debug_trace:
+                    from .export import dot_escape
                     self._trace_head(new_head)
                     self._trace_step(head, new_head, root_head,
                                      "R:{}".format(dot_escape(production)))
@@ -497,12 +536,7 @@ class GLRParser(Parser):
             a_print("{}. SHIFTING head: ".format(self.debug_step), head,
                     new_line=True)
 
-        for shifted_head in self.shifted_heads:
-            if shifted_head.state is to_state:
-                break
-        else:
-            shifted_head = None
-
+        shifted_head = self.shifted_heads_per_state.get(to_state.state_id)
         if shifted_head:
             # If this token has already been shifted connect
             # shifted head to this head.
@@ -517,6 +551,7 @@ class GLRParser(Parser):
 
                 shifted_head.create_link(parent)
                 if debug and self.debug_trace:
+                    from .export import dot_escape
                     token = head.token_ahead
                     self._trace_step(head, shifted_head, head,
                                      "S:{}({})".format(
@@ -546,6 +581,7 @@ class GLRParser(Parser):
                     token = head.token_ahead
                     a_print("New shifted head ", new_head, level=1)
                     if self.debug_trace:
+                        from .export import dot_escape
                         self._trace_head(new_head)
                         self._trace_step(head, new_head, head,
                                          "S:{}({})".format(
@@ -554,8 +590,9 @@ class GLRParser(Parser):
 
                 new_head.create_link(parent)
                 self.shifted_heads.append(new_head)
+                self.shifted_heads_per_state[to_state.state_id] = new_head
 
-    def _enter_error_reporting(self):
+    def _report_error(self):
         """
         To correctly report what is found ahead and what is expected we shall:
 
@@ -563,16 +600,14 @@ class GLRParser(Parser):
               in the input by the active heads.  This will be part of the error
               report (what is found ahead if anything can be recognized).
 
-            - for all last reducing heads, simulate parsing for each of
-              possible lookaheads in the head's state until either SHIFT or
-              ACCEPT is successfuly executed.  Collect each possible lookahead
-              where this is achieved for reporting.  This will be another part
-              of the error report (what is expected).
+            - for all last heads at the farthest position, find each of
+              possible lookaheads in the head's state which leads to SHIFT,
+              possibly after a sequence of reductions. This will be another
+              part of the error report (what is expected).
 
+        The error is registered in the parser errors list.
         """
 
-        self.in_error_reporting = True
-
         # Start with the last shifted heads sorted by position.
         self.last_shifted_heads.sort(key=lambda h: h.position, reverse=True)
         last_head = self.last_shifted_heads[0]
@@ -582,10 +617,77 @@ class GLRParser(Parser):
 
         self.tokens_ahead = self._get_all_possible_tokens_ahead(last_head)
 
+        if not self.table.expected_symbols_calculated:
+            self.table.calc_expected_symbols()
+
+        expected = set()
         for head in farthest_heads:
-            for possible_lookahead in head.state.actions.keys():
-                h = head.for_token(Token(possible_lookahead, []))
-                self.shifted_heads.append(h)
+            for symbol in head.state.possible_symbols:
+                if symbol not in expected \
+                        and self._leads_to_shift(head, symbol):
+                    expected.add(symbol)
+        self.expected = expected
+
+        if self.debug:
+            h_print("Tokens expected:",
+                    ', '.join([t.name for t in self.expected]),
+                    level=1)
+            h_print("Tokens found:", self.tokens_ahead, level=1)
+
+        self.errors.append(
+            self._create_error(
+                last_head, self.expected,
+                tokens_ahead=self.tokens_ahead,
+                symbols_before=list(
+                    {h.state.symbol
+                     for h in self.last_shifted_heads}),
+                last_heads=self.last_shifted_heads))
+
+    def _leads_to_shift(self, head, symbol):
+        """
+        Checks if the given lookahead symbol would be shifted, possibly after
+        a sequence of reductions, from the given head.
+
+        Reductions are simulated using only LR states. The states pushed by
+        the simulated reductions are kept on a virtual stack on top of the GSS
+        node where the last reduction is rooted.
+        """
+        if symbol in head.state.expected_symbols:
+            return True
+
+        max_stack = len(self.table.states)
+        visited = set()
+        to_process = [((), head)]
+        while to_process:
+            stack, node = to_process.pop()
+            state = stack[-1] if stack else node.state
+            if symbol in state.expected_symbols:
+                return True
+            if symbol not in state.possible_symbols:
+                continue
+            for action in state.actions[symbol]:
+                if action.action is not REDUCE:
+                    continue
+                production = action.prod
+                length = len(production.rhs)
+                if length <= len(stack):
+                    stack_rest = stack[:len(stack) - length]
+                    roots = [(stack_rest, node)]
+                else:
+                    # Go backwards through the GSS following all paths.
+                    nodes = [node]
+                    for i in range(length - len(stack)):
+                        nodes = [p.parent for n in nodes for p in n.parents]
+                    roots = [((), n) for n in nodes]
+                for stack_rest, root in roots:
+                    root_state = stack_rest[-1] if stack_rest else root.state
+                    new_stack = stack_rest \
+                        + (root_state.gotos[production.symbol],)
+                    key = (tuple(s.state_id for s in new_stack), id(root))
+                    if key not in visited and len(new_stack) <= max_stack:
+                        visited.add(key)
+                        to_process.append((new_stack, root))
+        return False
 
     def _do_recovery(self):
         """
@@ -638,8 +740,11 @@ class GLRParser(Parser):
         """
         del self.reduced_heads
         del self.shifted_heads
+        del self.shifted_heads_per_state
         del self.reducing_stack
         del self.reducing_stack_states
+        del self.layout_ahead
+        del self.tokens_ahead_cache
         del self.last_shifted_heads
 
     def _debug_active_heads(self, heads):
@@ -679,6 +784,7 @@ class GLRParser(Parser):
 
     @no_colors
     def _trace_head(self, head):
+        from .export import dot_escape
         self.dot_trace += '{} [label="{}:{}"];\n'\
             .format(head.key, head.state.state_id,
                     dot_escape(head.state.symbol.name))
@@ -724,6 +830,42 @@ class GLRParser(Parser):
         h_print("dot -Tpdf {0} -O {0}.pdf".format(file_name))
 
 
+def subresults_to_list(subresults):
+    """
+    Materialize the linked list of (result, tail) pairs built during
+    reduction paths calculation.
+    """
+    results = []
+    while subresults is not None:
+        result, subresults = subresults
+        results.append(result)
+    return results
+
+
+class GLRResults(list):
+    """
+    A list of GLR parse results.
+
+    Attributes:
+    pruned_heads(int): The number of heads dropped due to max_heads limit
+        during the parse. If greater than zero some of the possible parses
+        might be lost.
+    """
+    pruned_heads = 0
+
+
+def default_head_score(head):
+    """
+    The default scoring function used for pruning of active heads. Heads
+    reached by higher priority productions/terminals are preferred. For the
+    same priority, heads with more trees are preferred.
+    """
+    prior = max((p.production.prior if p.production is not None
+                 else p.token.symbol.prior for p in head.parents),
+                default=0)
+    return prior, head.number_of_trees
+
+
 class GSSNodeParent(object):
     """
     A link to the parent node in GSS stack.
@@ -794,7 +936,7 @@ class GSSNode(object):
     """
     __slots__ = ['parser', 'node_id', 'state', 'position', 'shift_level',
                  'parents', 'number_of_trees', 'token_ahead',
-                 'layout_content_ahead', '_hash']
+                 'layout_content_ahead', '_shared_parents']
 
     def __init__(self, parser, state, position, shift_level, number_of_trees=0,
                  token=None, token_ahead=None):
@@ -808,6 +950,9 @@ class GSSNode(object):
         self.layout_content_ahead = ''
 
         self.parents = []
+        # Lexical ambiguity clones share the parents list until one of them
+        # needs to change it.
+        self._shared_parents = False
         self.number_of_trees = number_of_trees
 
     def merge_head(self, other, parser):
@@ -819,6 +964,8 @@ class GSSNode(object):
         self.number_of_trees += other.number_of_trees
         for p in other.parents:
             p.head = self
+        if self._shared_parents:
+            self._unshare_parents()
         self.parents.extend(other.parents)
 
         if parser.debug:
@@ -826,6 +973,8 @@ class GSSNode(object):
             h_print("to head", self, level=1)
 
     def create_link(self, parent):
+        if self._shared_parents:
+            self._unshare_parents()
         self.parents.append(parent)
         self.number_of_trees = parent.parent.number_of_trees
         if self.parser.debug:
@@ -850,9 +999,15 @@ class GSSNode(object):
             new_head = GSSNode(self.parser, self.state, self.position,
                                self.shift_level, self.number_of_trees,
                                token_ahead=token)
-            new_head.parents = list(self.parents)
+            new_head.layout_content_ahead = self.layout_content_ahead
+            new_head.parents = self.parents
+            new_head._shared_parents = self._shared_parents = True
             return new_head
 
+    def _unshare_parents(self):
+        self.parents = list(self.parents)
+        self._shared_parents = False
+
     def __eq__(self, other):
         """
         Stack nodes are equal if they are on the same position in the same
@@ -879,7 +1034,9 @@ class GSSNode(object):
         return str(self)
 
     def __hash__(self):
-        return hash((self.node_id, self.token_ahead.symbol))
+        # Token ahead is not hashed as it is assigned lazily and reassigned
+        # by error recovery. It is compared in __eq__.
+        return hash(self.node_id)
 
     @property
     def key(self):
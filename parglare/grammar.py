@@ -436,6 +436,10 @@ class PGFile(object):
     grammar (PGFile): A root/grammar file.
     recognizers (dict of callables): A dict of Python callables used as a
         terminal recognizers.
+    actions_file (str): A full path of the actions file if it exists.
+    recognizers_file (str): A full path of the recognizers file if it exists.
+    file_recognizers (dict of callables): Recognizers loaded from the
+        recognizers file keyed by the name given in the file.
     """
     def __init__(self, productions, terminals=None, classes=None, imports=None,
                  file_path=None, grammar=None, recognizers=None,
@@ -449,6 +453,9 @@ class PGFile(object):
         self.imported_with = imported_with
         self.recognizers = recognizers
         self.actions = {}
+        self.actions_file = None
+        self.recognizers_file = None
+        self.file_recognizers = {}
 
         self.collect_and_unify_symbols()
 
@@ -473,6 +480,37 @@ class PGFile(object):
         self.load_actions()
         self.load_recognizers()
 
+    @classmethod
+    def from_snapshot(cls, file_path=None, grammar=None, imported_with=None):
+        """
+        Creates a grammar file without rules which are filled in from the
+        grammar snapshot (see `parglare.snapshot`). If `grammar` is not given
+        the file is the root file, i.e. `cls` must be `Grammar`. Actions and
+        recognizers files of the grammar file are loaded but recognizers are
+        not connected to the terminals.
+        """
+        pgfile = cls.__new__(cls)
+        if grammar is None:
+            pgfile.imported_files = {}
+            pgfile._no_check_recognizers = False
+        pgfile.productions = []
+        pgfile.terminals = {}
+        pgfile.classes = {}
+        pgfile.grammar = pgfile if grammar is None else grammar
+        pgfile.file_path = path.realpath(file_path) if file_path else None
+        pgfile.imported_with = imported_with
+        pgfile.recognizers = None
+        pgfile.actions = {}
+        pgfile.actions_file = None
+        pgfile.recognizers_file = None
+        pgfile.file_recognizers = {}
+        pgfile.imports = {}
+        if pgfile.file_path:
+            pgfile.grammar.imported_files[pgfile.file_path] = pgfile
+        pgfile.load_actions()
+        pgfile.load_recognizers_file()
+        return pgfile
+
     def collect_and_unify_symbols(self):
         """Collect non-terminals and terminals (both explicit and implicit/inline)
         defined in this file and make sure there is only one instance for each
@@ -577,11 +615,36 @@ class PGFile(object):
                         message='Actions file "{}" must have "action" '
                         'decorator defined.'.format(actions_file))
                 self.actions = actions_module.action.all
+                self.actions_file = actions_file
 
     def load_recognizers(self):
         """Load recognizers from <grammar_name>_recognizers.py. Override
         with provided recognizers.
 
+        """
+        self.load_recognizers_file()
+        recognizers_file = self.recognizers_file
+        for recognizer_name, recognizer in self.file_recognizers.items():
+            symbol = self.resolve_symbol_by_name(
+                recognizer_name,
+                location=Location(file_name=recognizers_file))
+            if symbol is None:
+                raise GrammarError(
+                    location=Location(file_name=recognizers_file),
+                    message='Recognizer given for unknown '
+                    'terminal "{}".'.format(recognizer_name)
+                )
+            if not isinstance(symbol, Terminal):
+                raise GrammarError(
+                    location=Location(file_name=recognizers_file),
+                    message='Recognizer given for non-terminal "{}".'
+                    .format(recognizer_name))
+            symbol.recognizer = recognizer
+
+    def load_recognizers_file(self):
+        """Load recognizers from <grammar_name>_recognizers.py to
+        `file_recognizers` without connecting them to the terminals.
+
         """
         if self.file_path:
             recognizers_file = path.join(
@@ -595,24 +658,8 @@ class PGFile(object):
                     if self.imported_with is not None else "")
                 mod_recognizers = load_python_module(mod_name,
                                                      recognizers_file)
-                recognizers = mod_recognizers.recognizer.all
-
-                for recognizer_name, recognizer in recognizers.items():
-                    symbol = self.resolve_symbol_by_name(
-                        recognizer_name,
-                        location=Location(file_name=recognizers_file))
-                    if symbol is None:
-                        raise GrammarError(
-                            location=Location(file_name=recognizers_file),
-                            message='Recognizer given for unknown '
-                            'terminal "{}".'.format(recognizer_name)
-                        )
-                    if not isinstance(symbol, Terminal):
-                        raise GrammarError(
-                            location=Location(file_name=recognizers_file),
-                            message='Recognizer given for non-terminal "{}".'
-                            .format(recognizer_name))
-                    symbol.recognizer = recognizer
+                self.recognizers_file = recognizers_file
+                self.file_recognizers = mod_recognizers.recognizer.all
 
     def resolve_ref(self, symbol_ref, first_pass=False):
         """Resolves given symbol reference.
@@ -740,13 +787,7 @@ class PGFile(object):
                                     Production(symbol,
                                                ProductionRHS([EMPTY]))])
 
-                def action(_, nodes):
-                    if nodes:
-                        return nodes[0]
-                    else:
-                        return []
-
-                symbol.grammar_action = action
+                symbol.grammar_action = zero_or_more_action
 
                 self.register_symbol(symbol)
 
@@ -1215,6 +1256,16 @@ def create_productions_terminals(productions):
     return gp, list(inline_terminals.values())
 
 
+def zero_or_more_action(_, nodes):
+    """
+    Grammar action of the zero or more (`*`) multiplicity symbols.
+    """
+    if nodes:
+        return nodes[0]
+    else:
+        return []
+
+
 def make_multiplicity_name(symbol_name, multiplicity=None,
                            separator_name=None):
     if multiplicity is None or multiplicity == MULT_ONE:
@@ -1251,235 +1302,304 @@ class GrammarContext:
 
 # Grammar for grammars
 
-(PGFILE,
- IMPORTS,
- IMPORT,
- PRODUCTION_RULES,
- PRODUCTION_RULE,
- PRODUCTION_RULE_WITH_ACTION,
- PRODUCTION_RULE_RHS,
- PRODUCTION,
- TERMINAL_RULES,
- TERMINAL_RULE,
- TERMINAL_RULE_WITH_ACTION,
- PROD_META_DATA,
- PROD_META_DATAS,
- TERM_META_DATA,
- TERM_META_DATAS,
- USER_META_DATA,
- CONST,
-
- ASSIGNMENT,
- ASSIGNMENTS,
- PLAIN_ASSIGNMENT,
- BOOL_ASSIGNMENT,
-
- GSYMBOL_REFERENCE,
- OPT_REP_OPERATOR,
- REP_OPERATOR_ZERO,
- REP_OPERATOR_ONE,
- REP_OPERATOR_OPTIONAL,
- OPT_REP_MODIFIERS_EXP,
- OPT_REP_MODIFIERS,
- OPT_REP_MODIFIER,
-
- GSYMBOL,
- RECOGNIZER,
- LAYOUT,
- LAYOUT_ITEM,
- COMMENT,
- CORNC,
- CORNCS) = [NonTerminal(name) for name in [
-     'PGFile',
-     'Imports',
-     'Import',
-     'ProductionRules',
-     'ProductionRule',
-     'ProductionRuleWithAction',
-     'ProductionRuleRHS',
-     'Production',
-     'TerminalRules',
-     'TerminalRule',
-     'TerminalRuleWithAction',
-     'ProductionMetaData',
-     'ProductionMetaDatas',
-     'TerminalMetaData',
-     'TerminalMetaDatas',
-     'UserMetaData',
-     'Const',
-
-     'Assignment',
-     'Assignments',
-     'PlainAssignment',
-     'BoolAssignment',
-
-     'GrammarSymbolReference',
-     'OptRepeatOperator',
-     'RepeatOperatorZero',
-     'RepeatOperatorOne',
-     'RepeatOperatorOptional',
-     'OptionalRepeatModifiersExpression',
-     'OptionalRepeatModifiers',
-     'OptionalRepeatModifier',
-
-     'GrammarSymbol',
-     'Recognizer',
-     'LAYOUT',
-     'LAYOUT_ITEM',
-     'Comment',
-     'CORNC',
-     'CORNCS']]
-
-pg_terminals = \
-    (NAME,
-     REGEX_TERM,
-     INT_CONST,
-     FLOAT_CONST,
-     BOOL_CONST,
-     STR_CONST,
-     ACTION,
-     WS,
-     COMMENTLINE,
-     NOTCOMMENT) = [Terminal(name, RegExRecognizer(regex)) for name, regex in
-                    [
-                        ('Name', r'[a-zA-Z_][a-zA-Z0-9_\.]*'),
-                        ('RegExTerm', r'\/(\\.|[^\/\\])*\/'),
-                        ('IntConst', r'\d+'),
-                        ('FloatConst',
-                         r'''[+-]?(\d+\.\d*|\.\d+)([eE][+-]?\d+)?(?<=[\w\.])(?![\w\.])'''),  # noqa
-                        ('BoolConst', r'true|false'),
-                        ('StrConst', r'''(?s)('[^'\\]*(?:\\.[^'\\]*)*')|'''
-                         r'''("[^"\\]*(?:\\.[^"\\]*)*")'''),
-                        ('Action', r'@[a-zA-Z0-9_]+'),
-                        ('WS', r'\s+'),
-                        ('CommentLine', r'\/\/.*'),
-                        ('NotComment', r'((\*[^\/])|[^\s*\/]|\/[^\*])+'),
-                    ]]
-
-pg_productions = [
-    [PGFILE, [PRODUCTION_RULES]],
-    [PGFILE, [IMPORTS, PRODUCTION_RULES]],
-    [PGFILE, [PRODUCTION_RULES, 'terminals', TERMINAL_RULES]],
-    [PGFILE, [IMPORTS, PRODUCTION_RULES, 'terminals', TERMINAL_RULES]],
-    [PGFILE, ['terminals', TERMINAL_RULES]],
-    [IMPORTS, [IMPORTS, IMPORT]],
-    [IMPORTS, [IMPORT]],
-    [IMPORT, ['import', STR_CONST, ';']],
-    [IMPORT, ['import', STR_CONST, 'as', NAME, ';']],
-    [PRODUCTION_RULES, [PRODUCTION_RULES, PRODUCTION_RULE_WITH_ACTION]],
-    [PRODUCTION_RULES, [PRODUCTION_RULE_WITH_ACTION]],
-
-    [PRODUCTION_RULE_WITH_ACTION, [ACTION, PRODUCTION_RULE]],
-    [PRODUCTION_RULE_WITH_ACTION, [PRODUCTION_RULE]],
-    [PRODUCTION_RULE, [NAME, ':', PRODUCTION_RULE_RHS, ';']],
-    [PRODUCTION_RULE, [NAME, '{', PROD_META_DATAS, '}', ':',
-                       PRODUCTION_RULE_RHS, ';']],
-    [PRODUCTION_RULE_RHS, [PRODUCTION_RULE_RHS, '|', PRODUCTION],
-     ASSOC_LEFT, 5],
-    [PRODUCTION_RULE_RHS, [PRODUCTION], ASSOC_LEFT, 5],
-    [PRODUCTION, [ASSIGNMENTS]],
-    [PRODUCTION, [ASSIGNMENTS, '{', PROD_META_DATAS, '}']],
-
-    [TERMINAL_RULES, [TERMINAL_RULES, TERMINAL_RULE_WITH_ACTION]],
-    [TERMINAL_RULES, [TERMINAL_RULE_WITH_ACTION]],
-    [TERMINAL_RULE_WITH_ACTION, [ACTION, TERMINAL_RULE]],
-    [TERMINAL_RULE_WITH_ACTION, [TERMINAL_RULE]],
-    [TERMINAL_RULE, [NAME, ':', RECOGNIZER, ';'], ASSOC_LEFT, 15],
-    [TERMINAL_RULE, [NAME, ':', ';'], ASSOC_LEFT, 15],
-    [TERMINAL_RULE, [NAME, ':', RECOGNIZER, '{', TERM_META_DATAS, '}', ';'],
-     ASSOC_LEFT, 15],
-    [TERMINAL_RULE, [NAME, ':', '{', TERM_META_DATAS, '}', ';'],
-     ASSOC_LEFT, 15],
-
-    [PROD_META_DATA, ['left']],
-    [PROD_META_DATA, ['reduce']],
-    [PROD_META_DATA, ['right']],
-    [PROD_META_DATA, ['shift']],
-    [PROD_META_DATA, ['dynamic']],
-    [PROD_META_DATA, ['nops']],   # no prefer shifts
-    [PROD_META_DATA, ['nopse']],  # no prefer shifts over empty
-    [PROD_META_DATA, [INT_CONST]],  # priority
-    [PROD_META_DATA, [USER_META_DATA]],
-    [PROD_META_DATAS, [PROD_META_DATAS, ',', PROD_META_DATA], ASSOC_LEFT],
-    [PROD_META_DATAS, [PROD_META_DATA]],
-
-    [TERM_META_DATA, ['prefer']],
-    [TERM_META_DATA, ['finish']],
-    [TERM_META_DATA, ['nofinish']],
-    [TERM_META_DATA, ['dynamic']],
-    [TERM_META_DATA, [INT_CONST]],  # priority
-    [TERM_META_DATA, [USER_META_DATA]],
-    [TERM_META_DATAS, [TERM_META_DATAS, ',', TERM_META_DATA]],
-    [TERM_META_DATAS, [TERM_META_DATA]],
-
-    # User custom meta-data
-    [USER_META_DATA, [NAME, ':', CONST]],
-    [CONST, [INT_CONST]],
-    [CONST, [FLOAT_CONST]],
-    [CONST, [BOOL_CONST]],
-    [CONST, [STR_CONST]],
-
-    # Assignments
-    [ASSIGNMENT, [PLAIN_ASSIGNMENT]],
-    [ASSIGNMENT, [BOOL_ASSIGNMENT]],
-    [ASSIGNMENT, [GSYMBOL_REFERENCE]],
-    [ASSIGNMENTS, [ASSIGNMENTS, ASSIGNMENT]],
-    [ASSIGNMENTS, [ASSIGNMENT]],
-    [PLAIN_ASSIGNMENT, [NAME, '=', GSYMBOL_REFERENCE]],
-    [BOOL_ASSIGNMENT, [NAME, '?=', GSYMBOL_REFERENCE]],
-
-    # Regex-like repeat operators
-    [GSYMBOL_REFERENCE, [GSYMBOL, OPT_REP_OPERATOR]],
-    [OPT_REP_OPERATOR, [REP_OPERATOR_ZERO]],
-    [OPT_REP_OPERATOR, [REP_OPERATOR_ONE]],
-    [OPT_REP_OPERATOR, [REP_OPERATOR_OPTIONAL]],
-    [OPT_REP_OPERATOR, [EMPTY]],
-    [REP_OPERATOR_ZERO, ['*', OPT_REP_MODIFIERS_EXP]],
-    [REP_OPERATOR_ONE, ['+', OPT_REP_MODIFIERS_EXP]],
-    [REP_OPERATOR_OPTIONAL, ['?', OPT_REP_MODIFIERS_EXP]],
-    [OPT_REP_MODIFIERS_EXP, ['[', OPT_REP_MODIFIERS, ']']],
-    [OPT_REP_MODIFIERS_EXP, [EMPTY]],
-    [OPT_REP_MODIFIERS, [OPT_REP_MODIFIERS, ',', OPT_REP_MODIFIER]],
-    [OPT_REP_MODIFIERS, [OPT_REP_MODIFIER]],
-    [OPT_REP_MODIFIER, [NAME]],
-
-    [GSYMBOL, [NAME]],
-    [GSYMBOL, [STR_CONST]],
-    [RECOGNIZER, [STR_CONST]],
-    [RECOGNIZER, [REGEX_TERM]],
-
-    # Support for comments,
-    [LAYOUT, [LAYOUT_ITEM]],
-    [LAYOUT, [LAYOUT, LAYOUT_ITEM]],
-    [LAYOUT_ITEM, [WS]],
-    [LAYOUT_ITEM, [COMMENT]],
-    [LAYOUT_ITEM, [EMPTY]],
-    [COMMENT, ['/*', CORNCS, '*/']],
-    [COMMENT, [COMMENTLINE]],
-    [CORNCS, [CORNC]],
-    [CORNCS, [CORNCS, CORNC]],
-    [CORNCS, [EMPTY]],
-    [CORNC, [COMMENT]],
-    [CORNC, [NOTCOMMENT]],
-    [CORNC, [WS]]
-]
+def create_pg_productions():
+    """
+    Creates productions of the grammar language. Productions are created on
+    the first use of the grammar parser.
+
+    Returns:
+    tuple of list and NonTerminal: Productions and the start symbol.
+    """
+    pg_globals = _create_pg_globals()
+    return pg_globals['pg_productions'], pg_globals['PGFILE']
+
+
+_pg_globals = None
+
+
+def __getattr__(name):
+    # Grammar language symbols and productions which used to be created at
+    # import are available on the first access (PEP 562).
+    global _pg_globals
+    if _pg_globals is None:
+        _pg_globals = _create_pg_globals()
+    try:
+        return _pg_globals[name]
+    except KeyError:
+        raise AttributeError(
+            "module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def _create_pg_globals():
+    """
+    Returns a dict of the grammar language symbols and productions keyed by
+    the names of the former module globals (`pg_productions`, `PGFILE`...).
+    """
+    (PGFILE,
+     IMPORTS,
+     IMPORT,
+     PRODUCTION_RULES,
+     PRODUCTION_RULE,
+     PRODUCTION_RULE_WITH_ACTION,
+     PRODUCTION_RULE_RHS,
+     PRODUCTION,
+     TERMINAL_RULES,
+     TERMINAL_RULE,
+     TERMINAL_RULE_WITH_ACTION,
+     PROD_META_DATA,
+     PROD_META_DATAS,
+     TERM_META_DATA,
+     TERM_META_DATAS,
+     USER_META_DATA,
+     CONST,
+
+     ASSIGNMENT,
+     ASSIGNMENTS,
+     PLAIN_ASSIGNMENT,
+     BOOL_ASSIGNMENT,
+
+     GSYMBOL_REFERENCE,
+     OPT_REP_OPERATOR,
+     REP_OPERATOR_ZERO,
+     REP_OPERATOR_ONE,
+     REP_OPERATOR_OPTIONAL,
+     OPT_REP_MODIFIERS_EXP,
+     OPT_REP_MODIFIERS,
+     OPT_REP_MODIFIER,
+
+     GSYMBOL,
+     RECOGNIZER,
+     LAYOUT,
+     LAYOUT_ITEM,
+     COMMENT,
+     CORNC,
+     CORNCS) = [NonTerminal(name) for name in [
+         'PGFile',
+         'Imports',
+         'Import',
+         'ProductionRules',
+         'ProductionRule',
+         'ProductionRuleWithAction',
+         'ProductionRuleRHS',
+         'Production',
+         'TerminalRules',
+         'TerminalRule',
+         'TerminalRuleWithAction',
+         'ProductionMetaData',
+         'ProductionMetaDatas',
+         'TerminalMetaData',
+         'TerminalMetaDatas',
+         'UserMetaData',
+         'Const',
+
+         'Assignment',
+         'Assignments',
+         'PlainAssignment',
+         'BoolAssignment',
+
+         'GrammarSymbolReference',
+         'OptRepeatOperator',
+         'RepeatOperatorZero',
+         'RepeatOperatorOne',
+         'RepeatOperatorOptional',
+         'OptionalRepeatModifiersExpression',
+         'OptionalRepeatModifiers',
+         'OptionalRepeatModifier',
+
+         'GrammarSymbol',
+         'Recognizer',
+         'LAYOUT',
+         'LAYOUT_ITEM',
+         'Comment',
+         'CORNC',
+         'CORNCS']]
+
+    pg_terminals = \
+        (NAME,
+         REGEX_TERM,
+         INT_CONST,
+         FLOAT_CONST,
+         BOOL_CONST,
+         STR_CONST,
+         ACTION,
+         WS,
+         COMMENTLINE,
+         NOTCOMMENT) = [Terminal(name, RegExRecognizer(regex))
+                        for name, regex in [
+                            ('Name', r'[a-zA-Z_][a-zA-Z0-9_\.]*'),
+                            ('RegExTerm', r'\/(\\.|[^\/\\])*\/'),
+                            ('IntConst', r'\d+'),
+                            ('FloatConst',
+                             r'''[+-]?(\d+\.\d*|\.\d+)([eE][+-]?\d+)?(?<=[\w\.])(?![\w\.])'''),  # noqa
+                            ('BoolConst', r'true|false'),
+                            ('StrConst', r'''(?s)('[^'\\]*(?:\\.[^'\\]*)*')|'''
+                             r'''("[^"\\]*(?:\\.[^"\\]*)*")'''),
+                            ('Action', r'@[a-zA-Z0-9_]+'),
+                            ('WS', r'\s+'),
+                            ('CommentLine', r'\/\/.*'),
+                            ('NotComment', r'((\*[^\/])|[^\s*\/]|\/[^\*])+'),
+                        ]]
+
+    pg_productions = [
+        [PGFILE, [PRODUCTION_RULES]],
+        [PGFILE, [IMPORTS, PRODUCTION_RULES]],
+        [PGFILE, [PRODUCTION_RULES, 'terminals', TERMINAL_RULES]],
+        [PGFILE, [IMPORTS, PRODUCTION_RULES, 'terminals', TERMINAL_RULES]],
+        [PGFILE, ['terminals', TERMINAL_RULES]],
+        [IMPORTS, [IMPORTS, IMPORT]],
+        [IMPORTS, [IMPORT]],
+        [IMPORT, ['import', STR_CONST, ';']],
+        [IMPORT, ['import', STR_CONST, 'as', NAME, ';']],
+        [PRODUCTION_RULES, [PRODUCTION_RULES, PRODUCTION_RULE_WITH_ACTION]],
+        [PRODUCTION_RULES, [PRODUCTION_RULE_WITH_ACTION]],
+
+        [PRODUCTION_RULE_WITH_ACTION, [ACTION, PRODUCTION_RULE]],
+        [PRODUCTION_RULE_WITH_ACTION, [PRODUCTION_RULE]],
+        [PRODUCTION_RULE, [NAME, ':', PRODUCTION_RULE_RHS, ';']],
+        [PRODUCTION_RULE, [NAME, '{', PROD_META_DATAS, '}', ':',
+                           PRODUCTION_RULE_RHS, ';']],
+        [PRODUCTION_RULE_RHS, [PRODUCTION_RULE_RHS, '|', PRODUCTION],
+         ASSOC_LEFT, 5],
+        [PRODUCTION_RULE_RHS, [PRODUCTION], ASSOC_LEFT, 5],
+        [PRODUCTION, [ASSIGNMENTS]],
+        [PRODUCTION, [ASSIGNMENTS, '{', PROD_META_DATAS, '}']],
+
+        [TERMINAL_RULES, [TERMINAL_RULES, TERMINAL_RULE_WITH_ACTION]],
+        [TERMINAL_RULES, [TERMINAL_RULE_WITH_ACTION]],
+        [TERMINAL_RULE_WITH_ACTION, [ACTION, TERMINAL_RULE]],
+        [TERMINAL_RULE_WITH_ACTION, [TERMINAL_RULE]],
+        [TERMINAL_RULE, [NAME, ':', RECOGNIZER, ';'], ASSOC_LEFT, 15],
+        [TERMINAL_RULE, [NAME, ':', ';'], ASSOC_LEFT, 15],
+        [TERMINAL_RULE,
+         [NAME, ':', RECOGNIZER, '{', TERM_META_DATAS, '}', ';'],
+         ASSOC_LEFT, 15],
+        [TERMINAL_RULE, [NAME, ':', '{', TERM_META_DATAS, '}', ';'],
+         ASSOC_LEFT, 15],
+
+        [PROD_META_DATA, ['left']],
+        [PROD_META_DATA, ['reduce']],
+        [PROD_META_DATA, ['right']],
+        [PROD_META_DATA, ['shift']],
+        [PROD_META_DATA, ['dynamic']],
+        [PROD_META_DATA, ['nops']],   # no prefer shifts
+        [PROD_META_DATA, ['nopse']],  # no prefer shifts over empty
+        [PROD_META_DATA, [INT_CONST]],  # priority
+        [PROD_META_DATA, [USER_META_DATA]],
+        [PROD_META_DATAS, [PROD_META_DATAS, ',', PROD_META_DATA], ASSOC_LEFT],
+        [PROD_META_DATAS, [PROD_META_DATA]],
+
+        [TERM_META_DATA, ['prefer']],
+        [TERM_META_DATA, ['finish']],
+        [TERM_META_DATA, ['nofinish']],
+        [TERM_META_DATA, ['dynamic']],
+        [TERM_META_DATA, [INT_CONST]],  # priority
+        [TERM_META_DATA, [USER_META_DATA]],
+        [TERM_META_DATAS, [TERM_META_DATAS, ',', TERM_META_DATA]],
+        [TERM_META_DATAS, [TERM_META_DATA]],
+
+        # User custom meta-data
+        [USER_META_DATA, [NAME, ':', CONST]],
+        [CONST, [INT_CONST]],
+        [CONST, [FLOAT_CONST]],
+        [CONST, [BOOL_CONST]],
+        [CONST, [STR_CONST]],
+
+        # Assignments
+        [ASSIGNMENT, [PLAIN_ASSIGNMENT]],
+        [ASSIGNMENT, [BOOL_ASSIGNMENT]],
+        [ASSIGNMENT, [GSYMBOL_REFERENCE]],
+        [ASSIGNMENTS, [ASSIGNMENTS, ASSIGNMENT]],
+        [ASSIGNMENTS, [ASSIGNMENT]],
+        [PLAIN_ASSIGNMENT, [NAME, '=', GSYMBOL_REFERENCE]],
+        [BOOL_ASSIGNMENT, [NAME, '?=', GSYMBOL_REFERENCE]],
+
+        # Regex-like repeat operators
+        [GSYMBOL_REFERENCE, [GSYMBOL, OPT_REP_OPERATOR]],
+        [OPT_REP_OPERATOR, [REP_OPERATOR_ZERO]],
+        [OPT_REP_OPERATOR, [REP_OPERATOR_ONE]],
+        [OPT_REP_OPERATOR, [REP_OPERATOR_OPTIONAL]],
+        [OPT_REP_OPERATOR, [EMPTY]],
+        [REP_OPERATOR_ZERO, ['*', OPT_REP_MODIFIERS_EXP]],
+        [REP_OPERATOR_ONE, ['+', OPT_REP_MODIFIERS_EXP]],
+        [REP_OPERATOR_OPTIONAL, ['?', OPT_REP_MODIFIERS_EXP]],
+        [OPT_REP_MODIFIERS_EXP, ['[', OPT_REP_MODIFIERS, ']']],
+        [OPT_REP_MODIFIERS_EXP, [EMPTY]],
+        [OPT_REP_MODIFIERS, [OPT_REP_MODIFIERS, ',', OPT_REP_MODIFIER]],
+        [OPT_REP_MODIFIERS, [OPT_REP_MODIFIER]],
+        [OPT_REP_MODIFIER, [NAME]],
+
+        [GSYMBOL, [NAME]],
+        [GSYMBOL, [STR_CONST]],
+        [RECOGNIZER, [STR_CONST]],
+        [RECOGNIZER, [REGEX_TERM]],
+
+        # Support for comments,
+        [LAYOUT, [LAYOUT_ITEM]],
+        [LAYOUT, [LAYOUT, LAYOUT_ITEM]],
+        [LAYOUT_ITEM, [WS]],
+        [LAYOUT_ITEM, [COMMENT]],
+        [LAYOUT_ITEM, [EMPTY]],
+        [COMMENT, ['/*', CORNCS, '*/']],
+        [COMMENT, [COMMENTLINE]],
+        [CORNCS, [CORNC]],
+        [CORNCS, [CORNCS, CORNC]],
+        [CORNCS, [EMPTY]],
+        [CORNC, [COMMENT]],
+        [CORNC, [NOTCOMMENT]],
+        [CORNC, [WS]]
+    ]
+
+    return locals()
 
 
 grammar_parser = None
 
+# LR table of the grammar language parser shipped with the package. It is
+# generated at build time by `save_grammar_table`.
+GRAMMAR_TABLE_FILE = path.join(path.dirname(__file__), 'grammar.pgt')
+
 
 def get_grammar_parser(debug, debug_colors):
     global grammar_parser
     if not grammar_parser:
         from parglare import Parser
-        grammar_parser = Parser(Grammar.from_struct(pg_productions, PGFILE),
+        from parglare.tables.persist import load_table
+        grammar = Grammar.from_struct(*create_pg_productions())
+        try:
+            table = load_table(GRAMMAR_TABLE_FILE, grammar)
+        except (OSError, ValueError):
+            # The table is missing or doesn't match the grammar. It will be
+            # calculated by the parser.
+            table = None
+        grammar_parser = Parser(grammar,
                                 actions=pg_actions,
                                 debug=debug,
-                                debug_colors=debug_colors)
+                                debug_colors=debug_colors,
+                                table=table)
     EMPTY.action = pass_none
     return grammar_parser
 
 
+def create_grammar_table():
+    """
+    Calculates LR table of the grammar language parser with the parameters
+    used by the parser by default.
+    """
+    from parglare.tables import create_table
+    # The grammar of the parser is reused instead of creating another one
+    # from `create_pg_productions()`.
+    return create_table(get_grammar_parser(False, False).grammar,
+                        prefer_shifts=True, prefer_shifts_over_empty=True)
+
+
+def save_grammar_table(file_name=GRAMMAR_TABLE_FILE):
+    """
+    Saves LR table of the grammar language parser in the binary format.
+    """
+    from parglare.tables.persist import save_table
+    save_table(file_name, create_grammar_table(), binary=True)
+
+
 def act_pgfile(context, nodes):
     imports, productions, terminals = [], [], []
     while nodes:
@@ -1596,49 +1716,62 @@ def act_production_rule(context, nodes):
     # If named matches are used create Python class that will be used
     # for object instantiation.
     if attrs:
-        class ParglareMetaClass(type):
+        if symbol.fqn in context.extra.classes:
+            # If rule has multiple definition merge attributes.
+            context.extra.classes[symbol.fqn]._pg_attrs.update(attrs)
+        else:
+            context.extra.classes[symbol.fqn] = make_class(name, symbol.fqn,
+                                                           attrs)
+
+        symbol.action_name = 'obj'
 
-            def __repr__(cls):
-                return '<parglare:{} class at {}>'.format(name, id(cls))
+    return prods
 
-        class ParglareClass(object, metaclass=ParglareMetaClass):
-            """Dynamically created class. Each parglare rule that uses named
-            matches by default uses this action that will create Python object
-            of this class.
 
-            Attributes:
-                _pg_attrs(dict): A dict of meta-attributes keyed by name.
-                    Used by common rules.
-                _pg_position(int): A position in the input string where
-                    this class is defined.
-                _pg_position_end(int): A position in the input string where
-                    this class ends.
+def make_class(name, fqn, attrs):
+    """
+    Creates Python class for the rule with named matches.
 
-            """
+    Args:
+    name(str): The name of the rule.
+    fqn(str): The fully qualified name of the rule.
+    attrs(dict of PGAttribute): Attributes created from named matches.
+    """
+    class ParglareMetaClass(type):
 
-            _pg_attrs = attrs
+        def __repr__(cls):
+            return '<parglare:{} class at {}>'.format(name, id(cls))
 
-            def __init__(self, **attrs):
-                for attr_name, attr_value in attrs.items():
-                    setattr(self, attr_name, attr_value)
+    class ParglareClass(object, metaclass=ParglareMetaClass):
+        """Dynamically created class. Each parglare rule that uses named
+        matches by default uses this action that will create Python object
+        of this class.
 
-            def __repr__(self):
-                if hasattr(self, 'name'):
-                    return "<{}:{}>".format(name, self.name)
-                else:
-                    return "<parglare:{} instance at {}>"\
-                        .format(name, hex(id(self)))
+        Attributes:
+            _pg_attrs(dict): A dict of meta-attributes keyed by name.
+                Used by common rules.
+            _pg_position(int): A position in the input string where
+                this class is defined.
+            _pg_position_end(int): A position in the input string where
+                this class ends.
 
-        ParglareClass.__name__ = str(symbol.fqn)
-        if symbol.fqn in context.extra.classes:
-            # If rule has multiple definition merge attributes.
-            context.extra.classes[symbol.fqn]._pg_attrs.update(attrs)
-        else:
-            context.extra.classes[symbol.fqn] = ParglareClass
+        """
 
-        symbol.action_name = 'obj'
+        _pg_attrs = attrs
 
-    return prods
+        def __init__(self, **attrs):
+            for attr_name, attr_value in attrs.items():
+                setattr(self, attr_name, attr_value)
+
+        def __repr__(self):
+            if hasattr(self, 'name'):
+                return "<{}:{}>".format(name, self.name)
+            else:
+                return "<parglare:{} instance at {}>"\
+                    .format(name, hex(id(self)))
+
+    ParglareClass.__name__ = str(fqn)
+    return ParglareClass
 
 
 def get_production_rule_meta_datas(raw_meta_datas):
@@ -1,20 +1,17 @@
 # -*- coding: utf-8 -*-
 import codecs
-import logging
 from .grammar import EMPTY, STOP
 from .tables import LALR, SLR, SHIFT, REDUCE, ACCEPT
 from .exceptions import ParseError, ParserInitError, DisambiguationError, \
     DynamicDisambiguationConflict, SRConflicts, RRConflicts, \
     expected_symbols_str
-from .common import Location, position_context, pos_to_line_col, ErrorContext
+from .common import Location, position_context, pos_to_line_col, \
+    ErrorContext, cached
 from .actions import pass_none
 from .termui import prints, h_print, a_print
 from parglare import termui
 
 
-logger = logging.getLogger(__name__)
-
-
 class Parser(object):
     """Parser works like a DFA driven by LR tables. For a given grammar LR table
     will be created and cached or loaded from cache if cache is found.
@@ -28,7 +25,7 @@ class Parser(object):
                  prefer_shifts_over_empty=None, error_recovery=False,
                  dynamic_filter=None, custom_token_recognition=None,
                  lexical_disambiguation=True, force_load_table=False,
-                 table=None):
+                 table=None, result_cache=None):
         self.grammar = grammar
         self.in_layout = in_layout
 
@@ -52,6 +49,7 @@ class Parser(object):
                     ws=None, return_position=True,
                     prefer_shifts=True,
                     prefer_shifts_over_empty=True,
+                    force_load_table=force_load_table,
                     debug=debug_layout)
 
         self.ws = ws
@@ -70,10 +68,10 @@ class Parser(object):
         self.dynamic_filter = dynamic_filter
         self.custom_token_recognition = custom_token_recognition
         self.lexical_disambiguation = lexical_disambiguation
+        self.result_cache = result_cache
 
         if table is None:
-            from .closure import LR_0, LR_1
-            from .tables import create_load_table
+            from .tables import create_load_table, LR_0, LR_1
 
             if tables == SLR:
                 itemset_type = LR_0
@@ -90,11 +88,14 @@ class Parser(object):
                 start_production=start_production,
                 prefer_shifts=prefer_shifts,
                 prefer_shifts_over_empty=prefer_shifts_over_empty,
+                tables=tables,
                 lexical_disambiguation=lexical_disambiguation,
                 force_load=force_load_table,
                 in_layout=self.in_layout,
                 debug=debug)
         else:
+            import logging
+            logger = logging.getLogger(__name__)
             self.table = table
 
             # warn about overriden parameters
@@ -155,6 +156,7 @@ class Parser(object):
             content = f.read()
         return self.parse(content, file_name=file_name, **kwargs)
 
+    @cached
     def parse(self, input_str, position=0, file_name=None, extra=None):
         """
         Parses the given input string.
@@ -191,57 +193,64 @@ class Parser(object):
                 a_print("Current state:", str(cur_state.state_id),
                         new_line=True)
 
-            if head.token_ahead is None:
-                if not self.in_layout:
-                    self._skipws(head, input_str)
-                    if self.debug:
-                        h_print("Layout content:",
-                                "'{}'".format(head.layout_content),
-                                level=1)
+            if head.token_ahead is None \
+                    and cur_state.default_reduction is not None:
+                # The state reduces by the same production for all
+                # lookaheads. Reduce without scanning for the token ahead.
+                if debug:
+                    h_print("Default reduction.", level=1)
+                actions = [cur_state.default_reduction]
+            else:
+                if head.token_ahead is None:
+                    if not self.in_layout:
+                        self._skipws(head, input_str)
+                        if self.debug:
+                            h_print("Layout content:",
+                                    "'{}'".format(head.layout_content),
+                                    level=1)
 
-                head.token_ahead = next_token(head)
+                    head.token_ahead = next_token(head)
 
-            if debug:
-                h_print("Context:",
-                        position_context(head.input_str,
-                                         head.position), level=1)
-                h_print("Tokens expected:",
-                        expected_symbols_str(cur_state.actions.keys()),
-                        level=1)
-                h_print("Token ahead:", head.token_ahead, level=1)
-
-            actions = None
-            if head.token_ahead is not None:
-                actions = cur_state.actions.get(head.token_ahead.symbol)
-            if not actions and not self.consume_input:
-                # If we don't have any action for the current token ahead
-                # see if we can finish without consuming the whole input.
-                actions = cur_state.actions.get(STOP)
-
-            if not actions:
-
-                symbols_expected = list(cur_state.actions.keys())
-                tokens_ahead = self._get_all_possible_tokens_ahead(head)
-                self.errors.append(self._create_error(
-                    head, symbols_expected,
-                    tokens_ahead,
-                    symbols_before=[cur_state.symbol]))
-
-                if self.error_recovery:
-                    if self.debug:
-                        a_print("*** STARTING ERROR RECOVERY.",
-                                new_line=True)
-                    if self._do_recovery():
-                        # Error recovery succeeded
+                if debug:
+                    h_print("Context:",
+                            position_context(head.input_str,
+                                             head.position), level=1)
+                    h_print("Tokens expected:",
+                            expected_symbols_str(cur_state.actions.keys()),
+                            level=1)
+                    h_print("Token ahead:", head.token_ahead, level=1)
+
+                actions = None
+                if head.token_ahead is not None:
+                    actions = cur_state.actions.get(head.token_ahead.symbol)
+                if not actions and not self.consume_input:
+                    # If we don't have any action for the current token ahead
+                    # see if we can finish without consuming the whole input.
+                    actions = cur_state.actions.get(STOP)
+
+                if not actions:
+
+                    symbols_expected = list(cur_state.actions.keys())
+                    tokens_ahead = self._get_all_possible_tokens_ahead(head)
+                    self.errors.append(self._create_error(
+                        head, symbols_expected,
+                        tokens_ahead,
+                        symbols_before=[cur_state.symbol]))
+
+                    if self.error_recovery:
                         if self.debug:
-                            a_print(
-                                "*** ERROR RECOVERY SUCCEEDED. CONTINUING.",
-                                new_line=True)
-                        continue
+                            a_print("*** STARTING ERROR RECOVERY.",
+                                    new_line=True)
+                        if self._do_recovery():
+                            # Error recovery succeeded
+                            if self.debug:
+                                a_print("*** ERROR RECOVERY SUCCEEDED. "
+                                        "CONTINUING.", new_line=True)
+                            continue
+                        else:
+                            break
                     else:
                         break
-                else:
-                    break
 
             # Dynamic disambiguation
             if self.dynamic_filter:
@@ -425,6 +434,14 @@ class Parser(object):
 
     def _skipws(self, head, input_str):
 
+        layout_cache = self._layout_cache()
+        if layout_cache is not None:
+            layout = layout_cache.get(head.position)
+            if layout is not None:
+                head.position, head.layout_content_ahead = layout
+                return
+            start_position = head.position
+
         in_len = len(input_str)
         layout_content_ahead = ''
 
@@ -454,6 +471,24 @@ class Parser(object):
             h_print("New position:", pos_to_line_col(input_str,
                                                      head.position))
         head.layout_content_ahead = layout_content_ahead
+        if layout_cache is not None:
+            layout_cache[start_position] = (head.position,
+                                            layout_content_ahead)
+
+    def _layout_cache(self):
+        """
+        Returns a dict used for caching of the layout ahead (the new position
+        and the layout content) by the position or None if layout is not
+        cached.
+        """
+        return None
+
+    def _tokens_cache(self, position):
+        """
+        Returns a dict used for caching of the recognition results at the
+        given position by the terminal or None if the results are not cached.
+        """
+        return None
 
     def _next_token(self, head):
         tokens = self._next_tokens(head)
@@ -512,6 +547,7 @@ class Parser(object):
         actions = head.state.actions
         position = head.position
         finish_flags = head.state.finish_flags
+        cache = self._tokens_cache(position)
 
         tokens = []
         last_prior = -1
@@ -519,9 +555,18 @@ class Parser(object):
             if symbol.prior < last_prior and tokens:
                 break
             last_prior = symbol.prior
-            try:
-                tok = symbol.recognizer(input_str, position)
-            except TypeError:
+            tok = NOT_RECOGNIZED if cache is None \
+                else cache.get(symbol, NOT_RECOGNIZED)
+            if tok is NOT_RECOGNIZED:
+                try:
+                    tok = symbol.recognizer(input_str, position)
+                except TypeError:
+                    tok = CONTEXT_RECOGNIZER
+                if cache is not None:
+                    cache[symbol] = tok
+            if tok is CONTEXT_RECOGNIZER:
+                # Recognizers which require the parsing context are called
+                # for each head.
                 try:
                     tok = symbol.recognizer(head, input_str, position)
                 except TypeError as e:
@@ -1023,3 +1068,7 @@ class Token(object):
 
 STOP_token = Token(STOP)
 EMPTY_token = Token(EMPTY)
+
+# Markers used in the cache of recognized tokens.
+NOT_RECOGNIZED = object()
+CONTEXT_RECOGNIZER = object()
@@ -0,0 +1,340 @@
+"""
+Parse results cache.
+
+Results of `parse`/`parse_file` calls are cached by the hash of the input,
+the parser table and grammar, the parser options and the semantic actions
+bound to the grammar symbols. Results are stored pickled, in memory with the
+least recently used results evicted when the total size exceeds the limit
+and, optionally, in a directory so that they are kept between runs.
+
+On cache hit the result is unpickled and returned without parsing. Results
+which can't be pickled (e.g. parse trees) are not cached. Parsing with
+`extra` state, error recovery or debug output is never cached.
+
+Actions are identified by their module, qualified name, code, defaults and
+closure contents so rebinding a symbol to a different action changes the
+key. Action signatures are calculated once per parser and again only when a
+symbol is rebound to a different action. Results of parsers with actions or
+options which can't be identified this way (e.g. callable objects) are not
+cached. Changes not visible in the bound actions (e.g. globals used by the
+action or closure variables assigned after the first parse) must be
+announced by calling `ParseResultCache.invalidate`.
+"""
+import functools
+import os
+import types
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+# Options of the parser which influence the results. GLR options are None
+# for LR parser.
+PARSER_OPTIONS = ('in_layout', 'ws', 'consume_input', 'build_tree',
+                  'call_actions_during_tree_build', 'return_position',
+                  'lexical_disambiguation', 'dynamic_filter',
+                  'custom_token_recognition', 'max_heads', 'head_score')
+
+_NOT_FOUND = object()
+
+
+class ParseResultCache(object):
+    """
+    Cache of parse results given to the parser by `result_cache` parameter.
+    The same cache can be shared by multiple parsers.
+
+    Args:
+    max_size(int): The maximal total size in bytes of the pickled results
+        kept in memory. By default 64 MB.
+    cache_dir(str): If given, results are also stored in this directory.
+
+    Attributes:
+    hits(int): Number of results returned from the cache.
+    disk_hits(int): Number of hits loaded from the cache directory.
+    misses(int): Number of results not found in the cache.
+    evictions(int): Number of results evicted from memory.
+    uncacheable(int): Number of results which couldn't be pickled.
+    """
+    def __init__(self, max_size=64 * 1024 * 1024, cache_dir=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.size = 0
+        self.hits = self.disk_hits = self.misses = 0
+        self.evictions = self.uncacheable = 0
+        self._results = OrderedDict()
+        self._parser_keys = WeakKeyDictionary()
+        self._action_keys = WeakKeyDictionary()
+
+    @property
+    def stats(self):
+        """
+        Returns a dict of cache statistics.
+        """
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'uncacheable': self.uncacheable,
+                'entries': len(self._results), 'size': self.size}
+
+    def key(self, parser, input_str, position=0, file_name=None):
+        """
+        Returns the cache key of the result of parsing the input with the
+        given parser or None if the input can't be hashed or the actions or
+        the parser options can't be identified (see `callable_signature`).
+        """
+        import hashlib
+        parser_key = self._parser_key(parser)
+        if parser_key is None:
+            return None
+        actions = self._action_key(parser)
+        if actions is None:
+            return None
+        if isinstance(input_str, str):
+            input_bytes = input_str.encode('utf-8', 'surrogatepass')
+        elif isinstance(input_str, bytes):
+            input_bytes = input_str
+        else:
+            import pickle
+            try:
+                input_bytes = pickle.dumps(input_str, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                return None
+        key = hashlib.sha256()
+        for part in [parser_key, position, file_name, actions]:
+            key.update(repr(part).encode('utf-8'))
+            key.update(b'\0')
+        key.update(input_bytes)
+        return key.hexdigest()
+
+    def get(self, key, default=None):
+        """
+        Returns the result for the given key or `default` if not cached.
+        """
+        import pickle
+        data = self._results.get(key)
+        if data is not None:
+            self._results.move_to_end(key)
+        elif self.cache_dir is not None:
+            try:
+                with open(self._file_name(key), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                pass
+            else:
+                self.disk_hits += 1
+                self._store(key, data)
+        if data is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, key, result):
+        """
+        Stores the result under the given key. Results which can't be pickled
+        are not stored.
+        """
+        import pickle
+        try:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self.uncacheable += 1
+            return
+        self._store(key, data)
+        if self.cache_dir is not None:
+            from parglare.tables.persist import _atomic_write
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with _atomic_write(self._file_name(key), 'wb') as f:
+                    f.write(data)
+            except OSError:
+                pass
+
+    def parse(self, parse, parser, input_str, position=0, file_name=None):
+        """
+        Returns the cached result of the `parse` method of the parser for the
+        given input. The input is parsed and the result is stored on cache
+        miss (see `parglare.common.cached`).
+        """
+        key = self.key(parser, input_str, position, file_name)
+        if key is None:
+            return parse(parser, input_str, position, file_name)
+        result = self.get(key, _NOT_FOUND)
+        if result is _NOT_FOUND:
+            result = parse(parser, input_str, position, file_name)
+            self.put(key, result)
+        return result
+
+    def invalidate(self):
+        """
+        Removes all results from the cache, including the results in the
+        cache directory. Must be called when the semantic actions are changed
+        in a way not reflected in their code.
+        """
+        self._results.clear()
+        self.size = 0
+        self._parser_keys = WeakKeyDictionary()
+        self._action_keys = WeakKeyDictionary()
+        if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith('.pickle'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, file_name))
+                    except OSError:
+                        pass
+
+    def _store(self, key, data):
+        if len(data) > self.max_size:
+            return
+        old_data = self._results.pop(key, None)
+        if old_data is not None:
+            self.size -= len(old_data)
+        self._results[key] = data
+        self.size += len(data)
+        while self.size > self.max_size:
+            _, evicted = self._results.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def _file_name(self, key):
+        return os.path.join(self.cache_dir, '{}.pickle'.format(key))
+
+    def _parser_key(self, parser):
+        """
+        Returns the digest of the parser table, grammar and options or None if
+        the options can't be identified. It is calculated once per parser.
+        """
+        parser_key = self._parser_keys.get(parser, _NOT_FOUND)
+        if parser_key is _NOT_FOUND:
+            try:
+                parser_key = parser_signature(parser)
+            except ValueError:
+                parser_key = None
+            self._parser_keys[parser] = parser_key
+        return parser_key
+
+    def _action_key(self, parser):
+        """
+        Returns the signatures of the actions bound to the grammar symbols or
+        None if some of the actions can't be identified. Signatures are
+        calculated again only if a symbol is bound to a different action.
+        """
+        actions = [s.action for s in parser.grammar]
+        action_ids = tuple(id(action) for action in actions)
+        cached = self._action_keys.get(parser)
+        if cached is not None and cached[0] == action_ids:
+            return cached[2]
+        try:
+            signatures = [callable_signature(action) for action in actions]
+        except ValueError:
+            signatures = None
+        # Actions are kept so that their ids are not reused.
+        self._action_keys[parser] = (action_ids, actions, signatures)
+        return signatures
+
+
+def parser_signature(parser):
+    """
+    Returns the digest of the parser class, table, grammar and options which
+    influence the results. The layout parser is included.
+
+    Raises ValueError if some of the options can't be identified (see
+    `callable_signature`).
+    """
+    import hashlib
+    from parglare import __version__
+    from parglare.grammar import StringRecognizer, RegExRecognizer
+    from parglare.tables.incremental import production_signature, \
+        terminal_signature
+    from parglare.tables.persist import table_to_binary
+    key = hashlib.sha256()
+    parts = [__version__, type(parser).__module__, type(parser).__qualname__,
+             [(name, callable_signature(getattr(parser, name, None)))
+              for name in PARSER_OPTIONS]]
+    for terminal in parser.grammar.terminals.values():
+        parts.append(terminal_signature(terminal))
+        if type(terminal.recognizer) not in (StringRecognizer,
+                                             RegExRecognizer):
+            parts.append(callable_signature(terminal.recognizer))
+    for production in parser.grammar.productions:
+        parts.append((production_signature(production),
+                      sorted(production.assignments or ())))
+    if parser.layout_parser is not None:
+        parts.append(parser_signature(parser.layout_parser))
+    for part in parts:
+        key.update(repr(part).encode('utf-8'))
+        key.update(b'\0')
+    if parser.table.states:
+        key.update(table_to_binary(parser.table))
+    return key.hexdigest()
+
+
+# Types of callables implemented in C identified by their qualified name.
+_DESCRIPTOR_TYPES = (type(str.upper), type(object.__init__))
+
+
+def callable_signature(obj, _seen=()):
+    """
+    Returns a signature of the action, recognizer or other parser option
+    which is the same between runs. Functions are identified by their module,
+    qualified name, code (including constants and referenced names), defaults
+    and closure contents. Partial objects are identified by their function
+    and arguments and bound methods by their object and function,
+    recursively.
+
+    Raises ValueError if the object can't be identified reliably, e.g. an
+    instance of a user class.
+    """
+    if obj is None or obj is Ellipsis \
+            or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        return obj if obj is not Ellipsis else '...'
+    # Objects may refer to themselves, e.g. a recursive nested function
+    # through its closure.
+    if id(obj) in _seen:
+        return ('recursive', getattr(obj, '__qualname__', None))
+    _seen += (id(obj),)
+    if isinstance(obj, (list, tuple)):
+        return tuple(callable_signature(o, _seen) for o in obj)
+    if isinstance(obj, (set, frozenset)):
+        # Order of the elements depends on the hash seed.
+        return ('set', tuple(sorted(repr(callable_signature(o, _seen))
+                                    for o in obj)))
+    if isinstance(obj, dict):
+        return ('dict', tuple(sorted(
+            (repr(callable_signature(k, _seen)), callable_signature(v, _seen))
+            for k, v in obj.items())))
+    if isinstance(obj, types.ModuleType):
+        return ('module', obj.__name__)
+    if isinstance(obj, type) or isinstance(obj, _DESCRIPTOR_TYPES):
+        return (obj.__module__ if isinstance(obj, type)
+                else obj.__objclass__.__module__, obj.__qualname__)
+    if isinstance(obj, types.BuiltinFunctionType):
+        if obj.__self__ is None or isinstance(obj.__self__,
+                                              types.ModuleType):
+            return (obj.__module__, obj.__qualname__)
+        return ('method', callable_signature(obj.__self__, _seen),
+                obj.__name__)
+    if isinstance(obj, functools.partial):
+        return ('partial', callable_signature(obj.func, _seen),
+                callable_signature(obj.args, _seen),
+                callable_signature(obj.keywords or {}, _seen))
+    if isinstance(obj, types.MethodType):
+        return ('method', callable_signature(obj.__self__, _seen),
+                callable_signature(obj.__func__, _seen))
+    if isinstance(obj, types.CodeType):
+        import hashlib
+        return (obj.co_firstlineno, hashlib.sha256(obj.co_code).hexdigest(),
+                callable_signature(obj.co_consts, _seen), obj.co_names)
+    if isinstance(obj, types.FunctionType):
+        return (obj.__module__, obj.__qualname__,
+                callable_signature(obj.__code__, _seen),
+                callable_signature(obj.__defaults__, _seen),
+                callable_signature(obj.__kwdefaults__, _seen),
+                tuple(callable_signature(_cell_contents(cell), _seen)
+                      for cell in obj.__closure__ or ()))
+    raise ValueError('Can\'t identify "{}".'.format(obj))
+
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # Variable of the enclosing function not assigned yet.
+        return None
@@ -0,0 +1,388 @@
+"""
+Compiled grammar snapshots.
+
+A snapshot is a single file holding the resolved grammar (symbols,
+productions, assignments, meta-data and classes created for named matches)
+together with its LR table. Loading the snapshot doesn't parse grammar files
+and doesn't calculate or look up the table.
+
+Actions and recognizers are not serialized. Paths of the grammar files are
+stored relative to the snapshot file and their actions and recognizers files
+are loaded again, so the snapshot can be moved together with the grammar
+files. Other callables (e.g. recognizers given during grammar construction)
+are stored as references to the module and the name they are importable from.
+
+The layout of the snapshot file is:
+
+- magic bytes,
+- the size of the grammar section as 32-bit little-endian integer,
+- the grammar serialized as UTF-8 JSON padded to 4 bytes,
+- the table in the binary table format (see `parglare.tables.persist`).
+"""
+import json
+from os import path
+from importlib import import_module
+from parglare.exceptions import GrammarError
+from parglare.grammar import Grammar, PGFile, NonTerminal, Terminal, \
+    Production, ProductionRHS, Assignment, PGAttribute, StringRecognizer, \
+    RegExRecognizer, AUGSYMBOL, STOP, EMPTY, make_class
+from parglare.tables.persist import table_to_binary, table_from_binary, \
+    _atomic_write
+
+SNAPSHOT_MAGIC = b'PGLRSNP\0'
+SNAPSHOT_VERSION = 2
+
+# Symbols shared by all grammars.
+_SPECIAL_SYMBOLS = {s.fqn: s for s in (AUGSYMBOL, STOP, EMPTY)}
+
+
+def save_snapshot(file_name, grammar, table):
+    """
+    Saves the grammar and its LR table to the given snapshot file.
+
+    Raises GrammarError if some of the grammar callables can't be referenced
+    from the snapshot (e.g. a recognizer given as a lambda).
+    """
+    with _atomic_write(file_name, 'wb') as f:
+        f.write(snapshot_to_binary(grammar, table,
+                                   path.dirname(path.abspath(file_name))))
+
+
+def load_snapshot(file_name):
+    """
+    Loads the snapshot from the given file.
+
+    Returns:
+    tuple of Grammar and LRTable: The grammar and its table. The table can be
+        given to the parser by the `table` parameter.
+    """
+    with open(file_name, 'rb') as f:
+        buffer = f.read()
+    return snapshot_from_binary(buffer, path.dirname(path.abspath(file_name)))
+
+
+def snapshot_to_binary(grammar, table, base_dir=None):
+    """
+    Converts the grammar and its table to the binary snapshot. Paths of the
+    grammar files are stored relative to `base_dir` if given.
+    """
+    data = json.dumps(grammar_to_serializable(grammar, base_dir)).encode(
+        'utf-8')
+    data += b' ' * (-len(data) % 4)
+    return b''.join([SNAPSHOT_MAGIC, len(data).to_bytes(4, 'little'), data,
+                     table_to_binary(table)])
+
+
+def snapshot_from_binary(buffer, base_dir=None):
+    """
+    Converts the binary snapshot to the grammar and its table. The buffer can
+    be any object supporting the buffer protocol. Relative paths of the
+    grammar files are resolved against `base_dir` if given.
+
+    Raises ValueError if the buffer is not a snapshot of the supported
+    version.
+    """
+    with memoryview(buffer) as view:
+        offset = len(SNAPSHOT_MAGIC)
+        if bytes(view[:offset]) != SNAPSHOT_MAGIC:
+            raise ValueError('Not a parglare snapshot.')
+        size = int.from_bytes(view[offset:offset + 4], 'little')
+        offset += 4
+        grammar = grammar_from_serializable(
+            json.loads(bytes(view[offset:offset + size]).decode('utf-8')),
+            base_dir)
+        table = table_from_binary(view[offset + size:], grammar)
+    return grammar, table
+
+
+def grammar_to_serializable(grammar, base_dir=None):
+    """Convert grammar object to serializable representation composed of
+    lists and dicts. Paths of the grammar files are relative to `base_dir` if
+    given."""
+    pgfiles = [grammar] + [f for f in grammar.imported_files.values()
+                           if f is not grammar]
+    pgfile_ids = {id(f): idx for idx, f in enumerate(pgfiles)}
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'start_symbol': grammar.start_symbol.fqn,
+        'pgfiles': [_dump_pgfile(f, pgfile_ids, base_dir) for f in pgfiles],
+        'terminals': [_dump_terminal(key, t, pgfiles)
+                      for key, t in grammar.terminals.items()],
+        'nonterminals': [_dump_nonterminal(nt)
+                         for nt in grammar.nonterminals.values()],
+        'productions': [_dump_production(p) for p in grammar.productions],
+        'classes': [[fqn, [[a.name, a.multiplicity, a.type_name]
+                           for a in cls._pg_attrs.values()]]
+                    for fqn, cls in grammar.classes.items()],
+    }
+
+
+def grammar_from_serializable(data, base_dir=None):
+    """Convert serializable representation of a grammar into Grammar
+    object. Relative paths of the grammar files are resolved against
+    `base_dir` if given. Actions and recognizers files are loaded and grammar
+    actions are resolved."""
+    if data['version'] != SNAPSHOT_VERSION:
+        raise ValueError('Unsupported snapshot version {}.'.format(
+            data['version']))
+
+    grammar = _load_pgfile(data['pgfiles'][0], base_dir)
+    pgfiles = [grammar] + [_load_pgfile(f, base_dir, grammar)
+                           for f in data['pgfiles'][1:]]
+    for pgfile, json_pgfile in zip(pgfiles, data['pgfiles']):
+        pgfile.imports = {module_name: _Import(module_name, pgfiles[idx])
+                          for module_name, idx
+                          in json_pgfile['imports'].items()}
+
+    symbols = {}
+    grammar.terminals = {}
+    for json_terminal in data['terminals']:
+        terminal = _load_terminal(json_terminal, pgfiles)
+        grammar.terminals[json_terminal['key']] = terminal
+        symbols[terminal.fqn] = terminal
+    grammar.nonterminals = {}
+    for json_nonterminal in data['nonterminals']:
+        nonterminal = _load_nonterminal(json_nonterminal)
+        grammar.nonterminals[nonterminal.fqn] = nonterminal
+        symbols[nonterminal.fqn] = nonterminal
+
+    grammar.productions = [_load_production(json_production, symbols)
+                           for json_production in data['productions']]
+    for idx, production in enumerate(grammar.productions):
+        production.prod_id = idx
+    for json_nonterminal in data['nonterminals']:
+        if json_nonterminal['productions'] is not None:
+            symbols[json_nonterminal['fqn']].productions = \
+                [grammar.productions[prod_id]
+                 for prod_id in json_nonterminal['productions']]
+
+    grammar.symbols_by_name = dict(symbols)
+    grammar.start_symbol = symbols[data['start_symbol']]
+    grammar.classes = {
+        fqn: make_class(fqn.split('.')[-1], fqn,
+                        {name: PGAttribute(name, multiplicity, type_name)
+                         for name, multiplicity, type_name in attrs})
+        for fqn, attrs in data['classes']}
+    grammar._resolve_actions()
+
+    return grammar
+
+
+class _Import(object):
+    """
+    Replaces PGFileImport in the loaded grammar. Keeps the fully qualified
+    name, used for symbols FQN calculation, and the imported file, used for
+    actions resolving.
+    """
+    def __init__(self, fqn, pgfile=None):
+        self.fqn = fqn
+        self.pgfile = pgfile
+
+    def resolve_action_by_name(self, action_name):
+        return self.pgfile.resolve_action_by_name(action_name)
+
+
+def _dump_pgfile(pgfile, pgfile_ids, base_dir):
+    file_path = pgfile.file_path
+    if file_path and base_dir is not None:
+        try:
+            file_path = path.relpath(file_path, base_dir)
+        except ValueError:
+            # Different drives on Windows.
+            pass
+    return {
+        'file_path': file_path,
+        'imported_with': pgfile.imported_with.fqn
+        if pgfile.imported_with else None,
+        'imports': {module_name: pgfile_ids[id(i.pgfile)]
+                    for module_name, i in pgfile.imports.items()},
+    }
+
+
+def _load_pgfile(json_pgfile, base_dir, grammar=None):
+    file_path = json_pgfile['file_path']
+    if file_path and base_dir is not None:
+        file_path = path.join(base_dir, file_path)
+    return (PGFile if grammar else Grammar).from_snapshot(
+        file_path=file_path, grammar=grammar,
+        imported_with=_Import(json_pgfile['imported_with'])
+        if json_pgfile['imported_with'] else None)
+
+
+def _dump_symbol(symbol):
+    return {
+        'fqn': symbol.fqn,
+        'name': symbol.name,
+        'imported_with': symbol.imported_with.fqn
+        if symbol.imported_with else None,
+        'user_meta': symbol.user_meta,
+        'action_name': symbol.action_name,
+        'grammar_action': _dump_ref(symbol.grammar_action, symbol)
+        if symbol.grammar_action is not None else None,
+    }
+
+
+def _load_symbol(symbol, json_symbol):
+    symbol.user_meta = json_symbol['user_meta']
+    symbol.action_name = json_symbol['action_name']
+    if json_symbol['grammar_action'] is not None:
+        symbol.grammar_action = _load_ref(json_symbol['grammar_action'])
+    return symbol
+
+
+def _dump_terminal(key, terminal, pgfiles):
+    t = {'key': key}
+    if terminal.fqn in _SPECIAL_SYMBOLS:
+        t['fqn'] = terminal.fqn
+        return t
+    t.update(_dump_symbol(terminal))
+    t['prior'] = terminal.prior
+    t['finish'] = terminal.finish
+    t['prefer'] = terminal.prefer
+    t['dynamic'] = terminal.dynamic
+    t['keyword'] = terminal.keyword
+    t['recognizer'] = _dump_recognizer(terminal, pgfiles)
+    return t
+
+
+def _load_terminal(json_terminal, pgfiles):
+    if json_terminal['fqn'] in _SPECIAL_SYMBOLS:
+        return _SPECIAL_SYMBOLS[json_terminal['fqn']]
+    terminal = Terminal(json_terminal['name'],
+                        imported_with=_import(json_terminal))
+    terminal.recognizer = _load_recognizer(json_terminal['recognizer'],
+                                           pgfiles)
+    terminal.prior = json_terminal['prior']
+    terminal.finish = json_terminal['finish']
+    terminal.prefer = json_terminal['prefer']
+    terminal.dynamic = json_terminal['dynamic']
+    terminal.keyword = json_terminal['keyword']
+    return _load_symbol(terminal, json_terminal)
+
+
+def _dump_nonterminal(nonterminal):
+    if nonterminal.fqn in _SPECIAL_SYMBOLS:
+        return {'fqn': nonterminal.fqn, 'productions': None}
+    nt = _dump_symbol(nonterminal)
+    nt['productions'] = [p.prod_id for p in nonterminal.productions]
+    return nt
+
+
+def _load_nonterminal(json_nonterminal):
+    if json_nonterminal['fqn'] in _SPECIAL_SYMBOLS:
+        return _SPECIAL_SYMBOLS[json_nonterminal['fqn']]
+    nonterminal = NonTerminal(json_nonterminal['name'],
+                              imported_with=_import(json_nonterminal))
+    return _load_symbol(nonterminal, json_nonterminal)
+
+
+def _import(json_symbol):
+    return _Import(json_symbol['imported_with']) \
+        if json_symbol['imported_with'] else None
+
+
+def _dump_production(production):
+    # RHS is iterated as a list to keep EMPTY symbols.
+    rhs = list.__iter__(production.rhs)
+    return {
+        'symbol': production.symbol.fqn,
+        'rhs': [s.fqn for s in rhs],
+        'assignments': [[a.name, a.op, a.symbol_name, a.multiplicity, a.index]
+                        for a in production.assignments.values()]
+        if production.assignments else None,
+        'assoc': production.assoc,
+        'prior': production.prior,
+        'dynamic': production.dynamic,
+        'nops': production.nops,
+        'nopse': production.nopse,
+        'user_meta': production.user_meta,
+        'prod_symbol_id': production.prod_symbol_id,
+    }
+
+
+def _load_production(json_production, symbols):
+    rhs = ProductionRHS(symbols[fqn] for fqn in json_production['rhs'])
+    assignments = None
+    if json_production['assignments']:
+        assignments = []
+        for name, op, symbol_name, multiplicity, index \
+                in json_production['assignments']:
+            assignment = Assignment(name, op, list.__getitem__(rhs, index))
+            assignment.symbol_name = symbol_name
+            assignment.multiplicity = multiplicity
+            assignment.index = index
+            assignments.append(assignment)
+    production = Production(symbols[json_production['symbol']], rhs,
+                            assignments=assignments,
+                            assoc=json_production['assoc'],
+                            prior=json_production['prior'],
+                            dynamic=json_production['dynamic'],
+                            nops=json_production['nops'],
+                            nopse=json_production['nopse'],
+                            user_meta=json_production['user_meta'])
+    # RHS made of EMPTY symbols is replaced by the constructor.
+    production.rhs = rhs
+    production.prod_symbol_id = json_production['prod_symbol_id']
+    return production
+
+
+def _dump_recognizer(terminal, pgfiles):
+    recognizer = terminal.recognizer
+    if recognizer is None:
+        return None
+    if type(recognizer) is StringRecognizer:
+        return ['string', recognizer.value, recognizer.ignore_case]
+    if type(recognizer) is RegExRecognizer:
+        return ['regex', recognizer._regex, recognizer.name,
+                recognizer.re_flags, recognizer.ignore_case]
+    for idx, pgfile in enumerate(pgfiles):
+        for name, file_recognizer in pgfile.file_recognizers.items():
+            if file_recognizer is recognizer:
+                return ['file', idx, name]
+    return ['ref'] + _dump_ref(recognizer, terminal)
+
+
+def _load_recognizer(json_recognizer, pgfiles):
+    if json_recognizer is None:
+        return None
+    kind = json_recognizer[0]
+    if kind == 'string':
+        _, value, ignore_case = json_recognizer
+        return StringRecognizer(value, ignore_case=ignore_case)
+    if kind == 'regex':
+        _, regex, name, re_flags, ignore_case = json_recognizer
+        return RegExRecognizer(regex, name=name, re_flags=re_flags,
+                               ignore_case=ignore_case)
+    if kind == 'file':
+        _, idx, name = json_recognizer
+        return pgfiles[idx].file_recognizers[name]
+    return _load_ref(json_recognizer[1:])
+
+
+def _dump_ref(obj, symbol):
+    """
+    Returns the module and the qualified name the given callable is
+    importable from.
+    """
+    module = getattr(obj, '__module__', None)
+    qualname = getattr(obj, '__qualname__', None)
+    if module and qualname and '<locals>' not in qualname:
+        try:
+            if _load_ref([module, qualname]) is obj:
+                return [module, qualname]
+        except (ImportError, AttributeError):
+            pass
+    raise GrammarError(
+        location=symbol.location,
+        message='Can\'t save "{}" of "{}" to the snapshot. Only callables '
+        'importable by their module and name can be saved.'
+        .format(obj, symbol.fqn))
+
+
+def _load_ref(ref):
+    module, qualname = ref
+    obj = import_module(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
@@ -1,4 +1,3 @@
-import logging
 import os
 from collections import OrderedDict
 from itertools import chain
@@ -6,12 +5,9 @@ from parglare.grammar import ProductionRHS, AUGSYMBOL, \
     ASSOC_LEFT, ASSOC_RIGHT, STOP, StringRecognizer, RegExRecognizer, \
     Grammar, EMPTY, NonTerminal
 from parglare.exceptions import GrammarError, SRConflict, RRConflict
-from parglare.closure import closure, LR_1
 from parglare.termui import prints, s_header, h_print, a_print, s_emph
-from parglare.tables.persist import load_table, save_table
-
-
-logger = logging.getLogger(__name__)
+from parglare.tables.persist import load_table, save_table, \
+    is_binary_table, is_compressed_table
 
 
 SHIFT = 0
@@ -21,6 +17,12 @@ ACCEPT = 2
 # Tables construction algorithms
 SLR = 0
 LALR = 1
+CANONICAL_LR = 2
+MINIMAL_LR = 3
+
+# Itemset types (see `parglare.closure`)
+LR_0 = 0
+LR_1 = 1
 
 
 def create_load_table(grammar, itemset_type=LR_1, start_production=1,
@@ -28,9 +30,28 @@ def create_load_table(grammar, itemset_type=LR_1, start_production=1,
                       force_create=False, force_load=False, in_layout=False,
                       debug=False, **kwargs):
     """
-    Construct table by loading from file if present and newer than the grammar.
-    If table file is older than the grammar or non-existent calculate the table
-    and save to file.
+    Construct table by loading from file if present, newer than the grammar
+    and created for the same grammar and options. Otherwise, calculate the
+    table and save to file if the file doesn't exist or is older than the
+    grammar. JSON, binary and compressed table files are supported (see
+    `parglare.tables.persist`). The format of the existing table file is kept
+    when the table is recalculated.
+
+    The table file holds the key calculated from the grammar and the options
+    (see `get_table_key`) so a stale table file is detected even if the file
+    modification times are not reliable. The table file created for different
+    options (e.g. by `GLRParser` or `pglr compile` for the table used by
+    `Parser`) is not overwritten. The table is taken from the content-hash
+    cache instead which holds a table for each set of options.
+
+    Before calculation, the table is looked up in the content-hash cache (see
+    `parglare.tables.cache`) so it is calculated only once for the same
+    grammar and options even if the table file next to the grammar can't be
+    written. Tables of the grammars not loaded from file (e.g.
+    `Grammar.from_string`) are cached only in the content-hash cache.
+
+    The table of the layout parser is persisted and cached in the same way in
+    a separate table file (see `get_table_file_name`).
 
     Arguments:
     see create_table
@@ -38,65 +59,122 @@ def create_load_table(grammar, itemset_type=LR_1, start_production=1,
     force_create(bool): If set to True table will be created even if table file
         exists.
     force_load(bool): If set to True table will be loaded if exists even if
-        it's not newer than the grammar, i.e. modification time will not be
-        checked.
+        it's not newer than the grammar or created for the same grammar, i.e.
+        modification time and the table key will not be checked.
+    in_layout(bool): If set to True the table is for the layout parser.
 
     """
 
-    if in_layout:
-        # For layout grammars always calculate table.
-        # Those are usually very small grammars so there is no point in
-        # using cached tables.
-        if debug:
-            a_print("** Calculating LR table for the layout parser...",
-                    new_line=True)
-        return create_table(grammar, itemset_type, start_production,
-                            prefer_shifts, prefer_shifts_over_empty)
-    else:
-        if debug:
-            a_print("** Calculating LR table...", new_line=True)
-
-    table_file_name = None
-    if grammar.file_path:
-        file_basename, _ = os.path.splitext(grammar.file_path)
-        table_file_name = "{}.pgt".format(file_basename)
-
-    create_table_file = True
-
-    if not force_create and not force_load:
-        if grammar.file_path:
-            file_basename, _ = os.path.splitext(grammar.file_path)
-            table_file_name = "{}.pgt".format(file_basename)
-
-            if os.path.exists(table_file_name):
-                create_table_file = False
-                table_mtime = os.path.getmtime(table_file_name)
-                # Check if older than any of the grammar files
-                for g_file_name in grammar.imported_files.keys():
-                    if os.path.getmtime(g_file_name) > table_mtime:
-                        create_table_file = True
-                        break
+    from parglare.tables.cache import get_cached_table, get_cache_dir
 
-    if (create_table_file or force_create) and not force_load:
-        table = create_table(grammar, itemset_type, start_production,
-                             prefer_shifts, prefer_shifts_over_empty,
-                             debug=debug, **kwargs)
-        if table_file_name:
+    if debug:
+        a_print("** Calculating LR table{}...".format(
+            " for the layout parser" if in_layout else ""), new_line=True)
+
+    table_file_name = get_table_file_name(grammar, start_production)
+
+    key = get_table_key(grammar, itemset_type, start_production,
+                        prefer_shifts, prefer_shifts_over_empty, **kwargs)
+
+    # The format of the existing table file is kept.
+    binary = compressed = False
+    table = None
+    save = table_file_name is not None
+    if save and os.path.exists(table_file_name):
+        binary = is_binary_table(table_file_name)
+        compressed = is_compressed_table(table_file_name)
+        # Up-to-date table file is kept even if it is created for different
+        # options.
+        save = force_create or _grammar_newer(grammar, table_file_name)
+        if not force_create and (force_load or not save):
+            if debug:
+                h_print("Loading LR table from '{}'".format(table_file_name))
             try:
-                save_table(table_file_name, table)
-            except PermissionError:
+                table = load_table(table_file_name, grammar,
+                                   key=None if force_load else key)
+            except ValueError:
+                # Unsupported binary table version or the table is created
+                # for a different grammar or options.
+                if force_load:
+                    raise
+                if debug:
+                    h_print("Can't load LR table. Recalculating...")
+                # Only the table file which can't be used with any options
+                # is overwritten.
+                try:
+                    load_table(table_file_name, grammar)
+                except ValueError:
+                    save = True
+
+    if table is None:
+        def create():
+            return create_table(grammar, itemset_type, start_production,
+                                prefer_shifts, prefer_shifts_over_empty,
+                                debug=debug, **kwargs)
+        if force_create:
+            table = create()
+        else:
+            if debug:
+                h_print("Looking up LR table in the cache '{}'".format(
+                    get_cache_dir()))
+            table = get_cached_table(key, grammar, create)
+        if save:
+            try:
+                save_table(table_file_name, table, binary=binary,
+                           compressed=compressed, key=key)
+            except OSError:
+                # E.g. read-only installation. The table is still available
+                # from the cache.
                 pass
-    else:
-        if debug:
-            h_print("Loading LR table from '{}'".format(table_file_name))
-        table = load_table(table_file_name, grammar)
 
     return table
 
 
+def _grammar_newer(grammar, table_file_name):
+    """
+    Returns True if any of the grammar files is newer than the table file.
+    """
+    table_mtime = os.path.getmtime(table_file_name)
+    return any(os.path.getmtime(g_file_name) > table_mtime
+               for g_file_name in grammar.imported_files.keys())
+
+
+def get_table_key(grammar, itemset_type=LR_1, start_production=1,
+                  prefer_shifts=False, prefer_shifts_over_empty=True,
+                  tables=LALR, lexical_disambiguation=None, **kwargs):
+    """
+    Returns the key of the table created by `create_load_table` with the
+    given arguments (see `parglare.tables.cache.table_cache_key`). Default
+    values are filled in so that the same table has the same key.
+    """
+    from parglare.tables.cache import table_cache_key
+    return table_cache_key(
+        grammar, itemset_type=itemset_type, start_production=start_production,
+        prefer_shifts=prefer_shifts,
+        prefer_shifts_over_empty=prefer_shifts_over_empty, tables=tables,
+        lexical_disambiguation=lexical_disambiguation is not False, **kwargs)
+
+
+def get_table_file_name(grammar, start_production=1):
+    """
+    Returns the name of the table file for the grammar loaded from file or
+    None. The table for other start production than the first one, e.g. the
+    table of the layout parser, is saved to the file named after the start
+    symbol (e.g. `calc.LAYOUT.pgt`).
+    """
+    if not grammar.file_path:
+        return None
+    file_basename, _ = os.path.splitext(grammar.file_path)
+    if start_production != 1:
+        file_basename = "{}.{}".format(
+            file_basename, grammar.productions[start_production].symbol.name)
+    return "{}.pgt".format(file_basename)
+
+
 def create_table(grammar, itemset_type=LR_1, start_production=1,
                  prefer_shifts=False, prefer_shifts_over_empty=True,
-                 debug=False, **kwargs):
+                 deremer_pennello=False, tables=LALR, minimize=False,
+                 default_reductions=False, debug=False, **kwargs):
     """
     Arguments:
     grammar (Grammar):
@@ -108,9 +186,27 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
     prefer_shifts_over_empty(bool) - Conflict resolution strategy which favours
         SHIFT over REDUCE of EMPTY. By default False. If prefer_shifts is
         `True` this param is ignored.
+    deremer_pennello(bool) - Calculate LALR(1) follow sets using DeRemer and
+        Pennello relations instead of iterative propagation. Produces the same
+        table. By default False.
+    tables(int) - LR(1) automata to construct for LR_1 itemsets. LALR - states
+        with the same LR(0) core are merged (default), CANONICAL_LR - states
+        are merged only if their LR(1) items are the same, MINIMAL_LR - states
+        of the canonical LR(1) automata with the same core are merged if that
+        doesn't introduce new conflicts.
+    minimize(bool) - Merge states with the same ACTION and GOTO rows after
+        the table is constructed. By default False.
+    default_reductions(bool) - Used with `minimize`. Merge states which reduce
+        by the same production for all lookaheads even if the lookaheads are
+        different. By default False.
     """
 
-    first_sets = first(grammar)
+    from parglare.closure import closure, Closures
+    from parglare.tables.termset import get_terminal_index, TerminalSet
+
+    # Terminal sets are represented as int bitmasks during table construction.
+    index = get_terminal_index(grammar)
+    first_sets = first_bits(grammar)
 
     # Check for states with GOTO links but without SHIFT links.
     # This is invalid as the GOTO link will never be traversed.
@@ -122,20 +218,39 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
                         'An infinite recursion on the '
                         'grammar symbol.'.format(nt))
 
-    follow_sets = follow(grammar, first_sets)
+    follow_sets = follow_bits(grammar, first_sets)
 
     start_prod_symbol = grammar.productions[start_production].symbol
     grammar.productions[0].rhs = ProductionRHS([start_prod_symbol, STOP])
 
     # Create a state for the first production (augmented)
     s = LRState(grammar, 0, AUGSYMBOL,
-                [LRItem(grammar.productions[0], 0, set())])
+                [LRItem(grammar.productions[0], 0, TerminalSet(index))])
 
     state_queue = [s]
     state_id = 1
 
+    # LR(0) closures are memoized and shared between states.
+    closures = Closures(grammar, first_sets)
+
     states = []
 
+    # Canonical LR(1) states are never merged. Minimal LR(1) states are
+    # merged after the canonical LR(1) automata is constructed.
+    canonical = itemset_type is LR_1 and tables in (CANONICAL_LR, MINIMAL_LR)
+
+    def signature(state):
+        if canonical:
+            return state.lr1_kernel_signature
+        return state.kernel_signature
+
+    # States keyed by their kernel signature for fast lookup of existing
+    # states. Both processed and queued states are indexed. If LALR merging
+    # fails, a new state with the same kernel is created but only the first
+    # state is kept in the index, i.e. merging is always tried with the first
+    # state created for the kernel.
+    states_by_kernel = {signature(s): s}
+
     if debug:
         h_print("Constructing LR automata states...")
     while state_queue:
@@ -144,7 +259,7 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
         # We will also calculate GOTO and ACTIONS dicts for each state. These
         # dicts will be keyed by a grammar symbol.
         state = state_queue.pop(0)
-        closure(state, itemset_type, first_sets)
+        closure(state, itemset_type, first_sets, closures)
         states.append(state)
 
         # To find out other states we examine following grammar symbols
@@ -175,16 +290,9 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
         for symbol, items in state._per_next_symbol.items():
             inc_items = [item.get_pos_inc() for item in items]
             maybe_new_state = LRState(grammar, state_id, symbol, inc_items)
-            target_state = maybe_new_state
-            try:
-                idx = states.index(maybe_new_state)
-                target_state = states[idx]
-            except ValueError:
-                try:
-                    idx = state_queue.index(maybe_new_state)
-                    target_state = state_queue[idx]
-                except ValueError:
-                    pass
+            kernel_signature = signature(maybe_new_state)
+            target_state = states_by_kernel.setdefault(kernel_signature,
+                                                       maybe_new_state)
 
             # We've found a new state. Register it for later processing.
             if target_state is maybe_new_state:
@@ -192,7 +300,7 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
                 state_id += 1
             else:
                 # State with this kernel items already exists.
-                if itemset_type is LR_1:
+                if itemset_type is LR_1 and not canonical:
                     # LALR: Try to merge states, i.e. update items follow sets.
                     if not merge_states(target_state, maybe_new_state):
                         target_state = maybe_new_state
@@ -220,7 +328,21 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
 
     # For LR(1) itemsets refresh/propagate item's follows as the LALR
     # merging might change item's follow in previous states
-    if itemset_type is LR_1:
+    if canonical:
+        if tables == MINIMAL_LR:
+            if debug:
+                h_print("Merging compatible LR(1) states...")
+            from parglare.tables.lr1 import merge_compatible_states
+            states = merge_compatible_states(states, index)
+            if debug:
+                h_print("{} LR automata states after merging".format(
+                    len(states)))
+
+    elif itemset_type is LR_1 and deremer_pennello:
+        from parglare.tables.lalr import lalr_lookaheads
+        lalr_lookaheads(states, first_sets, closures)
+
+    elif itemset_type is LR_1:
 
         # Propagate updates as long as there were items propagated in the last
         # loop run.
@@ -231,7 +353,7 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
             for state in states:
 
                 # First refresh current state's follows
-                closure(state, LR_1, first_sets)
+                closure(state, LR_1, first_sets, closures)
 
                 # Propagate follows to next states. GOTOs/ACTIONs keep
                 # information about states created from this state
@@ -242,9 +364,9 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
                          for a in i if a.action is SHIFT]):
                     for next_item in target_state.kernel_items:
                         this_item = inc_items[inc_items.index(next_item)]
-                        if this_item.follow.difference(next_item.follow):
+                        if this_item.follow.bits & ~next_item.follow.bits:
                             update = True
-                            next_item.follow.update(this_item.follow)
+                            next_item.follow.bits |= this_item.follow.bits
 
     if debug:
         h_print("Calculate REDUCTION entries in ACTION tables and"
@@ -264,7 +386,8 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
                 if itemset_type is LR_1:
                     follow_set = item.follow
                 else:
-                    follow_set = follow_sets[item.production.symbol]
+                    follow_set = index.to_terminals(
+                        follow_sets[item.production.symbol])
 
                 prod = item.production
                 new_reduce = Action(REDUCE, prod=prod)
@@ -343,8 +466,15 @@ def create_table(grammar, itemset_type=LR_1, start_production=1,
                                          if x.action is not REDUCE]
                                     actions[terminal].append(new_reduce)
 
-    table = LRTable(states, **kwargs)
-    return table
+    if minimize:
+        from parglare.tables.minimize import minimize_states
+        states_count = len(states)
+        states = minimize_states(states, default_reductions)
+        if debug:
+            h_print("LR automata states minimized from {} to {}".format(
+                states_count, len(states)))
+
+    return LRTable(states, **kwargs)
 
 
 def merge_states(old_state, new_state):
@@ -369,23 +499,57 @@ def merge_states(old_state, new_state):
     for old, new in item_pairs:
         for s in (s for s in old_state.kernel_items
                   if s.is_at_end and s is not old):
-            if s.follow.intersection(
-                    new.follow.difference(old.follow)):
+            if s.follow.bits & new.follow.bits & ~old.follow.bits:
                 return False
 
     # Do the merge
     for old, new in item_pairs:
-        old.follow.update(new.follow)
+        old.follow.bits |= new.follow.bits
     return True
 
 
+def terminal_ranks(grammar):
+    """
+    Returns ranks of grammar terminals keyed by the terminal used for ordering
+    of state actions. Ranks are calculated on the first call and cached in the
+    grammar.
+
+    Priority is the strongest property. After that honor string recognizer
+    over other types of recognizers, longer strings and keyword regexes first.
+    Terminal fqn is used to make the order deterministic.
+    """
+    if hasattr(grammar, '_terminal_ranks'):
+        return grammar._terminal_ranks
+
+    def act_order(symbol):
+        return "{:010d}{:500s}".format(
+            symbol.prior * 1000
+            + (500 + (len(symbol.recognizer.value)
+                      if type(symbol.recognizer) is
+                      StringRecognizer else 0) +
+               # Account for `\b` at the beginning and end of keyword regex
+               ((len(symbol.recognizer._regex) - 4)
+                if type(symbol.recognizer) is
+                RegExRecognizer and symbol.keyword
+                else 0)), symbol.fqn)
+
+    terminals = sorted(grammar.terminals.values(), key=act_order,
+                       reverse=True)
+    grammar._terminal_ranks = {terminal: rank
+                               for rank, terminal in enumerate(terminals)}
+    return grammar._terminal_ranks
+
+
 class LRTable(object):
     def __init__(
         self, states, calc_finish_flags=True,
         # lexical_disambiguation defaults to True, when
         # calc_finish_flags is set
         lexical_disambiguation=None,
-        debug=False
+        debug=False,
+        # States which may have conflicts. Given by table loaders so that
+        # states of other kinds are not decoded. By default all states.
+        conflict_states=None
     ):
         self.states = states
         if calc_finish_flags:
@@ -399,9 +563,16 @@ class LRTable(object):
                     state.finish_flags = [False] * len(state.actions)
         else:
             if lexical_disambiguation is not None:
-                logger.warn('lexical_disambiguation flag ignored '
-                            'because calc_finish_flags is not set')
-        self.calc_conflicts_and_dynamic_terminals(debug)
+                import logging
+                logging.getLogger(__name__).warn(
+                    'lexical_disambiguation flag ignored because '
+                    'calc_finish_flags is not set')
+        self.calc_conflicts_and_dynamic_terminals(debug, conflict_states)
+        if calc_finish_flags:
+            # Loaded tables have default reductions persisted.
+            self.calc_default_reductions()
+        # Expected symbols are calculated lazily on the first error report.
+        self.expected_symbols_calculated = False
 
     def sort_state_actions(self):
         """
@@ -409,34 +580,33 @@ class LRTable(object):
         optimization based on explicit or implicit disambiguation.
         Also, by sorting actions table save file is made deterministic.
         """
-        def act_order(act_item):
-            """Priority is the strongest property. After that honor string
-            recognizer over other types of recognizers.
-
-            """
-            symbol, act = act_item
-            cmp_str = "{:010d}{:500s}".format(
-                symbol.prior * 1000
-                + (500 + (len(symbol.recognizer.value)
-                          if type(symbol.recognizer) is
-                          StringRecognizer else 0) +
-                   # Account for `\b` at the beginning and end of keyword regex
-                   ((len(symbol.recognizer._regex) - 4)
-                    if type(symbol.recognizer) is
-                    RegExRecognizer and symbol.keyword
-                    else 0)), symbol.fqn)
-            return cmp_str
+        if not self.states:
+            return
+        ranks = terminal_ranks(self.states[0].grammar)
 
         for state in self.states:
+            if state.finish_flags is not None:
+                # Actions order is reused from the previous table.
+                continue
             state.actions = OrderedDict(sorted(state.actions.items(),
-                                               key=act_order, reverse=True))
+                                               key=lambda a: ranks[a[0]]))
 
     def calc_finish_flags(self):
         """
         Scanning optimization. Preorder actions based on terminal priority
         and specificity. Set _finish flags.
+
+        A terminal is also finishing if none of the following terminals which
+        would be tried after its match can match at the same input position
+        (see `parglare.tables.lexical`).
         """
+        from parglare.tables.lexical import get_terminal_first_chars, \
+            can_overlap
+        first_chars = get_terminal_first_chars(self.states[0].grammar) \
+            if self.states else {}
         for state in self.states:
+            if state.finish_flags is not None:
+                continue
             finish_flags = []
             prior = None
             for symbol, act in reversed(list(state.actions.items())):
@@ -450,11 +620,32 @@ class LRTable(object):
                 prior = symbol.prior
 
             finish_flags.reverse()
+
+            symbols = list(state.actions)
+            for idx, symbol in enumerate(symbols[:-1]):
+                if finish_flags[idx] or symbol.finish is not None:
+                    continue
+                # After a match only the terminals of the same priority are
+                # tried.
+                symbol_first_chars = first_chars.get(symbol)
+                for other in symbols[idx + 1:]:
+                    if other.prior < symbol.prior:
+                        finish_flags[idx] = True
+                        break
+                    if can_overlap(symbol_first_chars,
+                                   first_chars.get(other)):
+                        break
+                else:
+                    finish_flags[idx] = True
+
             state.finish_flags = finish_flags
 
-    def calc_conflicts_and_dynamic_terminals(self, debug=False):
+    def calc_conflicts_and_dynamic_terminals(self, debug=False, states=None):
         """
         Determine S/R and R/R conflicts and states dynamic terminals.
+
+        If `states` is given only those states are checked. Dynamic terminals
+        of other states must be already set.
         """
         self.sr_conflicts = []
         self.rr_conflicts = []
@@ -462,7 +653,7 @@ class LRTable(object):
         if debug:
             h_print("Calculating conflicts and dynamic terminals...")
 
-        for state in self.states:
+        for state in self.states if states is None else states:
 
             for term, actions in state.actions.items():
 
@@ -504,6 +695,128 @@ class LRTable(object):
                             self.rr_conflicts.append(
                                 RRConflict(state, term, prods))
 
+    def calc_default_reductions(self):
+        """
+        Determine states that reduce by the same production for all
+        lookaheads. The LR parser reduces in these states without scanning for
+        the lookahead token. Dynamic states are excluded as dynamic
+        disambiguation needs the lookahead token.
+        """
+        for state in self.states:
+            state.default_reduction = None
+            if not state.actions or state.dynamic:
+                continue
+            actions = list(state.actions.values())
+            action = actions[0][0]
+            if action.action is REDUCE and not action.prod.dynamic \
+                    and all(len(a) == 1 and a[0].action is REDUCE
+                            and a[0].prod is action.prod for a in actions):
+                state.default_reduction = action
+
+    def calc_expected_symbols(self):
+        """
+        Calculate terminals that lead to SHIFT in each state, possibly after a
+        sequence of reductions. Used for fast error reporting in GLR parsing.
+
+        Reductions go to the states reachable by going backwards through the
+        LR automaton so it can't be determined statically for every
+        terminal if it will finally be shifted. Thus, two sets are calculated
+        for each state:
+
+            - expected_symbols - terminals that lead to SHIFT for every
+              parser stack.
+            - possible_symbols - terminals that lead to SHIFT for some parser
+              stacks.
+
+        Terminals from the difference of these sets must be checked against
+        the actual parser stack.
+        """
+        states = {state.state_id: state for state in self.states}
+
+        predecessors = {state_id: set() for state_id in states}
+        for state in self.states:
+            for target_state in chain(
+                    state.gotos.values(),
+                    [a.state for i in state.actions.values()
+                     for a in i if a.action is SHIFT]):
+                predecessors[target_state.state_id].add(state.state_id)
+
+        roots_cache = {}
+
+        def roots(state_id, length):
+            """
+            States reachable by going backwards for the given length.
+            """
+            key = (state_id, length)
+            state_roots = roots_cache.get(key)
+            if state_roots is None:
+                if length == 0:
+                    state_roots = set([state_id])
+                else:
+                    state_roots = set()
+                    for pred_id in predecessors[state_id]:
+                        state_roots.update(roots(pred_id, length - 1))
+                roots_cache[key] = state_roots
+            return state_roots
+
+        # For each terminal without SHIFT action in a state find states
+        # reachable by GOTO after each of the reductions. Entries are indexed
+        # by the GOTO states and the terminal to be rechecked when the terminal
+        # is found to lead to SHIFT in some of the GOTO states.
+        dependents = {}
+        goto_cache = {}
+        queue = []
+        for state in self.states:
+            state.expected_symbols = set()
+            state.possible_symbols = set()
+            for term, actions in state.actions.items():
+                if any(a.action is SHIFT for a in actions):
+                    state.expected_symbols.add(term)
+                    state.possible_symbols.add(term)
+                    queue.append((state.state_id, term))
+                    continue
+                reductions = []
+                for action in actions:
+                    if action.action is REDUCE:
+                        key = (state.state_id, action.prod.prod_id)
+                        goto_ids = goto_cache.get(key)
+                        if goto_ids is None:
+                            symbol = action.prod.symbol
+                            goto_ids = set(
+                                [states[root_id].gotos[symbol].state_id
+                                 for root_id in roots(state.state_id,
+                                                      len(action.prod.rhs))
+                                 if symbol in states[root_id].gotos])
+                            goto_cache[key] = goto_ids
+                        if goto_ids:
+                            reductions.append(goto_ids)
+                entry = (state, term, reductions)
+                for goto_ids in reductions:
+                    for goto_id in goto_ids:
+                        dependents.setdefault((goto_id, term), []).append(
+                            entry)
+
+        possible_queue = list(queue)
+        while possible_queue:
+            key = possible_queue.pop()
+            for state, term, _ in dependents.get(key, []):
+                if term not in state.possible_symbols:
+                    state.possible_symbols.add(term)
+                    possible_queue.append((state.state_id, term))
+
+        expected_queue = queue
+        while expected_queue:
+            key = expected_queue.pop()
+            for state, term, reductions in dependents.get(key, []):
+                if term not in state.expected_symbols \
+                        and any(all(term in states[goto_id].expected_symbols
+                                    for goto_id in goto_ids)
+                                for goto_ids in reductions):
+                    state.expected_symbols.add(term)
+                    expected_queue.append((state.state_id, term))
+
+        self.expected_symbols_calculated = True
+
     def print_debug(self):
         a_print("*** STATES ***", new_line=True)
         for state in self.states:
@@ -580,14 +893,19 @@ class LRItem(object):
     Represents an item in the items set. Item is defined by a production and a
     position inside production (the dot). If the item is of LR_1 type follow
     set is also defined. Follow set is a set of terminals that can follow
-    non-terminal at given position in the given production.
+    non-terminal at given position in the given production. It is represented
+    by TerminalSet.
     """
     __slots__ = ('production', 'position', 'follow')
 
     def __init__(self, production, position, follow=None):
         self.production = production
         self.position = position
-        self.follow = set() if not follow else follow
+        if not follow:
+            from parglare.tables.termset import TerminalSet
+            # Empty follow set is never shared between items.
+            follow = TerminalSet(follow.index if follow is not None else None)
+        self.follow = follow
 
     def __eq__(self, other):
         return other and self.production == other.production and \
@@ -666,10 +984,17 @@ class LRState(object):
         ambiguity strategy callable is called for the terminal symbol
         lookahead.
     finish_flags:
+    expected_symbols(set of terminal symbols): Terminals which lead to SHIFT,
+        possibly after reductions, for every parser stack.
+    possible_symbols(set of terminal symbols): Terminals which lead to SHIFT,
+        possibly after reductions, for some parser stacks.
+    default_reduction(Action): REDUCE action if it is the only action of the
+        state for all lookaheads. None otherwise.
 
     """
     __slots__ = ['grammar', 'state_id', 'symbol', 'items',
                  'actions', 'gotos', 'dynamic', 'finish_flags',
+                 'expected_symbols', 'possible_symbols', 'default_reduction',
                  '_per_next_symbol', '_max_prior_per_symbol']
 
     def __init__(self, grammar, state_id, symbol, items=None):
@@ -681,6 +1006,8 @@ class LRState(object):
         self.actions = OrderedDict()
         self.gotos = OrderedDict()
         self.dynamic = set()
+        self.finish_flags = None
+        self.default_reduction = None
 
     def __eq__(self, other):
         """Two states are equal if their kernel items are equal."""
@@ -703,6 +1030,24 @@ class LRState(object):
         """
         return [i for i in self.items if i.is_kernel]
 
+    @property
+    def kernel_signature(self):
+        """
+        Returns a hashable signature of this state kernel items. States are
+        equal if their kernel signatures are equal.
+        """
+        return tuple(sorted((i.production.prod_id, i.position)
+                            for i in self.items if i.is_kernel))
+
+    @property
+    def lr1_kernel_signature(self):
+        """
+        Returns a hashable signature of this state kernel items including
+        their follow sets. Used to identify canonical LR(1) states.
+        """
+        return tuple(sorted((i.production.prod_id, i.position, i.follow.bits)
+                            for i in self.items if i.is_kernel))
+
     @property
     def nonkernel_items(self):
         """
@@ -732,6 +1077,38 @@ class LRState(object):
         prints(str(self))
 
 
+class LazyLRState(LRState):
+    """
+    LR state of a loaded table whose actions, gotos, finish flags and dynamic
+    terminals are decoded on the first access. Most parses visit only a small
+    fraction of the states of a large table.
+
+    Attributes:
+    decode(callable): Called with the state to set its lazy attributes. None
+        when the state is decoded.
+    """
+    __slots__ = ['decode']
+
+    LAZY_ATTRS = ('actions', 'gotos', 'finish_flags', 'dynamic')
+
+    def __init__(self, grammar, state_id, symbol, decode):
+        # Lazy attributes are left unset so that `__getattr__` is called only
+        # on the first access.
+        self.grammar = grammar
+        self.state_id = state_id
+        self.symbol = symbol
+        self.items = []
+        self.default_reduction = None
+        self.decode = decode
+
+    def __getattr__(self, name):
+        if name in LazyLRState.LAZY_ATTRS and self.decode is not None:
+            self.decode(self)
+            self.decode = None
+            return getattr(self, name)
+        raise AttributeError(name)
+
+
 def first(grammar):
     """Calculates the sets of terminals that can start the sentence derived from
     all grammar symbols.
@@ -748,11 +1125,33 @@ def first(grammar):
         # If first sets is already calculated return it
         return grammar._first_sets
 
+    from parglare.tables.termset import get_terminal_index
+    index = get_terminal_index(grammar)
+    first_sets = {symbol: set(index.to_terminals(bits))
+                  for symbol, bits in first_bits(grammar).items()}
+
+    grammar._first_sets = first_sets
+    return first_sets
+
+
+def first_bits(grammar):
+    """Calculates FIRST sets represented as bitmasks (see `first`).
+
+    Returns:
+    dict of int bitmasks of terminals keyed by GrammarSymbol.
+    """
+    if hasattr(grammar, '_first_bits'):
+        return grammar._first_bits
+
+    from parglare.tables.termset import get_terminal_index
+    index = get_terminal_index(grammar)
+    empty = index.terminal_bits[EMPTY]
+
     first_sets = {}
     for t in grammar.terminals.values():
-        first_sets[t] = set([t])
+        first_sets[t] = index.terminal_bits[t]
     for nt in grammar.nonterminals.values():
-        first_sets[nt] = set()
+        first_sets[nt] = 0
 
     additions = True
     while additions:
@@ -761,25 +1160,24 @@ def first(grammar):
         for p in grammar.productions:
             nonterm = p.symbol
             for rhs_symbol in p.rhs:
-                rhs_symbol_first = set(first_sets[rhs_symbol])
-                rhs_symbol_first.discard(EMPTY)
-                if rhs_symbol_first.difference(first_sets[nonterm]):
-                    first_sets[nonterm].update(first_sets[rhs_symbol])
+                rhs_symbol_first = first_sets[rhs_symbol] & ~empty
+                if rhs_symbol_first & ~first_sets[nonterm]:
+                    first_sets[nonterm] |= first_sets[rhs_symbol]
                     additions = True
                 # If current RHS symbol can't derive EMPTY
                 # this production can't add any more members of
                 # the first set for LHS nonterminal.
-                if EMPTY not in first_sets[rhs_symbol]:
+                if not first_sets[rhs_symbol] & empty:
                     break
             else:
                 # If we reached the end of the RHS and each
                 # symbol along the way could derive EMPTY than
                 # we must add EMPTY to the first set of LHS symbol.
-                if EMPTY not in first_sets[nonterm]:
-                    first_sets[nonterm].add(EMPTY)
+                if not first_sets[nonterm] & empty:
+                    first_sets[nonterm] |= empty
                     additions = True
 
-    grammar._first_sets = first_sets
+    grammar._first_bits = first_sets
     return first_sets
 
 
@@ -791,31 +1189,52 @@ def follow(grammar, first_sets=None):
     grammar (Grammar): An initialized grammar.
     first_sets (dict): A sets of FIRST terminals keyed by a grammar symbol.
     """
+    from parglare.tables.termset import get_terminal_index
+    index = get_terminal_index(grammar)
+    if first_sets is not None:
+        first_sets = {symbol: index.to_bits(terminals)
+                      for symbol, terminals in first_sets.items()}
+
+    return {symbol: set(index.to_terminals(bits))
+            for symbol, bits in follow_bits(grammar, first_sets).items()}
+
+
+def follow_bits(grammar, first_sets=None):
+    """Calculates FOLLOW sets represented as bitmasks (see `follow`).
+
+    Args:
+    grammar (Grammar): An initialized grammar.
+    first_sets (dict): FIRST bitmasks keyed by a grammar symbol.
 
+    Returns:
+    dict of int bitmasks of terminals keyed by NonTerminal.
+    """
     if first_sets is None:
-        first_sets = first(grammar)
+        first_sets = first_bits(grammar)
+
+    from parglare.tables.termset import get_terminal_index
+    empty = get_terminal_index(grammar).terminal_bits[EMPTY]
 
     follow_sets = {}
     for symbol in grammar.nonterminals.values():
-        follow_sets[symbol] = set()
+        follow_sets[symbol] = 0
 
     additions = True
     while additions:
         additions = False
-        for symbol in grammar.nonterminals.values():
-            for p in grammar.productions:
-                for idx, s in enumerate(p.rhs):
-                    if s == symbol:
-                        prod_follow = set()
-                        for rsymbol in p.rhs[idx+1:]:
-                            sfollow = first_sets[rsymbol]
-                            prod_follow.update(sfollow)
-                            if EMPTY not in sfollow:
-                                break
-                        else:
-                            prod_follow.update(follow_sets[p.symbol])
-                        prod_follow.discard(EMPTY)
-                        if prod_follow.difference(follow_sets[symbol]):
-                            additions = True
-                            follow_sets[symbol].update(prod_follow)
+        for p in grammar.productions:
+            for idx, s in enumerate(p.rhs):
+                if s in follow_sets:
+                    prod_follow = 0
+                    for rsymbol in p.rhs[idx+1:]:
+                        sfollow = first_sets[rsymbol]
+                        prod_follow |= sfollow
+                        if not sfollow & empty:
+                            break
+                    else:
+                        prod_follow |= follow_sets[p.symbol]
+                    prod_follow &= ~empty
+                    if prod_follow & ~follow_sets[s]:
+                        additions = True
+                        follow_sets[s] |= prod_follow
     return follow_sets
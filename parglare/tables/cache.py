@@ -0,0 +1,277 @@
+"""
+Content-hash LR tables cache.
+
+Tables are stored in the cache directory in the binary format under the name
+derived from the hash of the grammar productions and terminals and the
+options which influence table construction. Thus, the cache doesn't depend on
+file modification times and the same table is shared between all copies of
+the grammar.
+
+The cache directory is given by `PARGLARE_CACHE_DIR` environment variable. If
+not set, `parglare` directory inside `XDG_CACHE_HOME` (by default
+`~/.cache`) is used. Setting `PARGLARE_CACHE_DIR` to an empty string disables
+the cache.
+
+Tables are written to a temporary file which is atomically renamed to the
+cache file. While a table is calculated a lock file exists so that concurrent
+processes wait for the table instead of calculating it again.
+
+The cache is pruned when a table is written. Tables not used for
+`CACHE_MAX_AGE` seconds are removed and, if the total size of the tables
+exceeds `CACHE_MAX_SIZE` bytes, the least recently used tables are removed.
+"""
+import os
+import time
+from contextlib import contextmanager
+from parglare.tables.incremental import production_signature, \
+    terminal_signature
+from parglare.tables.persist import load_table, save_table, BINARY_VERSION
+
+# Lock files not refreshed for this number of seconds are considered stale,
+# e.g. left by a killed process. The lock holder refreshes the lock file four
+# times in this period.
+LOCK_TIMEOUT = 120
+
+_LOCK_POLL_INTERVAL = 0.05
+
+# Tables not used for this number of seconds are removed from the cache.
+CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+# Maximal total size in bytes of the tables in the cache.
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+
+def get_cache_dir():
+    """
+    Returns the tables cache directory or None if the cache is disabled.
+    """
+    cache_dir = os.environ.get('PARGLARE_CACHE_DIR')
+    if cache_dir is not None:
+        return cache_dir or None
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME')
+        or os.path.join(os.path.expanduser('~'), '.cache'), 'parglare')
+
+
+def table_cache_key(grammar, **options):
+    """
+    Returns the cache key of the table for the given grammar and table
+    construction options.
+    """
+    import hashlib
+    from parglare import __version__
+    key = hashlib.sha256()
+    # The augmented production is left out as it is set by the table
+    # construction from the start production option.
+    for part in ([__version__, BINARY_VERSION, sorted(options.items())]
+                 + [terminal_signature(t) for t in grammar.terminals.values()]
+                 + [production_signature(p)
+                    for p in grammar.productions[1:]]):
+        key.update(repr(part).encode('utf-8'))
+        key.update(b'\0')
+    return key.hexdigest()
+
+
+def load_cached_table(key, grammar):
+    """
+    Returns the table from the cache or None if it is not cached.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    table_file = _table_file(cache_dir, key)
+    try:
+        table = load_table(table_file, grammar, key)
+    except (OSError, ValueError):
+        return None
+    # Modification time of the table file is the time of the last use.
+    try:
+        os.utime(table_file, None)
+    except OSError:
+        pass
+    return table
+
+
+def save_cached_table(key, table):
+    """
+    Saves the table to the cache and prunes the cache (see `prune_cache`).
+    Errors are ignored as the cache is only an optimization.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_table(_table_file(cache_dir, key), table, binary=True,
+                   key=key)
+    except OSError:
+        pass
+    prune_cache(keep=key)
+
+
+def prune_cache(keep=None):
+    """
+    Removes the tables not used for `CACHE_MAX_AGE` seconds from the cache.
+    If the remaining tables are larger than `CACHE_MAX_SIZE` bytes in total,
+    the least recently used tables are removed. The table with the key
+    `keep` is never removed. Temporary files left by killed processes are
+    removed after `CACHE_MAX_AGE` seconds as well.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+    now = time.time()
+    tables = []
+    try:
+        file_names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for file_name in file_names:
+        if not file_name.endswith(('.pgt', '.tmp')) \
+                or file_name == '{}.pgt'.format(keep):
+            continue
+        path = os.path.join(cache_dir, file_name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if now - stat.st_mtime > CACHE_MAX_AGE:
+            _remove(path)
+        elif file_name.endswith('.pgt'):
+            tables.append((stat.st_mtime, stat.st_size, path))
+    size = 0
+    if keep is not None:
+        try:
+            size = os.path.getsize(_table_file(cache_dir, keep))
+        except OSError:
+            pass
+    for _, table_size, path in sorted(tables, reverse=True):
+        size += table_size
+        if size > CACHE_MAX_SIZE:
+            _remove(path)
+
+
+def get_cached_table(key, grammar, create):
+    """
+    Returns the table from the cache. If not cached, the table is created by
+    calling `create` and saved to the cache. Concurrent calls with the same key
+    from different processes create the table only once.
+    """
+    if get_cache_dir() is None:
+        return create()
+    table = load_cached_table(key, grammar)
+    if table is None:
+        with _lock(key):
+            # Another process might have created the table while we were
+            # waiting for the lock.
+            table = load_cached_table(key, grammar)
+            if table is None:
+                table = create()
+                save_cached_table(key, table)
+    return table
+
+
+def _table_file(cache_dir, key):
+    return os.path.join(cache_dir, '{}.pgt'.format(key))
+
+
+def _remove(file_name):
+    try:
+        os.remove(file_name)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _lock(key):
+    """
+    Context manager which holds the lock file for the given key. Waits while
+    the lock is held by another process. If the lock file can't be created
+    (e.g. the cache directory is read-only) proceeds without locking.
+
+    The lock file holds the owner token and its modification time is refreshed
+    while the lock is held so that only the locks of dead or hung processes
+    become stale.
+    """
+    import binascii
+    import socket
+    import threading
+    cache_dir = get_cache_dir()
+    lock_file = os.path.join(cache_dir, '{}.lock'.format(key))
+    token = '{} {} {}'.format(socket.gethostname(), os.getpid(),
+                              binascii.hexlify(os.urandom(8)).decode('ascii'))
+    fd = None
+    while fd is None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            _remove_stale_lock(lock_file)
+            time.sleep(_LOCK_POLL_INTERVAL)
+        except OSError:
+            break
+    if fd is None:
+        yield
+        return
+
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    released = threading.Event()
+    refresher = threading.Thread(target=_refresh_lock,
+                                 args=(lock_file, token, released))
+    refresher.daemon = True
+    refresher.start()
+    try:
+        yield
+    finally:
+        released.set()
+        refresher.join()
+        if _read_lock(lock_file) == token:
+            try:
+                os.remove(lock_file)
+            except OSError:
+                pass
+
+
+def _refresh_lock(lock_file, token, released):
+    """
+    Updates the modification time of the lock file until the lock is released
+    or taken over by another process.
+    """
+    while not released.wait(LOCK_TIMEOUT / 4):
+        if _read_lock(lock_file) != token:
+            break
+        try:
+            os.utime(lock_file, None)
+        except OSError:
+            break
+
+
+def _remove_stale_lock(lock_file):
+    """
+    Removes the lock file which is not refreshed for LOCK_TIMEOUT seconds,
+    e.g. left by a killed process.
+    """
+    try:
+        if time.time() - os.path.getmtime(lock_file) <= LOCK_TIMEOUT:
+            return
+        token = _read_lock(lock_file)
+        # Check that the lock is not taken over by another waiting process
+        # meanwhile.
+        if time.time() - os.path.getmtime(lock_file) > LOCK_TIMEOUT \
+                and _read_lock(lock_file) == token:
+            os.remove(lock_file)
+    except OSError:
+        # The lock is released meanwhile.
+        pass
+
+
+def _read_lock(lock_file):
+    """
+    Returns the owner token of the lock file or None if it doesn't exist.
+    """
+    try:
+        with open(lock_file) as f:
+            return f.read()
+    except OSError:
+        return None
@@ -0,0 +1,494 @@
+"""
+Compressed LR table encoding.
+
+ACTION and GOTO tables are packed into comb vectors (row displacement) in the
+style of yacc `yypact`/`yycheck` tables:
+
+- ACTION rows are indexed by terminal columns. The most frequent action of
+  each state is its default action and only the other actions are stored in
+  the comb vector. Equal rows, e.g. rows of states which have only the
+  default action, are shared.
+- GOTO table is packed by non-terminal columns indexed by states. The most
+  frequent target state of each non-terminal is its default goto.
+- Distinct lists of actions and ordered sets of expected terminals, with
+  their finish flags, are stored once and shared between states.
+
+Each row is placed at the lowest base where its entries don't collide with
+the entries of the rows placed before. The `check` vector holds the row of
+each entry so the lookup is `value[base[row] + column]` if `check[base[row]
++ column] == row`.
+
+The same arrays are used in the file and by the parser. States of the
+compressed table have read-only mapping views as `actions` and `gotos` which
+look up the packed arrays.
+"""
+import sys
+from array import array
+from collections import Counter
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+from parglare.grammar import Terminal
+from parglare.tables.persist import KEY_SIZE, pack_key, unpack_key, \
+    check_key
+
+COMPRESSED_MAGIC = b'PGLRCMP\0'
+COMPRESSED_VERSION = 2
+
+# Packed arrays in the order they are stored in the file. All integers are
+# 32-bit little-endian.
+COMPRESSED_ARRAYS = (
+    # LHS symbol index of each production.
+    'productions',
+    # For each state: symbol index, default reduction production id (-1 if
+    # none), action row (-1 if empty), default action list (-1 if none),
+    # expected terminals and goto set.
+    'states',
+    # Distinct actions: action, target state id and production id (-1 if
+    # none).
+    'action_items',
+    # Distinct action lists: start and count of the action references.
+    'action_lists',
+    'action_refs',
+    # ACTION comb vector.
+    'action_base', 'action_check', 'action_value',
+    # Distinct ordered sets of expected terminals: start and count of the
+    # items. Each item is the terminal column * 2 + finish flag.
+    'expected', 'expected_items',
+    # Distinct sets of non-terminals with gotos: start and count of the
+    # items. Each item is the non-terminal column.
+    'goto_sets', 'goto_set_items',
+    # For each non-terminal column: GOTO row and the default target state.
+    'goto_row', 'goto_default',
+    # GOTO comb vector.
+    'goto_base', 'goto_check', 'goto_value')
+_HEADER_FIELDS = ('version', 'symbols_size', 'terminals') + COMPRESSED_ARRAYS
+_STATE_SIZE = 6
+
+
+def compress_table(table):
+    """
+    Returns the table with the same states whose actions and gotos are looked
+    up in the compressed arrays.
+    """
+    grammar = table.states[0].grammar
+    terminals, nonterminals, arrays = _compress(table)
+    return _create_table(grammar, terminals, nonterminals, arrays)
+
+
+def table_to_compressed(table, key=None):
+    """
+    Converts the table to the compressed binary format. The layout is:
+
+    - magic bytes and the header with the format version, the size of the
+      symbol names, the number of terminals and the sizes of the arrays,
+    - the table key (see `parglare.tables.persist.save_table`), zeros if not
+      given,
+    - symbols fully qualified names as UTF-8 separated by new lines padded to
+      4 bytes, terminals first,
+    - arrays given by `COMPRESSED_ARRAYS`.
+    """
+    terminals, nonterminals, arrays = _compress(table)
+    names = '\n'.join(s.fqn for s in terminals + nonterminals).encode('utf-8')
+    names += b'\0' * (-len(names) % 4)
+    header = array('i', [COMPRESSED_VERSION, len(names), len(terminals)]
+                   + [len(arrays[name]) for name in COMPRESSED_ARRAYS])
+    arrays = [header] + [arrays[name] for name in COMPRESSED_ARRAYS]
+    if sys.byteorder == 'big':
+        for a in arrays:
+            a.byteswap()
+    return b''.join([COMPRESSED_MAGIC, arrays[0].tobytes(), pack_key(key),
+                     names] + [a.tobytes() for a in arrays[1:]])
+
+
+def table_from_compressed(buffer, grammar, key=None):
+    """
+    Converts the table in the compressed binary format to LRTable object. The
+    buffer can be any object supporting the buffer protocol (e.g. `bytes`).
+
+    Raises ValueError if the buffer is not a compressed table of the
+    supported version or if the table doesn't match the grammar or the given
+    key.
+    """
+    with memoryview(buffer) as view:
+        offset = len(COMPRESSED_MAGIC)
+        if bytes(view[:offset]) != COMPRESSED_MAGIC:
+            raise ValueError('Not a compressed parglare table.')
+
+        def ints(count):
+            nonlocal offset
+            end = offset + 4 * count
+            values = array('i')
+            values.frombytes(view[offset:end])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset = end
+            return values
+
+        version = ints(1)[0]
+        if version not in (1, COMPRESSED_VERSION):
+            raise ValueError('Unsupported compressed table version {}.'
+                             .format(version))
+        header = dict(zip(_HEADER_FIELDS[1:],
+                          ints(len(_HEADER_FIELDS) - 1)))
+        stored_key = None
+        if version > 1:
+            stored_key = unpack_key(view[offset:offset + KEY_SIZE])
+            offset += KEY_SIZE
+        check_key(stored_key, key)
+        if header['productions'] != len(grammar.productions):
+            raise ValueError('Table doesn\'t match the grammar.')
+
+        names = bytes(view[offset:offset + header['symbols_size']])
+        offset += header['symbols_size']
+        symbols = [grammar.get_symbol(name) for name in
+                   names.rstrip(b'\0').decode('utf-8').split('\n')]
+        arrays = {name: ints(header[name]) for name in COMPRESSED_ARRAYS}
+
+    if any(symbols[symbol] is not production.symbol
+           for symbol, production in zip(arrays['productions'],
+                                         grammar.productions)):
+        raise ValueError('Table doesn\'t match the grammar.')
+    return _create_table(grammar, symbols[:header['terminals']],
+                         symbols[header['terminals']:], arrays)
+
+
+def pack_rows(rows):
+    """
+    Packs sparse rows into a comb vector.
+
+    Arguments:
+    rows(list of tuples): Each row is a tuple of (column, value) pairs.
+
+    Returns a tuple of arrays `base`, `check` and `value`. Empty slots of the
+    `check` vector are -1.
+    """
+    base = array('i', [0]) * len(rows)
+    check = array('i')
+    value = array('i')
+    # Rows with more entries are placed first as they are harder to fit.
+    first_free = 0
+    for row_id in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        row = rows[row_id]
+        if not row:
+            continue
+        min_column = min(column for column, _ in row)
+        row_base = first_free - min_column
+        while any(row_base + column < len(check)
+                  and check[row_base + column] >= 0
+                  for column, _ in row):
+            row_base += 1
+        base[row_id] = row_base
+        size = row_base + max(column for column, _ in row) + 1
+        if size > len(check):
+            check.extend([-1] * (size - len(check)))
+            value.extend([-1] * (size - len(value)))
+        for column, column_value in row:
+            check[row_base + column] = row_id
+            value[row_base + column] = column_value
+        while first_free < len(check) and check[first_free] >= 0:
+            first_free += 1
+    return base, check, value
+
+
+class CompressedActions(Mapping):
+    """
+    Read-only mapping of the state actions looked up in the compressed
+    ACTION table. Terminals are iterated in the order of the original
+    actions.
+    """
+    __slots__ = ['table', 'row', 'default', 'terminals', 'terminal_set']
+
+    def __init__(self, table, row, default, terminals, terminal_set):
+        self.table = table
+        self.row = row
+        self.default = default
+        self.terminals = terminals
+        self.terminal_set = terminal_set
+
+    def get(self, terminal, default=None):
+        if terminal not in self.terminal_set:
+            return default
+        table = self.table
+        if self.row >= 0:
+            idx = table.action_base[self.row] \
+                + table.terminal_columns[terminal]
+            if 0 <= idx < len(table.action_check) \
+                    and table.action_check[idx] == self.row:
+                return table.action_lists[table.action_value[idx]]
+        return table.action_lists[self.default]
+
+    def __getitem__(self, terminal):
+        actions = self.get(terminal)
+        if actions is None:
+            raise KeyError(terminal)
+        return actions
+
+    def __contains__(self, terminal):
+        return terminal in self.terminal_set
+
+    def __iter__(self):
+        return iter(self.terminals)
+
+    def __len__(self):
+        return len(self.terminals)
+
+
+class CompressedGotos(Mapping):
+    """
+    Read-only mapping of the state gotos looked up in the compressed GOTO
+    table.
+    """
+    __slots__ = ['table', 'state_id', 'nonterminals', 'nonterminal_set']
+
+    def __init__(self, table, state_id, nonterminals, nonterminal_set):
+        self.table = table
+        self.state_id = state_id
+        self.nonterminals = nonterminals
+        self.nonterminal_set = nonterminal_set
+
+    def __getitem__(self, nonterminal):
+        if nonterminal not in self.nonterminal_set:
+            raise KeyError(nonterminal)
+        table = self.table
+        column = table.nonterminal_columns[nonterminal]
+        row = table.goto_row[column]
+        idx = table.goto_base[row] + self.state_id
+        if 0 <= idx < len(table.goto_check) and table.goto_check[idx] == row:
+            return table.states[table.goto_value[idx]]
+        return table.states[table.goto_default[column]]
+
+    def __contains__(self, nonterminal):
+        return nonterminal in self.nonterminal_set
+
+    def __iter__(self):
+        return iter(self.nonterminals)
+
+    def __len__(self):
+        return len(self.nonterminals)
+
+
+class CompressedTable(object):
+    """
+    Compressed arrays shared by the mapping views of the states.
+
+    Attributes:
+    states(list of LRState):
+    terminal_columns(dict): Column of each terminal.
+    nonterminal_columns(dict): Column of each non-terminal.
+    action_lists(list of lists of Action): Distinct action lists.
+    arrays (see `COMPRESSED_ARRAYS`) used by the lookup are set as
+    attributes.
+    """
+    def __init__(self, states, terminals, nonterminals, action_lists,
+                 arrays):
+        self.states = states
+        self.terminal_columns = {t: idx for idx, t in enumerate(terminals)}
+        self.nonterminal_columns = {n: idx
+                                    for idx, n in enumerate(nonterminals)}
+        self.action_lists = action_lists
+        for name in ('action_base', 'action_check', 'action_value',
+                     'goto_row', 'goto_default', 'goto_base', 'goto_check',
+                     'goto_value'):
+            setattr(self, name, arrays[name])
+
+
+def _create_table(grammar, terminals, nonterminals, arrays):
+    """
+    Creates LRTable whose states look up actions and gotos in the given
+    compressed arrays.
+    """
+    from parglare.tables import LRState, LRTable, Action, REDUCE
+
+    symbols = terminals + nonterminals
+    productions = grammar.productions
+    states_data = arrays['states']
+    states = [LRState(grammar, idx, symbols[states_data[idx * _STATE_SIZE]])
+              for idx in range(len(states_data) // _STATE_SIZE)]
+
+    items = arrays['action_items']
+    actions = [Action(action, states[state_id] if state_id >= 0 else None,
+                      productions[prod_id] if prod_id >= 0 else None)
+               for action, state_id, prod_id in zip(items[0::3], items[1::3],
+                                                    items[2::3])]
+    refs = arrays['action_refs']
+    action_lists = [[actions[r] for r in refs[start:start + count]]
+                    for start, count in zip(arrays['action_lists'][0::2],
+                                            arrays['action_lists'][1::2])]
+    table = CompressedTable(states, terminals, nonterminals, action_lists,
+                            arrays)
+
+    items = arrays['expected_items']
+    expected = []
+    for start, count in zip(arrays['expected'][0::2],
+                            arrays['expected'][1::2]):
+        expected_terminals = tuple(terminals[item >> 1]
+                                   for item in items[start:start + count])
+        expected.append((expected_terminals,
+                         [bool(item & 1)
+                          for item in items[start:start + count]],
+                         frozenset(expected_terminals),
+                         set(t for t in expected_terminals if t.dynamic)))
+    items = arrays['goto_set_items']
+    goto_sets = []
+    for start, count in zip(arrays['goto_sets'][0::2],
+                            arrays['goto_sets'][1::2]):
+        goto_nonterminals = tuple(nonterminals[item]
+                                  for item in items[start:start + count])
+        goto_sets.append((goto_nonterminals, frozenset(goto_nonterminals)))
+
+    # Only states with more than one action for some terminal may have
+    # conflicts.
+    multiple = [len(action_list) > 1 for action_list in action_lists]
+    multiple_rows = set(row for row, value in zip(arrays['action_check'],
+                                                  arrays['action_value'])
+                        if row >= 0 and multiple[value])
+    conflict_states = []
+    for state in states:
+        _, default_reduction, action_row, default, expected_id, goto_set = \
+            states_data[state.state_id * _STATE_SIZE:
+                        (state.state_id + 1) * _STATE_SIZE]
+        expected_terminals, finish_flags, terminal_set, dynamic = \
+            expected[expected_id]
+        state.actions = CompressedActions(table, action_row, default,
+                                          expected_terminals, terminal_set)
+        state.finish_flags = finish_flags
+        state.dynamic = set(dynamic)
+        state.gotos = CompressedGotos(table, state.state_id,
+                                      *goto_sets[goto_set])
+        if default_reduction >= 0:
+            state.default_reduction = Action(
+                REDUCE, prod=productions[default_reduction])
+        if action_row in multiple_rows or default >= 0 and multiple[default]:
+            conflict_states.append(state)
+
+    return LRTable(states, calc_finish_flags=False,
+                   conflict_states=conflict_states)
+
+
+def _compress(table):
+    """
+    Returns terminals and non-terminals by their columns and the dict of
+    compressed arrays of the table.
+    """
+    grammar = table.states[0].grammar
+    terminals, terminal_columns = [], {}
+    nonterminals, nonterminal_columns = [], {}
+
+    def column(symbol):
+        symbols, columns = (terminals, terminal_columns) \
+            if isinstance(symbol, Terminal) \
+            else (nonterminals, nonterminal_columns)
+        if symbol not in columns:
+            columns[symbol] = len(symbols)
+            symbols.append(symbol)
+        return columns[symbol]
+
+    arrays = {name: array('i') for name in COMPRESSED_ARRAYS}
+
+    def shared(key, ids, name, items_name):
+        """
+        Returns the index of the distinct sequence given by the key. Start
+        and count of new sequences are appended to the array `name` and the
+        items to the array `items_name`.
+        """
+        if key not in ids:
+            ids[key] = len(ids)
+            items = arrays[items_name]
+            arrays[name].extend((len(items), len(key)))
+            items.extend(key)
+        return ids[key]
+
+    action_ids, list_ids, expected_ids, goto_set_ids = {}, {}, {}, {}
+    action_rows, action_row_ids = [], {}
+    gotos = []
+    states = []
+
+    def action_id(action):
+        key = (action.action,
+               action.state.state_id if action.state is not None else -1,
+               action.prod.prod_id if action.prod is not None else -1)
+        if key not in action_ids:
+            action_ids[key] = len(action_ids)
+            arrays['action_items'].extend(key)
+        return action_ids[key]
+
+    for state in table.states:
+        row = [(column(terminal),
+                shared(tuple(action_id(a) for a in actions), list_ids,
+                       'action_lists', 'action_refs'),
+                int(finish))
+               for (terminal, actions), finish
+               in zip(state.actions.items(), state.finish_flags)]
+        default = _most_common(value for _, value, _ in row)
+        explicit = tuple((col, value) for col, value, _ in row
+                         if value != default)
+        if explicit:
+            if explicit not in action_row_ids:
+                action_row_ids[explicit] = len(action_rows)
+                action_rows.append(explicit)
+            action_row = action_row_ids[explicit]
+        else:
+            action_row = -1
+        expected = shared(tuple(col * 2 + finish for col, _, finish in row),
+                          expected_ids, 'expected', 'expected_items')
+
+        goto_set = []
+        for nonterminal, target_state in state.gotos.items():
+            goto_set.append(column(nonterminal))
+            gotos.append((goto_set[-1], state.state_id,
+                          target_state.state_id))
+        goto_set = shared(tuple(goto_set), goto_set_ids, 'goto_sets',
+                          'goto_set_items')
+
+        states.append([state.symbol,
+                       state.default_reduction.prod.prod_id
+                       if state.default_reduction is not None else -1,
+                       action_row, default, expected, goto_set])
+
+    # All symbols referenced by the productions and the states have columns.
+    for production in grammar.productions:
+        column(production.symbol)
+    for state in states:
+        column(state[0])
+
+    goto_columns = [[] for _ in nonterminals]
+    for col, state_id, target in gotos:
+        goto_columns[col].append((state_id, target))
+    goto_rows, goto_row_ids = [], {}
+    for entries in goto_columns:
+        default = _most_common(target for _, target in entries)
+        explicit = tuple((state_id, target) for state_id, target in entries
+                         if target != default)
+        if explicit not in goto_row_ids:
+            goto_row_ids[explicit] = len(goto_rows)
+            goto_rows.append(explicit)
+        arrays['goto_row'].append(goto_row_ids[explicit])
+        arrays['goto_default'].append(default)
+
+    (arrays['action_base'], arrays['action_check'],
+     arrays['action_value']) = pack_rows(action_rows)
+    (arrays['goto_base'], arrays['goto_check'],
+     arrays['goto_value']) = pack_rows(goto_rows)
+
+    # Symbols of the productions and the states are given by their index in
+    # the list of all symbols, terminals first.
+    def symbol_index(symbol):
+        return terminal_columns[symbol] if isinstance(symbol, Terminal) \
+            else len(terminals) + nonterminal_columns[symbol]
+
+    arrays['productions'].extend(symbol_index(p.symbol)
+                                 for p in grammar.productions)
+    for state in states:
+        state[0] = symbol_index(state[0])
+        arrays['states'].extend(state)
+    return terminals, nonterminals, arrays
+
+
+def _most_common(values):
+    """
+    Returns the most common value or -1 if there are no values.
+    """
+    most_common = Counter(values).most_common(1)
+    return most_common[0][0] if most_common else -1
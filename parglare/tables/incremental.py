@@ -0,0 +1,140 @@
+"""
+Reuse of the LR table of the previous version of the grammar.
+
+Grammars are compared by the productions of each non-terminal and by the
+terminals (see `changed_symbols`). If the changes don't affect the table
+(e.g. only grammar actions, meta-data or comments are changed) the previous
+table is re-linked to the new grammar without any calculation (see
+`relink_table`). Otherwise, the table must be constructed from scratch.
+"""
+from collections import OrderedDict
+from itertools import chain
+from parglare.grammar import StringRecognizer, RegExRecognizer
+from parglare.tables.termset import get_terminal_index, TerminalSet
+
+
+def production_signature(production):
+    """
+    Returns a hashable signature of the production properties which
+    influence LR table.
+    """
+    return (production.symbol.fqn, tuple(s.fqn for s in production.rhs),
+            production.assoc, production.prior, production.dynamic,
+            production.nops, production.nopse)
+
+
+def terminal_signature(terminal):
+    """
+    Returns a hashable signature of the terminal properties which influence
+    LR table.
+    """
+    recognizer = terminal.recognizer
+    if type(recognizer) is StringRecognizer:
+        value = (recognizer.value, recognizer.ignore_case)
+    elif type(recognizer) is RegExRecognizer:
+        value = (recognizer._regex, recognizer.re_flags)
+    else:
+        # Custom recognizers are never considered lexically disjoint with
+        # other terminals so their implementation doesn't influence the table.
+        value = None
+    return (terminal.fqn, terminal.prior, terminal.finish, terminal.prefer,
+            terminal.dynamic, terminal.keyword, type(recognizer).__name__,
+            value)
+
+
+def changed_symbols(old_grammar, grammar):
+    """
+    Returns a set of fully qualified names of the terminals and the
+    non-terminals which are different in the given grammars. Non-terminals are
+    compared by their productions.
+    """
+    def signatures(g):
+        symbols = {t.fqn: terminal_signature(t) for t in g.terminals.values()}
+        for production in g.productions:
+            symbols.setdefault(production.symbol.fqn, []).append(
+                production_signature(production))
+        return symbols
+
+    old_symbols = signatures(old_grammar)
+    symbols = signatures(grammar)
+    return set(symbol
+               for symbol in set(old_symbols) | set(symbols)
+               if old_symbols.get(symbol) != symbols.get(symbol))
+
+
+def production_map(old_grammar, grammar, changed):
+    """
+    Returns new grammar productions keyed by the id of the corresponding
+    productions of the old grammar for all unchanged non-terminals.
+    """
+    productions = {}
+    for production in grammar.productions:
+        productions.setdefault(production.symbol.fqn, []).append(production)
+    return {p.prod_id: productions[p.symbol.fqn][p.prod_symbol_id]
+            for p in old_grammar.productions
+            if p.symbol.fqn not in changed}
+
+
+def relink_table(table, grammar):
+    """
+    Returns a copy of the given LR table whose states refer to the symbols and
+    the productions of the given grammar. Grammars must have the same
+    productions and terminals (see `changed_symbols`).
+    """
+    from parglare.tables import LRState, LRItem, LRTable, Action
+
+    old_grammar = table.states[0].grammar
+    index = get_terminal_index(grammar)
+    productions = production_map(old_grammar, grammar, set())
+    # Symbols and actions are mapped by the id of the old objects as it is
+    # much faster than hashing of grammar symbols.
+    symbols = {id(s): grammar.get_symbol(s.fqn) or s
+               for s in chain(old_grammar.terminals.values(),
+                              old_grammar.nonterminals.values())}
+
+    states = [LRState(grammar, state.state_id, symbols[id(state.symbol)])
+              for state in table.states]
+
+    # Follow bits are kept if terminals are in the same order. Follow sets and
+    # actions sharing is preserved.
+    old_index = get_terminal_index(old_grammar)
+    same_order = [t.fqn for t in old_index.terminals] == \
+        [t.fqn for t in index.terminals]
+    follows = {}
+    actions = {}
+
+    def follow(item):
+        key = id(item.follow)
+        if key not in follows:
+            bits = item.follow.bits
+            if not same_order:
+                bits = index.to_bits(symbols[id(t)]
+                                     for t in old_index.to_terminals(bits))
+            follows[key] = TerminalSet(index, bits)
+        return follows[key]
+
+    def action(a):
+        key = id(a)
+        if key not in actions:
+            actions[key] = Action(
+                a.action,
+                states[a.state.state_id] if a.state is not None else None,
+                productions[a.prod.prod_id] if a.prod is not None else None)
+        return actions[key]
+
+    for old_state, state in zip(table.states, states):
+        state.items = [LRItem(productions[i.production.prod_id], i.position,
+                              follow(i))
+                       for i in old_state.items]
+        state.actions = OrderedDict(zip(
+            [symbols[id(terminal)] for terminal in old_state.actions],
+            [list(map(action, term_actions))
+             for term_actions in old_state.actions.values()]))
+        state.gotos = OrderedDict(
+            (symbols[id(nonterminal)], states[target_state.state_id])
+            for nonterminal, target_state in old_state.gotos.items())
+        state.finish_flags = list(old_state.finish_flags)
+        if old_state.default_reduction is not None:
+            state.default_reduction = action(old_state.default_reduction)
+
+    return LRTable(states, calc_finish_flags=False)
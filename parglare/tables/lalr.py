@@ -0,0 +1,141 @@
+"""
+LALR(1) lookaheads calculation based on the relations from the paper:
+
+F. DeRemer, T. Pennello. Efficient Computation of LALR(1) Look-Ahead Sets.
+ACM Transactions on Programming Languages and Systems, 1982.
+"""
+from parglare.grammar import EMPTY, NonTerminal
+
+
+def lalr_lookaheads(states, first_sets, closures):
+    """
+    Calculates follow sets of LR items of the given LR automata states.
+
+    The follow sets of non-terminal transitions (p, A) are calculated from the
+    `reads` and `includes` relations and propagated to the items on the paths
+    of A productions starting from p (the `lookback` relation).
+
+    LR items created from the items of the previous state share the follow
+    set with them (see LRItem.get_pos_inc). Thus, `includes` and `lookback`
+    relations are established through the items grouped by the follow set
+    object. This yields the same follow sets as the iterative propagation.
+
+    Args:
+    states(list of LRState): LR automata states with items closure, GOTOs and
+        SHIFT/ACCEPT actions calculated.
+    first_sets(dict of int): FIRST sets bitmasks of the grammar symbols.
+    closures(Closures): Used for productions-by-LHS index.
+    """
+    index = closures.index
+    empty = index.terminal_bits[EMPTY]
+
+    def nullable(symbols):
+        return all(first_sets[s] & empty for s in symbols)
+
+    # Non-terminal transitions are keyed by (state_id, non-terminal).
+    transitions = []
+    direct_reads = {}
+    reads = {}
+    for state in states:
+        for symbol, target_state in state.gotos.items():
+            key = (state.state_id, symbol)
+            transitions.append(key)
+            direct_reads[key] = index.to_bits(target_state.actions)
+            reads[key] = [(target_state.state_id, s)
+                          for s in target_state.gotos
+                          if first_sets[s] & empty]
+
+    read_sets = digraph(transitions, reads, direct_reads)
+
+    # Items are grouped by the id of their follow set.
+    items = {}
+    follow_sets = dict(read_sets)
+    for state in states:
+        for item in state.items:
+            items[(state.state_id, item.production.prod_id,
+                   item.position)] = item
+            follow_sets[id(item.follow)] = item.follow.bits
+
+    # Follow each non-terminal transition through the automata along all
+    # the productions of the non-terminal. Each item on the path lookbacks
+    # to the transition and each non-terminal whose rest of the production
+    # is nullable includes the item.
+    relation = {}
+    states_by_id = {state.state_id: state for state in states}
+    for key in transitions:
+        state_id, symbol = key
+        for production in closures.productions_by_lhs[symbol]:
+            rhs = production.rhs
+            state = states_by_id[state_id]
+            for position in range(len(rhs) + 1):
+                item_follow = id(items[(state.state_id, production.prod_id,
+                                        position)].follow)
+                relation.setdefault(item_follow, []).append(key)
+                if position == len(rhs):
+                    break
+                rhs_symbol = rhs[position]
+                if isinstance(rhs_symbol, NonTerminal):
+                    if nullable(rhs[position + 1:]):
+                        relation.setdefault((state.state_id, rhs_symbol),
+                                            []).append(item_follow)
+                    state = state.gotos[rhs_symbol]
+                else:
+                    state = state.actions[rhs_symbol][0].state
+
+    follow_sets = digraph(list(follow_sets), relation, follow_sets)
+
+    for item in items.values():
+        item.follow.bits |= follow_sets[id(item.follow)]
+
+
+def digraph(nodes, relation, initial_sets):
+    """
+    Calculates F(x) = F'(x) U {F(y) | x relation y} for each of the nodes where
+    F' are initial sets. Strongly connected components of the relation graph
+    get the same set. Sets are represented as int bitmasks.
+
+    Args:
+    nodes(iterable): Graph nodes.
+    relation(dict): Lists of related nodes keyed by a node.
+    initial_sets(dict): Initial bitmasks keyed by a node.
+
+    Returns:
+    dict of int bitmasks keyed by a node.
+    """
+    infinity = float('inf')
+    depth = {}
+    sets = {}
+    stack = []
+    for node in nodes:
+        if node in depth:
+            continue
+        stack.append(node)
+        depth[node] = len(stack)
+        sets[node] = initial_sets[node]
+        to_process = [(node, len(stack), iter(relation.get(node, [])))]
+        while to_process:
+            x, x_depth, related = to_process[-1]
+            for y in related:
+                if y not in depth:
+                    stack.append(y)
+                    depth[y] = len(stack)
+                    sets[y] = initial_sets[y]
+                    to_process.append(
+                        (y, len(stack), iter(relation.get(y, []))))
+                    break
+                depth[x] = min(depth[x], depth[y])
+                sets[x] |= sets[y]
+            else:
+                to_process.pop()
+                if depth[x] == x_depth:
+                    while True:
+                        top = stack.pop()
+                        depth[top] = infinity
+                        sets[top] = sets[x]
+                        if top == x:
+                            break
+                if to_process:
+                    parent = to_process[-1][0]
+                    depth[parent] = min(depth[parent], depth[x])
+                    sets[parent] |= sets[x]
+    return sets
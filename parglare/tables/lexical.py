@@ -0,0 +1,257 @@
+"""
+Static analysis of the lexical overlap of the grammar terminals.
+
+Two terminals can't both match at the same input position if the sets of
+characters their matches may start with are disjoint. Sets of the first
+characters are calculated from the string values and from the structure of
+regular expressions. The analysis is conservative, i.e. if the first
+characters can't be determined the terminal is considered to overlap with all
+other terminals.
+"""
+import re
+import string
+from parglare.grammar import StringRecognizer, RegExRecognizer, STOP, EMPTY
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+ASCII_ALL = (1 << 128) - 1
+
+# Non-ASCII characters which match ASCII letters in case-insensitive regular
+# expressions: LATIN CAPITAL LETTER I WITH DOT ABOVE, LATIN SMALL LETTER
+# DOTLESS I, LATIN SMALL LETTER LONG S and KELVIN SIGN.
+NON_ASCII_FOLDS = '\u0130\u0131\u017f\u212a'
+
+
+def _ascii_mask(chars):
+    mask = 0
+    for c in chars:
+        mask |= 1 << ord(c)
+    return mask
+
+
+_CATEGORIES = {
+    'DIGIT': _ascii_mask('0123456789'),
+    'WORD': _ascii_mask('abcdefghijklmnopqrstuvwxyz'
+                        'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'),
+    'SPACE': _ascii_mask([chr(c) for c in range(128) if chr(c).isspace()]),
+    'LINEBREAK': _ascii_mask('\n'),
+}
+
+
+class CharSet(object):
+    """
+    A set of characters. ASCII characters are given by the bitmask while all
+    non-ASCII characters are represented by a single flag.
+
+    Attributes:
+    ascii(int): Bitmask of ASCII characters code points.
+    non_ascii(bool): True if the set might contain non-ASCII characters.
+    """
+    __slots__ = ['ascii', 'non_ascii']
+
+    def __init__(self, ascii=0, non_ascii=False):
+        self.ascii = ascii
+        self.non_ascii = non_ascii
+
+    def __or__(self, other):
+        return CharSet(self.ascii | other.ascii,
+                       self.non_ascii or other.non_ascii)
+
+    def __repr__(self):
+        return "CharSet({})".format(
+            "".join(chr(c) for c in range(128) if self.ascii & (1 << c))
+            + ("..." if self.non_ascii else ""))
+
+    def complement(self):
+        return CharSet(ASCII_ALL & ~self.ascii, True)
+
+    def isdisjoint(self, other):
+        return not (self.ascii & other.ascii) \
+            and not (self.non_ascii and other.non_ascii)
+
+    @classmethod
+    def from_chars(cls, chars, ignore_case=False):
+        char_set = cls()
+        for c in chars:
+            char_set = char_set | cls._from_code(ord(c), ignore_case)
+        return char_set
+
+    @classmethod
+    def _from_code(cls, code, ignore_case=False):
+        char = chr(code)
+        if code >= 128:
+            char_set = cls(0, True)
+            if ignore_case and char in NON_ASCII_FOLDS:
+                char_set.ascii = _ascii_folds(char)
+            return char_set
+        char_set = cls(1 << code)
+        if ignore_case:
+            # ASCII letters are also matched by some non-ASCII characters
+            # (e.g. 'k' by KELVIN SIGN).
+            char_set = cls(char_set.ascii
+                           | _ascii_mask(char.lower() + char.upper()), True)
+        return char_set
+
+
+def _ascii_folds(char):
+    """
+    Returns the bitmask of ASCII letters matched by the given character in
+    case-insensitive regular expressions.
+    """
+    pattern = re.compile(re.escape(char), re.IGNORECASE)
+    return _ascii_mask(c for c in string.ascii_letters
+                       if pattern.fullmatch(c))
+
+
+def first_chars(recognizer):
+    """
+    Returns CharSet of the first characters of the non-empty matches of the
+    given recognizer or None if it can't be determined.
+    """
+    if type(recognizer) is StringRecognizer:
+        return CharSet.from_chars(recognizer.value[:1],
+                                  recognizer.ignore_case)
+    if type(recognizer) is RegExRecognizer:
+        try:
+            pattern = sre_parse.parse(recognizer._regex,
+                                      recognizer.re_flags)
+        except Exception:
+            return None
+        ignore_case = bool(recognizer.regex.flags & re.IGNORECASE)
+        result = _first_seq(list(pattern), ignore_case)
+        return result[0] if result else None
+    return None
+
+
+def get_terminal_first_chars(grammar):
+    """
+    Returns the first characters of all grammar terminals keyed by the
+    terminal. Calculated on the first call and cached in the grammar.
+    """
+    if not hasattr(grammar, '_terminal_first_chars'):
+        terminal_first_chars = {}
+        for terminal in grammar.terminals.values():
+            if terminal is STOP or terminal is EMPTY:
+                # Special terminals never match any characters.
+                terminal_first_chars[terminal] = CharSet()
+            else:
+                terminal_first_chars[terminal] = \
+                    first_chars(terminal.recognizer)
+        grammar._terminal_first_chars = terminal_first_chars
+    return grammar._terminal_first_chars
+
+
+def can_overlap(first_chars_1, first_chars_2):
+    """
+    Returns True if the terminals with the given first characters might match
+    at the same input position.
+    """
+    if first_chars_1 is None or first_chars_2 is None:
+        return True
+    return not first_chars_1.isdisjoint(first_chars_2)
+
+
+def _first_seq(items, ignore_case):
+    """
+    Returns a tuple of CharSet and a nullable flag for the sequence of regex
+    items or None if it can't be determined.
+    """
+    char_set = CharSet()
+    for op, av in items:
+        result = _first_item(op, av, ignore_case)
+        if result is None:
+            return None
+        item_set, nullable = result
+        char_set = char_set | item_set
+        if not nullable:
+            return char_set, False
+    return char_set, True
+
+
+def _first_item(op, av, ignore_case):
+    c = sre_constants
+    if op == c.LITERAL:
+        return CharSet._from_code(av, ignore_case), False
+    if op == c.NOT_LITERAL:
+        return CharSet._from_code(av, ignore_case).complement(), False
+    if op == c.ANY:
+        return CharSet(ASCII_ALL, True), False
+    if op == c.IN:
+        return _first_in(av, ignore_case), False
+    if op == c.BRANCH:
+        char_set = CharSet()
+        nullable = False
+        for branch in av[1]:
+            result = _first_seq(list(branch), ignore_case)
+            if result is None:
+                return None
+            char_set = char_set | result[0]
+            nullable = nullable or result[1]
+        return char_set, nullable
+    if op == c.SUBPATTERN:
+        if len(av) == 4:
+            # Scoped flags (group, add_flags, del_flags, pattern)
+            if av[1] & c.SRE_FLAG_IGNORECASE:
+                ignore_case = True
+            if av[2] & c.SRE_FLAG_IGNORECASE:
+                ignore_case = False
+        return _first_seq(list(av[-1]), ignore_case)
+    if op in (c.MAX_REPEAT, c.MIN_REPEAT) \
+            or op == getattr(c, 'POSSESSIVE_REPEAT', None):
+        min_repeat, max_repeat, item = av
+        if max_repeat == 0:
+            return CharSet(), True
+        result = _first_seq(list(item), ignore_case)
+        if result is None:
+            return None
+        return result[0], result[1] or min_repeat == 0
+    if op == getattr(c, 'ATOMIC_GROUP', None):
+        return _first_seq(list(av), ignore_case)
+    if op in (c.AT, c.ASSERT, c.ASSERT_NOT):
+        # Zero-width assertions.
+        return CharSet(), True
+    return None
+
+
+def _first_in(items, ignore_case):
+    c = sre_constants
+    char_set = CharSet()
+    negate = False
+    for op, av in items:
+        if op == c.NEGATE:
+            negate = True
+        elif op == c.LITERAL:
+            char_set = char_set | CharSet._from_code(av, ignore_case)
+        elif op == c.RANGE:
+            low, high = av
+            if high >= 128 or ignore_case:
+                char_set.non_ascii = True
+            for code in range(low, min(high, 127) + 1):
+                char_set = char_set | CharSet._from_code(code, ignore_case)
+            if ignore_case:
+                for char in NON_ASCII_FOLDS:
+                    if low <= ord(char) <= high:
+                        char_set.ascii |= _ascii_folds(char)
+        elif op == c.CATEGORY:
+            name = str(av).upper()
+            category = None
+            for category_name, mask in _CATEGORIES.items():
+                if category_name in name:
+                    category = mask
+                    break
+            if category is None:
+                return CharSet(ASCII_ALL, True)
+            category = CharSet(category, True)
+            if 'NOT' in name:
+                category = category.complement()
+            char_set = char_set | category
+        else:
+            return CharSet(ASCII_ALL, True)
+    if negate:
+        char_set = char_set.complement()
+    return char_set
@@ -0,0 +1,129 @@
+"""
+Minimal LR(1) automata calculated from the canonical LR(1) automata.
+
+States of the canonical LR(1) automata with the same LR(0) core are merged as
+in LALR(1) but only if merging doesn't introduce new conflicts. Groups of
+merged states are refined so that the transitions of the resulting automata
+stay deterministic. For grammars without LALR specific conflicts the result has
+the same number of states as the LALR(1) automata.
+"""
+from parglare.tables.minimize import refine_blocks
+from parglare.tables.termset import TerminalSet
+
+
+def merge_compatible_states(states, index):
+    """
+    Merges canonical LR(1) states which have the same core if the merge doesn't
+    introduce new conflicts.
+
+    Args:
+    states(list of LRState): Canonical LR(1) automata states with items
+        closure, GOTOs and SHIFT/ACCEPT actions calculated. States are ordered
+        by state_id.
+    index(TerminalIndex): Terminal ids of the follow sets bitmasks.
+
+    Returns:
+    list of LRState: States of the minimal automata renumbered in order.
+    """
+    reductions = {state.state_id: _reductions(state, index)
+                  for state in states}
+
+    # Start with LALR(1) partition, i.e. states grouped by the core.
+    blocks = {}
+    for state in states:
+        blocks.setdefault(state.kernel_signature, []).append(state)
+    blocks = list(blocks.values())
+
+    while True:
+        # Split blocks into the groups which can be merged without new
+        # conflicts.
+        compatible_blocks = []
+        for block in blocks:
+            compatible_blocks.extend(_split_compatible(block, reductions))
+
+        # Refine blocks so that all states in the same block go to the same
+        # block on each symbol.
+        blocks = refine_blocks(compatible_blocks)
+        if len(blocks) == len(compatible_blocks):
+            break
+
+    # The first state in each block is the representative state of the block.
+    # States keep their relative order so that the start state stays first.
+    blocks.sort(key=lambda b: b[0].state_id)
+    block_state = {}
+    for block in blocks:
+        for state in block:
+            block_state[id(state)] = block[0]
+
+    merged_states = []
+    for block in blocks:
+        state = block[0]
+
+        # Follow sets of items may be shared between states (see
+        # LRItem.get_pos_inc) so new sets are created for the merged items.
+        if len(block) > 1:
+            items = {(i.production.prod_id, i.position): i
+                     for i in state.items}
+            follows = {key: 0 for key in items}
+            for other in block:
+                for item in other.items:
+                    follows[(item.production.prod_id, item.position)] \
+                        |= item.follow.bits
+            for key, item in items.items():
+                item.follow = TerminalSet(index, follows[key])
+
+        for symbol, target_state in state.gotos.items():
+            state.gotos[symbol] = block_state[id(target_state)]
+        for actions in state.actions.values():
+            for action in actions:
+                if action.state is not None:
+                    action.state = block_state[id(action.state)]
+
+        merged_states.append(state)
+
+    for state_id, state in enumerate(merged_states):
+        state.state_id = state_id
+
+    return merged_states
+
+
+def _reductions(state, index):
+    """
+    Returns productions reduced by the state keyed by a terminal. SHIFT/ACCEPT
+    actions are given by the state core so they are the same for all states
+    in the block.
+    """
+    reductions = {}
+    for item in state.items:
+        if item.is_at_end:
+            for terminal in index.to_terminals(item.follow.bits):
+                reductions.setdefault(terminal, set()).add(item.production)
+    return {terminal: frozenset(prods)
+            for terminal, prods in reductions.items()}
+
+
+def _split_compatible(block, reductions):
+    """
+    Greedily splits block into groups whose states can be merged without
+    introducing new conflicts. A merge is allowed if for each terminal the
+    merged reductions are the same as in one of the merged states.
+    """
+    groups = []
+    for state in block:
+        state_reductions = reductions[state.state_id]
+        for group_states, group_reductions in groups:
+            merged = {}
+            for terminal, prods in state_reductions.items():
+                group_prods = group_reductions.get(terminal, prods)
+                all_prods = prods | group_prods
+                if all_prods != prods and all_prods != group_prods:
+                    break
+                merged[terminal] = all_prods
+            else:
+                group_states.append(state)
+                group_reductions.update(merged)
+                break
+        else:
+            groups.append(([state], dict(state_reductions)))
+
+    return [group_states for group_states, _ in groups]
@@ -0,0 +1,122 @@
+"""
+Minimization of the LR automata states.
+
+States with the same symbol whose ACTION and GOTO rows are the same, after
+their target states are merged, are merged into a single state. This is
+the minimization of the automata where rows are compared by the actions and
+the blocks of the target states.
+"""
+from itertools import chain
+
+
+def minimize_states(states, default_reductions=False):
+    """
+    Merges states of the LR automata with the same ACTION and GOTO rows.
+
+    Args:
+    states(list of LRState): LR automata states with all actions calculated.
+        States are ordered by state_id.
+    default_reductions(bool): If True, states whose only action for all
+        terminals is the same REDUCE are merged even if their lookaheads
+        differ. Lookaheads of the merged state are the union of lookaheads.
+        This should be used only with parsers that reduce by the default
+        reduction without looking at the lookahead token as the merged state
+        may expect tokens not valid in some of the merged states.
+
+    Returns:
+    list of LRState: States of the minimized automata renumbered in order.
+    """
+    blocks = {}
+    for state in states:
+        blocks.setdefault(_row_signature(state, default_reductions),
+                          []).append(state)
+    blocks = refine_blocks(list(blocks.values()))
+
+    # The first state in each block is the representative state of the block.
+    # States keep their relative order so that the start state stays first.
+    blocks.sort(key=lambda b: b[0].state_id)
+    block_state = {}
+    for block in blocks:
+        for state in block:
+            block_state[id(state)] = block[0]
+
+    minimized_states = []
+    for block in blocks:
+        state = block[0]
+
+        # Merge lookaheads of default reductions.
+        for other in block[1:]:
+            for terminal in other.actions:
+                if terminal not in state.actions:
+                    state.actions[terminal] = \
+                        list(next(iter(state.actions.values())))
+
+        for symbol, target_state in state.gotos.items():
+            state.gotos[symbol] = block_state[id(target_state)]
+        for actions in state.actions.values():
+            for action in actions:
+                if action.state is not None:
+                    action.state = block_state[id(action.state)]
+
+        minimized_states.append(state)
+
+    for state_id, state in enumerate(minimized_states):
+        state.state_id = state_id
+
+    return minimized_states
+
+
+def refine_blocks(blocks):
+    """
+    Splits blocks of states until all states in each block have transitions
+    by the same symbols to the same blocks.
+
+    Args:
+    blocks(list of lists of LRState):
+
+    Returns:
+    list of lists of LRState: Refined blocks.
+    """
+    while True:
+        block_ids = {}
+        for block_id, block in enumerate(blocks):
+            for state in block:
+                block_ids[id(state)] = block_id
+
+        new_blocks = []
+        for block in blocks:
+            split = {}
+            for state in block:
+                signature = frozenset(chain(
+                    ((symbol, block_ids[id(s)])
+                     for symbol, s in state.gotos.items()),
+                    ((symbol, block_ids[id(a.state)])
+                     for symbol, actions in state.actions.items()
+                     for a in actions if a.state is not None)))
+                split.setdefault(signature, []).append(state)
+            new_blocks.extend(split.values())
+
+        if len(new_blocks) == len(blocks):
+            return new_blocks
+        blocks = new_blocks
+
+
+def _row_signature(state, default_reductions):
+    """
+    Returns a hashable signature of the state ACTION and GOTO rows without
+    target states.
+    """
+    gotos = frozenset(state.gotos)
+    if default_reductions:
+        prods = set(a.prod for actions in state.actions.values()
+                    for a in actions)
+        if len(prods) == 1 \
+                and all(len(actions) == 1
+                        for actions in state.actions.values()) \
+                and next(iter(prods)) is not None:
+            return (state.symbol, gotos, next(iter(prods)).prod_id)
+
+    return (state.symbol, gotos, frozenset(
+        (terminal, tuple((a.action, a.prod.prod_id if a.prod else None)
+                         for a in actions))
+        for terminal, actions in state.actions.items()))
@@ -1,5 +1,24 @@
 import json
+import os
+import sys
+from array import array
+from bisect import bisect_right
 from collections import OrderedDict
+from contextlib import contextmanager
+
+# Binary table format (see `table_to_binary`). All integers are 32-bit
+# little-endian. Version 2 added the table key.
+BINARY_MAGIC = b'PGLRTBL\0'
+BINARY_VERSION = 2
+# Size of the table key stored in the binary formats (SHA-256 digest).
+KEY_SIZE = 32
+_HEADER_FIELDS = ('version', 'symbols_size', 'productions', 'states',
+                  'actions', 'action_refs', 'action_items', 'gotos')
+# Number of ints per record of the packed arrays.
+_STATE_SIZE = 6
+_ACTION_SIZE = 4
+_ACTION_ITEM_SIZE = 3
+_GOTO_SIZE = 2
 
 
 def table_to_serializable(table):
@@ -13,33 +32,46 @@ def table_to_serializable(table):
     return states
 
 
-def save_table(file_name, table):
-    with open(file_name, 'w') as f:
-        json.dump(table_to_serializable(table), f, sort_keys=True)
+def save_table(file_name, table, binary=False, compressed=False, key=None):
+    """
+    Saves the table to the given file. By default the table is saved as JSON.
+    If `binary` is True the binary table format is used. If `compressed` is
+    True the compressed table format is used (see
+    `parglare.tables.compress`).
+
+    `key` is the hex digest identifying the grammar and the options the table
+    is created for (see `parglare.tables.cache.table_cache_key`). It is stored
+    with the table and checked by `load_table`.
+
+    The table is written to a temporary file which is then renamed so that
+    concurrent readers never see a partially written table.
+    """
+    if compressed:
+        from parglare.tables.compress import table_to_compressed
+        with _atomic_write(file_name, 'wb') as f:
+            f.write(table_to_compressed(table, key))
+    elif binary:
+        with _atomic_write(file_name, 'wb') as f:
+            f.write(table_to_binary(table, key))
+    else:
+        with _atomic_write(file_name, 'w') as f:
+            json.dump({'key': key, 'states': table_to_serializable(table)},
+                      f, sort_keys=True)
 
 
 def table_from_serializable(serialized_states, grammar):
     """Convert serializable representation of a parsing table into
-    LRTable object."""
-    from parglare.tables import LRState, LRTable, Action
+    LRTable object. Actions and gotos of each state are unpacked on the first
+    access (see `LazyLRState`)."""
+    from parglare.tables import LazyLRState, LRTable, Action, REDUCE
 
-    states = []
     states_dict = {}
-    for json_state in serialized_states:
-        state = LRState(grammar, json_state['state_id'],
-                        grammar.get_symbol(json_state['symbol']))
-        states_dict[state.state_id] = state
-        state.finish_flags = json_state['finish_flags']
-        state.actions = json_state['actions']
-        state.gotos = json_state['gotos']
-        states.append(state)
-
-    # Unpack actions and gotos
-    for state in states:
+    json_states = {}
 
+    def decode(state):
+        json_state = json_states.pop(state.state_id)
         actions = OrderedDict()
-        for json_action_fqn in state.actions:
-            terminal_fqn, json_actions = json_action_fqn
+        for terminal_fqn, json_actions in json_state['actions']:
             term_acts = []
             for json_action in json_actions:
                 if 'state_id' in json_action:
@@ -55,22 +87,315 @@ def table_from_serializable(serialized_states, grammar):
 
             actions[grammar.get_terminal(terminal_fqn)] = term_acts
         state.actions = actions
+        state.finish_flags = json_state['finish_flags']
+        state.dynamic = set(t for t in actions if t.dynamic)
 
         gotos = OrderedDict()
-        for json_goto_fqn in state.gotos:
-            nonterm_fqn, goto_state = json_goto_fqn
+        for nonterm_fqn, goto_state in json_state['gotos']:
             gotos[grammar.get_nonterminal(nonterm_fqn)] = \
                 states_dict[goto_state]
         state.gotos = gotos
 
-    table = LRTable(states, calc_finish_flags=False)
+    states = []
+    conflict_states = []
+    for json_state in serialized_states:
+        state = LazyLRState(grammar, json_state['state_id'],
+                            grammar.get_symbol(json_state['symbol']), decode)
+        states_dict[state.state_id] = state
+        json_states[state.state_id] = json_state
+        if json_state.get('default_reduction') is not None:
+            state.default_reduction = Action(
+                REDUCE,
+                prod=grammar.productions[json_state['default_reduction']])
+        if any(len(json_actions) > 1
+               for _, json_actions in json_state['actions']):
+            conflict_states.append(state)
+        states.append(state)
+
+    return LRTable(states, calc_finish_flags=False,
+                   conflict_states=conflict_states)
 
-    return table
 
+def load_table(file_name, grammar, key=None):
+    """
+    Loads the table from the given file. The format of the file, JSON, binary
+    or compressed, is detected automatically.
 
-def load_table(file_name, grammar):
+    If `key` is given, raises ValueError if the table is not saved with the
+    same key (see `save_table`).
+    """
+    from parglare.tables.compress import COMPRESSED_MAGIC, \
+        table_from_compressed
+    magic = _read_magic(file_name)
+    if magic in (BINARY_MAGIC, COMPRESSED_MAGIC):
+        # The arrays are copied out of the buffer so the file is read at
+        # once instead of being mapped.
+        with open(file_name, 'rb') as f:
+            buffer = f.read()
+        if magic == COMPRESSED_MAGIC:
+            return table_from_compressed(buffer, grammar, key)
+        return table_from_binary(buffer, grammar, key)
     with open(file_name) as f:
-        return table_from_serializable(json.load(f), grammar)
+        serialized = json.load(f)
+    # Tables saved by older versions are lists of states without the key.
+    if isinstance(serialized, dict):
+        check_key(serialized['key'], key)
+        serialized = serialized['states']
+    else:
+        check_key(None, key)
+    return table_from_serializable(serialized, grammar)
+
+
+def is_binary_table(file_name):
+    """
+    Returns True if the given table file is in the binary format.
+    """
+    return _read_magic(file_name) == BINARY_MAGIC
+
+
+def is_compressed_table(file_name):
+    """
+    Returns True if the given table file is in the compressed format.
+    """
+    from parglare.tables.compress import COMPRESSED_MAGIC
+    return _read_magic(file_name) == COMPRESSED_MAGIC
+
+
+def table_to_binary(table, key=None):
+    """
+    Converts the table to the binary format. The layout is:
+
+    - magic bytes and the header with the format version and the sizes of
+      the sections,
+    - the table key (see `save_table`), zeros if not given,
+    - symbols fully qualified names as UTF-8 separated by new lines padded to
+      4 bytes,
+    - LHS symbol index of each production,
+    - states: symbol index, default reduction production id (-1 if none),
+      actions start and count, gotos start and count,
+    - actions: terminal symbol index, finish flag, action references start
+      and count,
+    - action references: indexes of the action items,
+    - action items: action, target state id and production id (-1 if none).
+      Each distinct action is stored only once,
+    - gotos: non-terminal symbol index and target state id.
+    """
+    grammar = table.states[0].grammar
+    symbols = []
+    symbol_ids = {}
+
+    def symbol_id(symbol):
+        if symbol not in symbol_ids:
+            symbol_ids[symbol] = len(symbols)
+            symbols.append(symbol)
+        return symbol_ids[symbol]
+
+    action_ids = {}
+    action_items = array('i')
+
+    def action_id(action):
+        key = (action.action,
+               action.state.state_id if action.state is not None else -1,
+               action.prod.prod_id if action.prod is not None else -1)
+        if key not in action_ids:
+            action_ids[key] = len(action_ids)
+            action_items.extend(key)
+        return action_ids[key]
+
+    productions = array('i', [symbol_id(p.symbol)
+                              for p in grammar.productions])
+    states = array('i')
+    actions = array('i')
+    action_refs = array('i')
+    gotos = array('i')
+    for state in table.states:
+        states.extend((symbol_id(state.symbol),
+                       state.default_reduction.prod.prod_id
+                       if state.default_reduction is not None else -1,
+                       len(actions) // _ACTION_SIZE, len(state.actions),
+                       len(gotos) // _GOTO_SIZE, len(state.gotos)))
+        for (terminal, term_actions), finish in zip(state.actions.items(),
+                                                    state.finish_flags):
+            actions.extend((symbol_id(terminal), int(finish),
+                            len(action_refs), len(term_actions)))
+            action_refs.extend(action_id(a) for a in term_actions)
+        for nonterminal, target_state in state.gotos.items():
+            gotos.extend((symbol_id(nonterminal), target_state.state_id))
+
+    names = '\n'.join(s.fqn for s in symbols).encode('utf-8')
+    names += b'\0' * (-len(names) % 4)
+    header = array('i', [BINARY_VERSION, len(names), len(grammar.productions),
+                         len(table.states), len(actions) // _ACTION_SIZE,
+                         len(action_refs),
+                         len(action_items) // _ACTION_ITEM_SIZE,
+                         len(gotos) // _GOTO_SIZE])
+
+    arrays = [header, productions, states, actions, action_refs,
+              action_items, gotos]
+    if sys.byteorder == 'big':
+        for a in arrays:
+            a.byteswap()
+    return b''.join([BINARY_MAGIC, arrays[0].tobytes(), pack_key(key), names]
+                    + [a.tobytes() for a in arrays[1:]])
+
+
+def table_from_binary(buffer, grammar, key=None):
+    """
+    Converts the table in the binary format to LRTable object. The buffer can
+    be any object supporting the buffer protocol (e.g. `bytes`). Integer
+    arrays are copied from the buffer without parsing. Actions and gotos of
+    each state are decoded on the first access (see `LazyLRState`).
+
+    Raises ValueError if the buffer is not a binary table of the supported
+    version or if the table doesn't match the grammar or the given key.
+    """
+    from parglare.tables import LazyLRState, LRTable, Action, REDUCE
+
+    with memoryview(buffer) as view:
+        offset = len(BINARY_MAGIC)
+        if bytes(view[:offset]) != BINARY_MAGIC:
+            raise ValueError('Not a binary parglare table.')
+
+        def ints(count):
+            nonlocal offset
+            end = offset + 4 * count
+            values = array('i')
+            values.frombytes(view[offset:end])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset = end
+            return values
+
+        header = dict(zip(_HEADER_FIELDS, ints(len(_HEADER_FIELDS))))
+        if header['version'] not in (1, BINARY_VERSION):
+            raise ValueError('Unsupported binary table version {}.'.format(
+                header['version']))
+        stored_key = None
+        if header['version'] > 1:
+            stored_key = unpack_key(view[offset:offset + KEY_SIZE])
+            offset += KEY_SIZE
+        check_key(stored_key, key)
+        productions = grammar.productions
+        if header['productions'] != len(productions):
+            raise ValueError('Table doesn\'t match the grammar.')
+
+        names = bytes(view[offset:offset + header['symbols_size']])
+        offset += header['symbols_size']
+        # Each symbol is resolved only once.
+        symbols = [grammar.get_symbol(name) for name in
+                   names.rstrip(b'\0').decode('utf-8').split('\n')]
+
+        if any(symbols[symbol] is not production.symbol
+               for symbol, production in zip(ints(len(productions)),
+                                             productions)):
+            raise ValueError('Table doesn\'t match the grammar.')
+        states_data = ints(header['states'] * _STATE_SIZE)
+        actions_data = ints(header['actions'] * _ACTION_SIZE)
+        refs_data = ints(header['action_refs'])
+        items_data = ints(header['action_items'] * _ACTION_ITEM_SIZE)
+        gotos_data = ints(header['gotos'] * _GOTO_SIZE)
+
+    def decode(state):
+        _, _, actions_start, actions_count, gotos_start, gotos_count = \
+            states_data[state.state_id * _STATE_SIZE:
+                        (state.state_id + 1) * _STATE_SIZE]
+
+        row = actions_data[actions_start * _ACTION_SIZE:
+                           (actions_start + actions_count) * _ACTION_SIZE]
+        state.actions = OrderedDict(zip(
+            [symbols[terminal] for terminal in row[0::4]],
+            [[actions[r] for r in refs_data[start:start + count]]
+             for start, count in zip(row[2::4], row[3::4])]))
+        state.finish_flags = [bool(finish) for finish in row[1::4]]
+        state.dynamic = set(t for t in state.actions if t.dynamic)
+
+        row = gotos_data[gotos_start * _GOTO_SIZE:
+                         (gotos_start + gotos_count) * _GOTO_SIZE]
+        state.gotos = OrderedDict(zip(
+            [symbols[nonterminal] for nonterminal in row[0::2]],
+            [states[state_id] for state_id in row[1::2]]))
+
+    states = []
+    for idx in range(header['states']):
+        symbol, default_reduction = states_data[idx * _STATE_SIZE:
+                                                idx * _STATE_SIZE + 2]
+        state = LazyLRState(grammar, idx, symbols[symbol], decode)
+        if default_reduction >= 0:
+            state.default_reduction = Action(
+                REDUCE, prod=productions[default_reduction])
+        states.append(state)
+
+    # Distinct actions are shared between states.
+    actions = [Action(action, states[state_id] if state_id >= 0 else None,
+                      productions[prod_id] if prod_id >= 0 else None)
+               for action, state_id, prod_id in zip(items_data[0::3],
+                                                    items_data[1::3],
+                                                    items_data[2::3])]
+
+    # Only states with more than one action for some terminal may have
+    # conflicts. The state of an action is the last one starting before it.
+    conflict_states = []
+    if header['action_refs'] > header['actions']:
+        actions_starts = states_data[2::_STATE_SIZE]
+        for idx, count in enumerate(actions_data[3::_ACTION_SIZE]):
+            if count > 1:
+                state = states[bisect_right(actions_starts, idx) - 1]
+                if not conflict_states or conflict_states[-1] is not state:
+                    conflict_states.append(state)
+
+    return LRTable(states, calc_finish_flags=False,
+                   conflict_states=conflict_states)
+
+
+def pack_key(key):
+    """
+    Returns the table key as bytes stored in the binary formats.
+    """
+    import binascii
+    return binascii.unhexlify(key) if key else b'\0' * KEY_SIZE
+
+
+def unpack_key(data):
+    """
+    Returns the table key from the bytes stored in the binary formats or None
+    if the key is not stored.
+    """
+    import binascii
+    data = bytes(data)
+    return binascii.hexlify(data).decode('ascii') if any(data) else None
+
+
+def check_key(stored_key, key):
+    """
+    Raises ValueError if the key is given and differs from the stored key.
+    """
+    if key is not None and stored_key != key:
+        raise ValueError('Table doesn\'t match the grammar.')
+
+
+def _read_magic(file_name):
+    with open(file_name, 'rb') as f:
+        return f.read(len(BINARY_MAGIC))
+
+
+@contextmanager
+def _atomic_write(file_name, mode):
+    import binascii
+    tmp_file_name = os.path.join(
+        os.path.dirname(os.path.abspath(file_name)), '.{}.{}.tmp'.format(
+            os.path.basename(file_name),
+            binascii.hexlify(os.urandom(8)).decode('ascii')))
+    # The permissions of a regular new file, i.e. 0o666 with the process
+    # umask applied by the OS.
+    fd = os.open(tmp_file_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY
+                 | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        os.remove(tmp_file_name)
+        raise
 
 
 def _dump_state(state):
@@ -84,6 +409,8 @@ def _dump_state(state):
     s['gotos'] = [[nonterminal.fqn, st.state_id]
                   for nonterminal, st in goto_items]
     s['finish_flags'] = state.finish_flags
+    if state.default_reduction is not None:
+        s['default_reduction'] = state.default_reduction.prod.prod_id
 
     return s
 
@@ -0,0 +1,127 @@
+"""
+Sets of terminals represented as integer bitmasks.
+
+Terminals of the grammar are given dense integer ids and a set of terminals is
+an int whose bit at the position of the terminal id is set if the terminal is
+in the set. Union and subset tests are thus single int operations.
+"""
+
+
+def get_terminal_index(grammar):
+    """
+    Returns TerminalIndex for the given grammar. The index is created on the
+    first call and cached in the grammar.
+    """
+    if not hasattr(grammar, '_terminal_index'):
+        grammar._terminal_index = TerminalIndex(grammar.terminals.values())
+    return grammar._terminal_index
+
+
+class TerminalIndex(object):
+    """
+    Dense integer ids of terminals used for bitmask representation of terminal
+    sets.
+
+    Attributes:
+    terminals(list of Terminal): Terminals indexed by their id.
+    terminal_bits(dict): Bitmask of each terminal keyed by the terminal.
+    """
+    __slots__ = ['terminals', 'terminal_bits']
+
+    def __init__(self, terminals):
+        self.terminals = list(terminals)
+        self.terminal_bits = {t: 1 << idx
+                              for idx, t in enumerate(self.terminals)}
+
+    def to_bits(self, terminals):
+        """
+        Returns a bitmask for the given iterable of terminals.
+        """
+        terminal_bits = self.terminal_bits
+        bits = 0
+        for terminal in terminals:
+            bits |= terminal_bits[terminal]
+        return bits
+
+    def to_terminals(self, bits):
+        """
+        Returns a list of terminals from the given bitmask ordered by the
+        terminal id.
+        """
+        terminals = self.terminals
+        result = []
+        while bits:
+            lowest = bits & -bits
+            result.append(terminals[lowest.bit_length() - 1])
+            bits ^= lowest
+        return result
+
+
+class TerminalSet(object):
+    """
+    A mutable set of terminals represented by an integer bitmask. Supports
+    the subset of `set` API used for LR items follow sets.
+
+    Attributes:
+    index(TerminalIndex): Used to convert to/from terminals.
+    bits(int): The bitmask of the set.
+    """
+    __slots__ = ['index', 'bits']
+
+    def __init__(self, index=None, bits=0):
+        self.index = index
+        self.bits = bits
+
+    def _other_bits(self, other):
+        if isinstance(other, TerminalSet):
+            return other.bits
+        return self.index.to_bits(other)
+
+    def __iter__(self):
+        if not self.bits:
+            return iter([])
+        return iter(self.index.to_terminals(self.bits))
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, terminal):
+        bit = self.index.terminal_bits.get(terminal) if self.index else None
+        return bool(bit and self.bits & bit)
+
+    def __eq__(self, other):
+        if isinstance(other, TerminalSet):
+            return self.bits == other.bits
+        return set(self) == set(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "TerminalSet({})".format(
+            ", ".join([str(t) for t in self]))
+
+    def add(self, terminal):
+        self.bits |= self.index.terminal_bits[terminal]
+
+    def update(self, other):
+        self.bits |= self._other_bits(other)
+
+    def copy(self):
+        return TerminalSet(self.index, self.bits)
+
+    def difference(self, other):
+        return TerminalSet(self.index, self.bits & ~self._other_bits(other))
+
+    def intersection(self, other):
+        return TerminalSet(self.index, self.bits & self._other_bits(other))
+
+    def issubset(self, other):
+        return not self.bits & ~self._other_bits(other)
@@ -1,5 +1,4 @@
 import sys
-import click
 
 if sys.version < '3':
     text = unicode  # NOQA
@@ -14,11 +13,13 @@ S_EMPH = {'fg': 'yellow'}
 
 
 def prints(message, s={}):
+    import click
     click.echo(style(message, s), color=colors)
 
 
 def style_message(message, style):
     if colors:
+        import click
         return click.style(message, **style)
     else:
         return message
@@ -3,9 +3,28 @@
 import sys
 import os
 from setuptools import setup
+from setuptools.command.build_py import build_py
 from pathlib import Path
 this_dir = Path(__file__).absolute().parent
 
+
+class BuildPy(build_py):
+    """
+    Generates LR table of the grammar language parser in the build directory.
+    """
+    def run(self):
+        super().run()
+        sys.path.insert(0, str(this_dir))
+        try:
+            from parglare.grammar import save_grammar_table
+        except ImportError:
+            # parglare dependencies are not available in the build
+            # environment. The table from the source tree is used.
+            return
+        save_grammar_table(os.path.join(self.build_lib, 'parglare',
+                                        'grammar.pgt'))
+
+
 if sys.argv[-1].startswith('publish'):
     if os.system("pip list | grep wheel"):
         print("wheel not installed.\nUse `pip install wheel`.\nExiting.")
@@ -21,7 +40,8 @@ if sys.argv[-1].startswith('publish'):
     sys.exit()
 
 if __name__ == "__main__":
-    setup(use_scm_version={
-        "write_to": str(this_dir / "parglare" / "version.py"),
-        "write_to_template": '__version__ = "{version}"\n',
-    })
+    setup(cmdclass={'build_py': BuildPy},
+          use_scm_version={
+              "write_to": str(this_dir / "parglare" / "version.py"),
+              "write_to_template": '__version__ = "{version}"\n',
+          })
@@ -0,0 +1,17 @@
+import os
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def table_cache_dir(tmp_path_factory):
+    """
+    Use a temporary LR tables cache directory for the tests.
+    """
+    old_cache_dir = os.environ.get('PARGLARE_CACHE_DIR')
+    os.environ['PARGLARE_CACHE_DIR'] = \
+        str(tmp_path_factory.mktemp('parglare_cache'))
+    yield
+    if old_cache_dir is None:
+        del os.environ['PARGLARE_CACHE_DIR']
+    else:
+        os.environ['PARGLARE_CACHE_DIR'] = old_cache_dir
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import pytest
 from parglare import Parser, Grammar
-from parglare.grammar import ASSOC_LEFT, ASSOC_RIGHT, DEFAULT_PRIORITY
+from parglare.grammar import ASSOC_LEFT, ASSOC_RIGHT, DEFAULT_PRIORITY, \
+    GRAMMAR_TABLE_FILE, create_grammar_table, get_grammar_parser
+from parglare.tables.persist import load_table, table_to_serializable
 from parglare.exceptions import GrammarError, ParseError
 
 
@@ -491,3 +493,32 @@ def test_case_insensitive_parsing():
     parser = Parser(g)
     parser.parse('One Two Aaa')
     parser.parse('one Two AAa')
+
+
+def test_grammar_language_table():
+    """
+    Test that the table of the grammar language parser shipped with the
+    package is the same as the calculated table. If the grammar language is
+    changed the table must be generated again by calling
+    `parglare.grammar.save_grammar_table()`.
+    """
+    parser = get_grammar_parser(False, False)
+    table = table_to_serializable(create_grammar_table())
+    assert table_to_serializable(
+        load_table(GRAMMAR_TABLE_FILE, parser.grammar)) == table
+    assert table_to_serializable(parser.table) == table
+
+
+def test_grammar_language_globals():
+    """
+    Test that the grammar language symbols and productions are available as
+    module attributes although they are created on the first access.
+    """
+    import parglare.grammar as grammar_module
+    pg_productions = grammar_module.pg_productions
+    assert pg_productions is grammar_module.pg_productions
+    assert pg_productions[0][0] is grammar_module.PGFILE
+    assert grammar_module.PGFILE.name == 'PGFile'
+    assert grammar_module.NAME in grammar_module.pg_terminals
+    with pytest.raises(AttributeError):
+        grammar_module.NON_EXISTING
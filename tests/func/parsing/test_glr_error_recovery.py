@@ -117,3 +117,21 @@ def test_glr_recovery_custom_unsuccessful():
 
     error = e.value
     assert error.location.start_position == 6
+
+
+def test_glr_recovery_head_hash_kept():
+    """
+    Test that the head hash doesn't change when the recovery assigns a new
+    token ahead so the head is found in the parser bookkeeping.
+    """
+    heads = set()
+
+    def custom_recovery(head, error):
+        heads.add(head)
+        head.token_ahead = Token(g.get_terminal('-'), '-', length=0)
+        assert head in heads
+        return True
+
+    parser = GLRParser(g, actions=actions, error_recovery=custom_recovery)
+    parser.parse('1 + 5 8 - 2')
+    assert heads
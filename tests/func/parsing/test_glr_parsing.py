@@ -366,3 +366,74 @@ def test_number_of_trees():
     assert len(results) == 5
     assert all([p.context.head == results[0].context.head for p in results])
     assert results[0].context.head.number_of_trees == 5
+
+
+def test_active_heads_per_level():
+    """
+    Test that the number of active heads is recorded for each shift level.
+    """
+    g = Grammar.from_string(r"""
+    E: E '+' E | E '-' E | number;
+    terminals
+    number: /\d+/;
+    """)
+
+    p = GLRParser(g)
+
+    p.parse('1 + 2 + 3 - 7')
+
+    # Each of the 7 tokens and the STOP token have their shift level.
+    assert len(p.active_heads_per_level) == 8
+    assert p.active_heads_per_level[0] == 1
+    assert max(p.active_heads_per_level) > 1
+
+
+def test_max_heads():
+    """
+    Test that the number of active heads can be limited.
+    """
+    g = Grammar.from_string(r"""
+    E: E '+' E | E '-' E | number;
+    terminals
+    number: /\d+/;
+    """)
+
+    p = GLRParser(g)
+    results = p.parse('1 + 2 + 3 - 7 + 4')
+    assert len(results) == 14
+    assert p.pruned_heads == results.pruned_heads == 0
+
+    p = GLRParser(g, max_heads=1)
+    results = p.parse('1 + 2 + 3 - 7 + 4')
+    assert 0 < len(results) < 14
+    assert p.pruned_heads > 0
+    assert results.pruned_heads == p.pruned_heads
+
+    # Pruning is reported per parse.
+    pruned_heads = results.pruned_heads
+    assert p.parse('1 + 2').pruned_heads == p.pruned_heads < pruned_heads
+    assert results.pruned_heads == pruned_heads
+    assert max(p.active_heads_per_level) > 1
+
+
+def test_max_heads_custom_score():
+    """
+    Test that user supplied scoring function is used for pruning.
+    """
+    g = Grammar.from_string(r"""
+    E: E '+' E | E '-' E | number;
+    terminals
+    number: /\d+/;
+    """)
+
+    scored = []
+
+    def head_score(head):
+        scored.append(head)
+        return -head.number_of_trees
+
+    p = GLRParser(g, max_heads=1, head_score=head_score)
+    results = p.parse('1 + 2 + 3 - 4')
+    assert len(results) == 1
+    assert scored
+    assert p.pruned_heads > 0
@@ -10,6 +10,7 @@ At the end disambiguation error is reported.
 import pytest  # noqa
 import difflib
 import re
+import string
 from parglare import Parser, Grammar, Token, ParseError, DisambiguationError
 
 
@@ -231,6 +232,99 @@ def test_nofinish(cf):
     assert called == [False, False, True]
 
 
+def test_finish_non_overlapping_terminals():
+    """
+    Test that recognition stops after the match of the terminal whose
+    matches can't start with the same characters as the matches of the
+    following terminals.
+    """
+    from parglare.grammar import RegExRecognizer
+    from parglare.tables.lexical import first_chars, can_overlap
+
+    assert not can_overlap(first_chars(RegExRecognizer(r'\d+(\.\d+)?')),
+                           first_chars(RegExRecognizer(r'[a-z_]\w*')))
+    assert can_overlap(first_chars(RegExRecognizer(r'\w+')),
+                       first_chars(RegExRecognizer(r'\d+')))
+    assert can_overlap(first_chars(RegExRecognizer(r'(?i)x')),
+                       first_chars(RegExRecognizer(r'X')))
+    assert not can_overlap(first_chars(RegExRecognizer(r'a?b')),
+                           first_chars(RegExRecognizer(r'[^ab]')))
+
+    grammar = r"""
+    S: Element+;
+    Element: Number | Name | Word;
+
+    terminals
+    Number: /\d+/;
+    Name: /[a-z]+/;
+    Word: /\w+/;
+    """
+    g = Grammar.from_string(grammar)
+    parser = Parser(g)
+    state = parser.table.states[0]
+    finish_flags = dict(zip([t.name for t in state.actions],
+                            state.finish_flags))
+    # Actions are ordered Word, Number, Name. Word overlaps with the
+    # following terminals while Number doesn't overlap with Name.
+    assert [t.name for t in state.actions] == ['Word', 'Number', 'Name']
+    assert not finish_flags['Word']
+    assert finish_flags['Number']
+
+    grammar = r"""
+    S: Element+;
+    Element: Number | Name | Str;
+
+    terminals
+    Number: /\d+/;
+    Name: /[a-z]+/;
+    Str: /"[^"]*"/;
+    """
+    g = Grammar.from_string(grammar)
+    parser = Parser(g)
+    state = parser.table.states[0]
+    assert state.finish_flags[:-1] == [True] * (len(state.actions) - 1)
+    assert parser.parse('12 ab "x y" 3') == ['12', 'ab', '"x y"', '3']
+
+
+def test_finish_case_insensitive_non_ascii():
+    """
+    Test that non-ASCII characters matching ASCII letters in case-insensitive
+    regular expressions are taken into account.
+    """
+    from parglare.grammar import RegExRecognizer
+    from parglare.tables.lexical import first_chars, can_overlap, \
+        NON_ASCII_FOLDS
+
+    name = first_chars(RegExRecognizer(r'[a-z]+'))
+    assert can_overlap(first_chars(RegExRecognizer(r'(?i)\u212a')), name)
+    assert can_overlap(first_chars(RegExRecognizer(r'(?i)[\u0100-\u0200]')),
+                       name)
+    assert not can_overlap(first_chars(RegExRecognizer(r'\u212a')), name)
+    # All non-ASCII characters matching ASCII letters are known.
+    folds = [chr(c) for c in range(128, 0x10000)
+             if any(ord(f) < 128 for f in chr(c).lower() + chr(c).upper())
+             and any(re.fullmatch(re.escape(chr(c)), f, re.IGNORECASE)
+                     for f in string.ascii_letters)]
+    assert ''.join(folds) == NON_ASCII_FOLDS
+    assert not can_overlap(
+        first_chars(RegExRecognizer(r'(?i)[^\u212a\W\d_]')),
+        first_chars(RegExRecognizer(r'k')))
+
+    grammar = r"""
+    S: Element+;
+    Element: Kelvin | Name;
+
+    terminals
+    Kelvin: /(?i)\u212a\d+/;
+    Name: /[a-z]+/;
+    """
+    parser = Parser(Grammar.from_string(grammar))
+    state = parser.table.states[0]
+    assert [t.name for t in state.actions] == ['Name', 'Kelvin']
+    assert state.finish_flags == [False, False]
+    assert parser.parse('k12 ab') == ['k12', 'ab']
+
+
 def test_dynamic_lexical_disambiguation():
     """
     Dynamic disambiguation enables us to choose right token from the
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
 import pytest  # noqa
-from parglare import Grammar, Parser, GLRParser, EMPTY
+from parglare import Grammar, Parser, GLRParser, EMPTY, CANONICAL_LR, \
+    MINIMAL_LR
 from parglare.grammar import STOP
-from parglare.tables import first, follow, create_table, SHIFT, REDUCE
+from parglare.tables import (first, first_bits, follow, create_table,
+                             terminal_ranks, SHIFT, REDUCE)
+from parglare.tables.termset import get_terminal_index, TerminalSet
+from parglare.tables.persist import table_to_serializable
+from parglare.tables.incremental import changed_symbols, relink_table
+from parglare.closure import Closures
 from ..grammar.expression_grammar import (OPEN, ID, T, E,
                                           MULT, CLOSE, PLUS, get_grammar)
 
@@ -120,6 +127,207 @@ def test_table_construction():
     assert action.state.state_id == 6
 
 
+def test_closures_memoized():
+    """
+    Tests that LR(0) closures are memoized by non-terminals after the dot in
+    kernel items.
+    """
+    g = get_grammar()
+    closures = Closures(g)
+
+    assert [p.prod_id for p in closures.productions_by_lhs[T]] == [3, 4]
+
+    productions = closures.productions((E,))
+    assert [p.prod_id for p in productions] == [1, 2, 3, 4, 5, 6]
+    assert closures.productions((E,)) is productions
+    assert [p.prod_id for p in closures.productions((T,))] == [3, 4, 5, 6]
+
+
+def test_terminal_bitsets():
+    """
+    Tests that terminal sets are calculated as bitmasks of terminal ids.
+    """
+    g = get_grammar()
+    index = get_terminal_index(g)
+    assert get_terminal_index(g) is index
+
+    first_sets = first(g)
+    for symbol, bits in first_bits(g).items():
+        assert set(index.to_terminals(bits)) == first_sets[symbol]
+
+    terminals = TerminalSet(index)
+    assert not terminals
+    terminals.add(ID)
+    terminals.update([OPEN, STOP])
+    assert len(terminals) == 3
+    assert ID in terminals and PLUS not in terminals
+    assert terminals == set([ID, OPEN, STOP])
+    assert terminals.issubset(set([ID, OPEN, STOP, PLUS]))
+    assert terminals.difference([ID]) == set([OPEN, STOP])
+
+
+def test_kernel_signature():
+    """
+    Tests that states are indexed by their unique kernel signature.
+    """
+    g = get_grammar()
+    table = create_table(g)
+
+    signatures = [state.kernel_signature for state in table.states]
+    assert len(set(signatures)) == len(table.states)
+
+    id_state = table.states[0].actions[ID][0].state
+    assert id_state.kernel_signature == ((6, 1),)
+
+
+def test_expected_symbols():
+    """
+    Tests calculation of terminals which lead to SHIFT, possibly after
+    reductions, in each state.
+    """
+    g = get_grammar()
+    table = create_table(g)
+    table.calc_expected_symbols()
+
+    id_state = table.states[0].actions[ID][0].state
+
+    # After reductions of `id` both `+` and `*` can be shifted for every
+    # parser stack while `)` can be shifted only for stacks with an open
+    # parenthesis. STOP is accepted but not shifted.
+    assert id_state.expected_symbols == set([PLUS, MULT])
+    assert id_state.possible_symbols == set([PLUS, MULT, CLOSE])
+
+    # In the start state terminals can be shifted directly.
+    assert table.states[0].expected_symbols == set([ID, OPEN])
+    assert table.states[0].possible_symbols == set([ID, OPEN])
+
+
+def test_lr1_tables():
+    """
+    Tests canonical LR(1) and minimal LR(1) tables for the grammar which is
+    LR(1) but not LALR(1).
+    """
+    grammar = r"""
+    S: 'a' T 'c' | 'b' T 'd' | 'a' U 'd' | 'b' U 'c';
+    T: 'x' E;
+    U: 'x' F;
+    E: 'e';
+    F: 'e';
+    """
+
+    table = create_table(Grammar.from_string(grammar))
+    assert len(table.states) == 17
+    assert len(table.rr_conflicts) == 2
+
+    table = create_table(Grammar.from_string(grammar), tables=CANONICAL_LR)
+    assert len(table.states) == 21
+    assert not table.rr_conflicts
+
+    table = create_table(Grammar.from_string(grammar), tables=MINIMAL_LR)
+    assert len(table.states) == 19
+    assert not table.rr_conflicts
+    assert [s.state_id for s in table.states] == list(range(19))
+
+    parser = Parser(Grammar.from_string(grammar), tables=MINIMAL_LR)
+    assert parser.parse('b x e c') == ['b', ['x', 'e'], 'c']
+    assert parser.parse('b x e d') == ['b', ['x', 'e'], 'd']
+
+    # For LALR(1) grammars minimal LR(1) tables are of the LALR size.
+    g = Grammar.from_file(os.path.join(os.path.dirname(__file__),
+                                       '..', 'grammar', 'calc.pg'))
+    assert len(create_table(g, tables=CANONICAL_LR).states) == 39
+    assert len(create_table(g, tables=MINIMAL_LR).states) == \
+        len(create_table(g).states)
+
+
+def test_minimize_states():
+    """
+    Tests merging of the states with the same ACTION and GOTO rows.
+    """
+    def calc_grammar():
+        return Grammar.from_file(os.path.join(os.path.dirname(__file__),
+                                              '..', 'grammar', 'calc.pg'))
+
+    table = create_table(calc_grammar(), tables=CANONICAL_LR, minimize=True)
+    assert len(table.states) == 39
+
+    # Canonical LR(1) states which reduce by the same production for
+    # different lookaheads are merged.
+    table = create_table(calc_grammar(), tables=CANONICAL_LR, minimize=True,
+                         default_reductions=True)
+    assert len(table.states) == 29
+    assert [s.state_id for s in table.states] == list(range(29))
+    for state in table.states:
+        for target_state in state.gotos.values():
+            assert target_state in table.states
+
+    input_str = 'a = 2 b = 4 a + b * (a - 1)'
+    parser = Parser(calc_grammar(), table=table)
+    assert parser.parse(input_str) == Parser(calc_grammar()).parse(input_str)
+
+
+def test_relink_table():
+    """
+    Tests reuse of the table of the previous version of the grammar.
+    """
+    grammar_str = r'''
+    E: E '+' T | T;
+    T: T '*' F | F;
+    F: '(' E ')' | number;
+    terminals
+    number: /\d+(\.\d+)?/;
+    '''
+    table = create_table(Grammar.from_string(grammar_str))
+
+    # Actions don't affect the table so the previous table is re-linked.
+    grammar = Grammar.from_string(grammar_str.replace(
+        "F: '(' E ')'", "@pass_single\n    F: '(' E ')'"))
+    assert changed_symbols(table.states[0].grammar, grammar) == set()
+    new_table = relink_table(table, grammar)
+    assert all(s.grammar is grammar for s in new_table.states)
+    assert all(t in grammar.terminals.values()
+               for s in new_table.states for t in s.actions)
+    assert table_to_serializable(new_table) == table_to_serializable(table)
+    assert table_to_serializable(new_table) \
+        == table_to_serializable(create_table(grammar))
+    assert Parser(grammar, table=new_table).parse('2 * (3 + 4)')
+
+    # Changed productions and terminals.
+    grammar = Grammar.from_string(grammar_str.replace(
+        "| number", "| '-' F | number"))
+    assert changed_symbols(table.states[0].grammar, grammar) == {'F', '-'}
+    grammar = Grammar.from_string(grammar_str.replace(
+        "?/;", "?/ {15};"))
+    assert changed_symbols(table.states[0].grammar, grammar) == {'number'}
+
+
+def test_terminal_ranks():
+    """
+    Tests that state actions are sorted by the terminal ranks calculated once
+    per grammar.
+    """
+    grammar = r"""
+    S: A+;
+    A: 'for' | 'form' | ID | INT;
+
+    terminals
+    ID: /\w+/;
+    INT: /\d+/ {15};
+    """
+    g = Grammar.from_string(grammar)
+    ranks = terminal_ranks(g)
+    assert terminal_ranks(g) is ranks
+
+    # Higher priority first, then longer string matches.
+    assert [t.name for t in sorted(ranks, key=ranks.get)][:3] == \
+        ['INT', 'form', 'for']
+
+    table = create_table(g)
+    for state in table.states:
+        state_ranks = [ranks[t] for t in state.actions]
+        assert state_ranks == sorted(state_ranks)
+
+
 def test_associativity_conflicts_resolving():
     """
     Test that using associativity will resolve conflicts.
@@ -238,3 +446,30 @@ def test_precomputed_table():
     else:
         parser = GLRParser(grammar, table=table)
     parser.parse('id+id')
+
+
+@pytest.mark.parametrize('grammar_file', [
+    'grammar/calc.pg',
+    'regressions/issue52/grammar.pg',
+    'persistence/compare_table/model.pg',
+    '../perf/rhapsody.pg',
+])
+def test_deremer_pennello_lookaheads(grammar_file):
+    """
+    Test that LALR(1) follow sets calculated by DeRemer-Pennello relations
+    produce the same table as the iterative propagation.
+    """
+    grammar_file = os.path.join(os.path.dirname(__file__), '..', grammar_file)
+
+    tables = []
+    for deremer_pennello in [False, True]:
+        g = Grammar.from_file(grammar_file)
+        tables.append(create_table(g, deremer_pennello=deremer_pennello))
+
+    table, dp_table = tables
+    assert table_to_serializable(table) == table_to_serializable(dp_table)
+    for state, dp_state in zip(table.states, dp_table.states):
+        assert [(i.production.prod_id, i.position,
+                 sorted(t.fqn for t in i.follow)) for i in state.items] == \
+            [(i.production.prod_id, i.position,
+              sorted(t.fqn for t in i.follow)) for i in dp_state.items]
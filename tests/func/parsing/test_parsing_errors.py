@@ -31,6 +31,67 @@ def test_glr_last_heads_in_error():
     assert len(e.value.last_heads) == 1
 
 
+def test_default_reductions():
+    """
+    Test that LR parser reduces in states with default reduction without
+    scanning for the token ahead and that the error location is kept.
+    """
+    grammar = get_grammar()
+    p = Parser(grammar)
+    assert any(state.default_reduction for state in p.table.states)
+
+    calls = []
+    next_token = p._next_token
+
+    def _next_token(head):
+        calls.append(head.state.state_id)
+        return next_token(head)
+
+    p._next_token = _next_token
+    result = p.parse("id+id*id")
+    assert calls
+    assert not any(p.table.states[state_id].default_reduction
+                   for state_id in calls)
+
+    with pytest.raises(ParseError) as e:
+        p.parse("id+id id")
+    default_location = e.value.location.start_position
+
+    for state in p.table.states:
+        state.default_reduction = None
+
+    assert p.parse("id+id*id") == result
+
+    with pytest.raises(ParseError) as e:
+        p.parse("id+id id")
+    assert e.value.location.start_position == default_location
+
+
+def test_glr_expected_after_reductions():
+    """
+    Test that GLR reports only symbols which can be shifted after reductions
+    for the actual parser stack and that semantic actions are not called
+    during error reporting.
+    """
+
+    grammar = get_grammar()
+    called = []
+    p = GLRParser(grammar, actions={'F': lambda _, nodes: called.append(1)})
+
+    with pytest.raises(ParseError) as e:
+        p.parse("id+id id")
+
+    assert set([s.name for s in e.value.symbols_expected]) \
+        == set(['+', '*'])
+    assert len(called) == 1
+
+    with pytest.raises(ParseError) as e:
+        p.parse("(id+id id")
+
+    assert set([s.name for s in e.value.symbols_expected]) \
+        == set(['+', '*', ')'])
+
+
 @parsers
 def test_invalid_input(parser_class):
 
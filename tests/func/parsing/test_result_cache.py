@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import pickle
+from functools import partial
+import pytest  # noqa
+from parglare import Grammar, Parser, GLRParser
+from parglare.result_cache import ParseResultCache
+
+
+grammar_str = r"""
+E: E '+' E  {left}
+ | number;
+
+terminals
+number: /\d+/;
+"""
+
+calls = []
+
+
+def act_sum(_, nodes):
+    calls.append('sum')
+    return nodes[0] + nodes[2]
+
+
+def act_number(_, value):
+    calls.append('number')
+    return int(value)
+
+
+actions = {'E': [act_sum, lambda _, nodes: nodes[0]],
+           'number': act_number}
+
+
+@pytest.fixture
+def grammar():
+    del calls[:]
+    return Grammar.from_string(grammar_str)
+
+
+def test_result_cache(grammar):
+    cache = ParseResultCache()
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    assert parser.parse('1 + 2 + 3') == 6
+    assert cache.stats['misses'] == 1
+    assert cache.stats['entries'] == 1
+
+    del calls[:]
+    assert parser.parse('1 + 2 + 3') == 6
+    assert calls == []
+    assert cache.stats['hits'] == 1
+
+    # Different input, position, file name or parser options.
+    assert parser.parse('1 + 2') == 3
+    assert parser.parse(' 1 + 2', position=1) == 3
+    assert parser.parse('1 + 2', file_name='input.txt') == 3
+    assert GLRParser(grammar, actions=actions,
+                     result_cache=cache).parse('1 + 2') == [3]
+    assert cache.stats['misses'] == 5
+    assert cache.stats['hits'] == 1
+
+    # Cache is not used with extra state.
+    del calls[:]
+    parser.parse('1 + 2 + 3', extra={})
+    assert calls
+    assert cache.stats['hits'] == 1
+
+
+def test_result_cache_actions_changed(grammar):
+    cache = ParseResultCache()
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    assert parser.parse('1 + 2') == 3
+
+    parser = Parser(grammar, result_cache=cache, actions={
+        'E': [lambda _, nodes: nodes[0] - nodes[2],
+              lambda _, nodes: nodes[0]],
+        'number': act_number})
+    assert parser.parse('1 + 2') == -1
+    assert cache.stats['hits'] == 0
+
+
+def test_result_cache_action_signatures(grammar, monkeypatch):
+    """
+    Test that action signatures are calculated once per parser and again when
+    a symbol is rebound to a different action.
+    """
+    import parglare.result_cache as result_cache
+    signatures = []
+    callable_signature = result_cache.callable_signature
+
+    def counting_signature(obj, *args):
+        signatures.append(obj)
+        return callable_signature(obj, *args)
+    monkeypatch.setattr(result_cache, 'callable_signature',
+                        counting_signature)
+
+    cache = ParseResultCache()
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    assert parser.parse('1 + 2') == 3
+    assert signatures
+    del signatures[:]
+    assert parser.parse('2 + 3') == 5
+    assert not signatures
+
+    grammar.get_nonterminal('E').action = \
+        [lambda _, nodes: nodes[0] - nodes[2], lambda _, nodes: nodes[0]]
+    assert parser.parse('1 + 2') == -1
+    assert signatures
+    assert cache.stats['hits'] == 0
+
+
+def test_result_cache_closures_partials_constants(grammar):
+    """
+    Test that actions which differ only in closure contents, partial
+    arguments or constants have different keys and that results of parsers
+    with actions which can't be identified are not cached.
+    """
+    cache = ParseResultCache()
+
+    def parse(action):
+        return Parser(grammar, result_cache=cache, actions={
+            'E': [act_sum, action], 'number': act_number}).parse('2')
+
+    def mk(n):
+        return lambda _, nodes: nodes[0] * n
+
+    def scale(factor, _, nodes):
+        return nodes[0] * factor
+
+    foo, bar = (lambda _, nodes: 'foo'), (lambda _, nodes: 'bar')
+
+    assert parse(mk(2)) == 4
+    assert parse(mk(3)) == 6
+    assert parse(partial(scale, 2)) == 4
+    assert parse(partial(scale, 3)) == 6
+    assert parse(foo) == 'foo'
+    assert parse(bar) == 'bar'
+    assert cache.stats['hits'] == 0
+    assert parse(mk(3)) == 6
+    assert cache.stats['hits'] == 1
+
+    class Scale(object):
+        def __init__(self, factor):
+            self.factor = factor
+
+        def __call__(self, _, nodes):
+            return nodes[0] * self.factor
+
+    assert parse(Scale(2)) == 4
+    assert parse(Scale(3)) == 6
+    assert cache.stats['entries'] == 6
+    assert cache.stats['misses'] == 6
+
+
+def test_result_cache_eviction(grammar):
+    # Room for two results.
+    max_size = 2 * len(pickle.dumps(1, pickle.HIGHEST_PROTOCOL))
+    cache = ParseResultCache(max_size=max_size)
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    parser.parse('1')
+    parser.parse('2')
+    parser.parse('1')
+    parser.parse('3')
+    assert cache.stats['evictions'] == 1
+    assert cache.stats['size'] <= max_size
+
+    # The least recently used result is evicted.
+    parser.parse('1')
+    assert cache.stats['hits'] == 2
+    parser.parse('2')
+    assert cache.stats['hits'] == 2
+
+
+def test_result_cache_dir(grammar, tmp_path):
+    cache_dir = str(tmp_path / 'results')
+    cache = ParseResultCache(cache_dir=cache_dir)
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    assert parser.parse('1 + 2') == 3
+
+    cache = ParseResultCache(cache_dir=cache_dir)
+    parser = Parser(grammar, actions=actions, result_cache=cache)
+    del calls[:]
+    assert parser.parse('1 + 2') == 3
+    assert calls == []
+    assert cache.stats['disk_hits'] == 1
+
+    cache.invalidate()
+    assert cache.stats['entries'] == 0
+    assert list((tmp_path / 'results').iterdir()) == []
+    assert parser.parse('1 + 2') == 3
+    assert calls
+
+
+def test_result_cache_uncacheable(grammar):
+    cache = ParseResultCache()
+    parser = Parser(grammar, build_tree=True, result_cache=cache)
+    tree = parser.parse('1 + 2')
+    assert parser.parse('1 + 2') is not tree
+    assert cache.stats['uncacheable'] == 2
+    assert cache.stats['entries'] == 0
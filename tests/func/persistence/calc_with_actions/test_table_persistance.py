@@ -1,6 +1,10 @@
 import os
 import time
-from parglare import Grammar, Parser
+import pytest
+from parglare import Grammar, Parser, GLRParser
+from parglare.tables import create_table, get_table_key
+from parglare.tables.persist import save_table, load_table, \
+    is_binary_table, table_to_serializable, BINARY_MAGIC
 
 this_folder = os.path.dirname(__file__)
 
@@ -59,3 +63,95 @@ def test_save_load_table():
     assert last_mtime == os.path.getmtime(table_file)
     parser = Parser(grammar)
     assert last_mtime < os.path.getmtime(table_file)
+
+
+def test_save_load_binary_table():
+    """
+    Test that binary table file is detected, loaded and recalculated in the
+    binary format.
+    """
+    calc_file = os.path.join(this_folder, 'calc.pg')
+    variable_file = os.path.join(this_folder, 'variable.pg')
+    input_str = 'a = 5   1 + 2 * a - 7'
+    input_str_result = 1 + 2 * 5 - 7
+    grammar = Grammar.from_file(calc_file)
+    table = create_table(grammar)
+
+    table_file = os.path.join(this_folder, 'calc.pgt')
+    save_table(table_file, table, binary=True,
+               key=get_table_key(grammar, prefer_shifts=True))
+    assert is_binary_table(table_file)
+    # Table file is created with the permissions given by the umask.
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(table_file).st_mode & 0o777 == 0o666 & ~umask
+    assert table_to_serializable(load_table(table_file, grammar)) \
+        == table_to_serializable(table)
+
+    last_mtime = os.path.getmtime(table_file)
+    time.sleep(1)
+    parser = Parser(grammar)
+    assert last_mtime == os.path.getmtime(table_file)
+    assert parser.parse(input_str) == input_str_result
+
+    # Table is recalculated in the binary format.
+    with open(variable_file, 'a'):
+        os.utime(variable_file, None)
+    parser = Parser(grammar)
+    assert last_mtime < os.path.getmtime(table_file)
+    assert is_binary_table(table_file)
+    assert parser.parse(input_str) == input_str_result
+
+    # Table of unsupported version is recalculated.
+    with open(table_file, 'r+b') as f:
+        f.seek(len(BINARY_MAGIC))
+        f.write(b'\xff\xff\xff\xff')
+    with pytest.raises(ValueError):
+        load_table(table_file, grammar)
+    parser = Parser(grammar)
+    assert parser.parse(input_str) == input_str_result
+    assert table_to_serializable(load_table(table_file, grammar)) \
+        == table_to_serializable(table)
+
+    os.remove(table_file)
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_lazy_table_states(binary, tmp_path):
+    """
+    Test that states of the loaded table are decoded on the first access and
+    that conflicts and dynamic terminals are the same as for the calculated
+    table.
+    """
+    grammar = Grammar.from_string(r'''
+    E: E "+" E | E "*" E {dynamic} | E MINUS E | "(" E ")" | NUM;
+    terminals
+    NUM: /\d+/;
+    MINUS: "-" {dynamic};
+    ''')
+    table = create_table(grammar)
+    table_file = str(tmp_path / 'table.pgt')
+    save_table(table_file, table, binary=binary)
+
+    loaded_table = load_table(table_file, grammar)
+
+    def conflicts(table):
+        return [(c.state.state_id, c.term, c.productions, c.dynamic)
+                for c in table.sr_conflicts + table.rr_conflicts]
+
+    assert conflicts(loaded_table) == conflicts(table)
+    # Only states with conflicts are decoded.
+    assert {s.state_id for s in loaded_table.states if s.decode is None} \
+        == {c[0] for c in conflicts(table)}
+
+    parser = GLRParser(grammar, table=loaded_table)
+    assert len(parser.parse('2 + 3')) == 1
+    assert any(s.decode is not None for s in loaded_table.states)
+
+    assert [s.dynamic for s in loaded_table.states] \
+        == [s.dynamic for s in table.states]
+    assert all(s.decode is None for s in loaded_table.states)
+    assert table_to_serializable(loaded_table) \
+        == table_to_serializable(table)
+    assert len(parser.parse('1 + 2 * 3 - 4')) \
+        == len(GLRParser(grammar, table=table).parse('1 + 2 * 3 - 4'))
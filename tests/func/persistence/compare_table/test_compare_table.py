@@ -1,5 +1,6 @@
 import os
-import filecmp
+import json
+import shutil
 from parglare import Grammar, Parser
 
 this_folder = os.path.dirname(__file__)
@@ -26,22 +27,25 @@ module SomeModule {
 '''
 
 
-def test_diamond_import_resolving_and_model_creation():
+def test_diamond_import_resolving_and_model_creation(tmp_path):
 
-    grammar_file = os.path.join(this_folder, 'model.pg')
-    table_file = os.path.join(this_folder, 'model.pgt')
+    # Grammar files are copied so that the table file is not written to the
+    # source tree.
+    for file_name in os.listdir(this_folder):
+        if file_name.endswith('.pg'):
+            shutil.copy(os.path.join(this_folder, file_name), str(tmp_path))
+    grammar_file = str(tmp_path / 'model.pg')
+    table_file = str(tmp_path / 'model.pgt')
     table_cmp_file = os.path.join(this_folder, 'model_compare.pgt')
 
     g = Grammar.from_file(grammar_file)
-    try:
-        os.remove(table_file)
-    except Exception:
-        pass
 
     parser = Parser(g)
 
-    # Check generated table file.
-    assert filecmp.cmp(table_file, table_cmp_file, shallow=False)
+    # Check generated table file. The key of the table depends on the
+    # parglare version so only the states are compared.
+    with open(table_file) as f, open(table_cmp_file) as f_cmp:
+        assert json.load(f)['states'] == json.load(f_cmp)
 
     # Check that parser loaded from the table will correctly parse
     parser = Parser(g, force_load_table=True)
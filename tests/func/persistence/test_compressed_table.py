@@ -0,0 +1,107 @@
+import os
+import pytest
+from parglare import Grammar, Parser, GLRParser
+from parglare.tables import create_table, create_load_table, \
+    get_table_key
+from parglare.tables.compress import compress_table, pack_rows, \
+    table_to_compressed, table_from_compressed, CompressedActions, \
+    COMPRESSED_MAGIC
+from parglare.tables.persist import save_table, load_table, \
+    table_to_serializable, is_compressed_table
+
+
+def test_pack_rows():
+    rows = [((0, 1), (3, 2)), ((1, 3), (2, 4)), (), ((0, 5), (1, 6))]
+    base, check, value = pack_rows(rows)
+    for row_id, row in enumerate(rows):
+        entries = {}
+        for column in range(4):
+            idx = base[row_id] + column
+            if 0 <= idx < len(check) and check[idx] == row_id:
+                entries[column] = value[idx]
+        assert entries == dict(row)
+    # The first two rows are interleaved.
+    assert base[0] == base[1]
+    assert len(check) == 6
+
+
+@pytest.fixture
+def grammar():
+    return Grammar.from_string(r'''
+    E: E "+" E | E "*" E {dynamic} | E MINUS E | "(" E ")" | NUM;
+    terminals
+    NUM: /\d+/;
+    MINUS: "-" {dynamic};
+    ''')
+
+
+def test_compress_table(grammar):
+    """
+    Test that the compressed table has the same actions, gotos, conflicts
+    and dynamic terminals and that it is used by the parser.
+    """
+    table = create_table(grammar)
+    compressed = compress_table(table)
+    assert table_to_serializable(compressed) == table_to_serializable(table)
+
+    def conflicts(table):
+        return [(c.state.state_id, c.term, c.productions, c.dynamic)
+                for c in table.sr_conflicts + table.rr_conflicts]
+    assert conflicts(compressed) == conflicts(table)
+    assert [s.dynamic for s in compressed.states] \
+        == [s.dynamic for s in table.states]
+
+    state = compressed.states[0]
+    assert list(state.actions) == list(table.states[0].actions)
+    assert state.actions.get(grammar.get_terminal('+')) is None
+    with pytest.raises(KeyError):
+        state.gotos[grammar.get_nonterminal('S\'')]
+
+    input_str = '1 + 2 * 3 - 4'
+    assert len(GLRParser(grammar, table=compressed).parse(input_str)) \
+        == len(GLRParser(grammar, table=table).parse(input_str))
+
+
+def test_save_load_compressed_table(grammar, tmp_path):
+    table = create_table(grammar)
+    table_file = str(tmp_path / 'table.pgt')
+    save_table(table_file, table, compressed=True)
+    with open(table_file, 'rb') as f:
+        assert f.read(len(COMPRESSED_MAGIC)) == COMPRESSED_MAGIC
+    assert is_compressed_table(table_file)
+    assert table_to_serializable(load_table(table_file, grammar)) \
+        == table_to_serializable(table)
+
+    other_grammar = Grammar.from_string('S: "a";')
+    with pytest.raises(ValueError):
+        table_from_compressed(table_to_compressed(table), other_grammar)
+
+
+def test_compressed_table_format_kept(tmp_path):
+    """
+    Test that the table in the compressed format is loaded by the parser and
+    recalculated in the same format.
+    """
+    grammar_file = str(tmp_path / 'calc.pg')
+    with open(grammar_file, 'w') as f:
+        f.write(r'''
+        E: E '+' E {left, 1} | E '*' E {left, 2} | number;
+        terminals
+        number: /\d+/;
+        ''')
+    grammar = Grammar.from_file(grammar_file)
+    table_file = str(tmp_path / 'calc.pgt')
+    save_table(table_file, create_table(grammar), compressed=True,
+               key=get_table_key(grammar, prefer_shifts=True))
+
+    parser = Parser(grammar, actions={'E': [lambda _, n: n[0] + n[2],
+                                            lambda _, n: n[0] * n[2],
+                                            lambda _, n: n[0]],
+                                      'number': lambda _, value: int(value)})
+    assert parser.parse('1 + 2 * 3') == 7
+    assert type(parser.table.states[0].actions) is CompressedActions
+
+    os.utime(table_file, (0, 0))
+    create_load_table(grammar)
+    assert os.path.getmtime(table_file) > 0
+    assert is_compressed_table(table_file)
@@ -0,0 +1,119 @@
+import os
+import shutil
+import pytest
+from parglare import Grammar, Parser, GrammarError
+from parglare.tables import create_table
+from parglare.tables.persist import table_to_serializable
+from parglare.snapshot import save_snapshot, load_snapshot, SNAPSHOT_MAGIC
+
+this_folder = os.path.dirname(__file__)
+tests_folder = os.path.dirname(this_folder)
+
+
+def comma_recognizer(input, pos):
+    if input[pos] == ',':
+        return input[pos:pos + 1]
+
+
+def test_save_load_snapshot(tmp_path):
+    """
+    Test that grammar with imports and actions given in actions file is
+    restored from the snapshot.
+    """
+    grammar = Grammar.from_file(
+        os.path.join(this_folder, 'calc_with_actions', 'calc.pg'))
+    table = create_table(grammar)
+    snapshot_file = str(tmp_path / 'calc.pgs')
+    save_snapshot(snapshot_file, grammar, table)
+    with open(snapshot_file, 'rb') as f:
+        assert f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+    loaded_grammar, loaded_table = load_snapshot(snapshot_file)
+    assert loaded_grammar.get_terminal('v.VariableName') is not None
+    assert [str(p) for p in loaded_grammar.productions] \
+        == [str(p) for p in grammar.productions]
+    assert table_to_serializable(loaded_table) \
+        == table_to_serializable(table)
+    assert loaded_table.states[0].grammar is loaded_grammar
+
+    parser = Parser(loaded_grammar, table=loaded_table)
+    assert parser.parse('a = 5   1 + 2 * a - 7') == 1 + 2 * 5 - 7
+
+    # User actions still override actions from the snapshot.
+    parser = Parser(loaded_grammar, table=loaded_table,
+                    actions={'Calc': lambda _, nodes: 'calc'})
+    assert parser.parse('a = 5   1 + 2 * a - 7') == 'calc'
+
+
+def test_snapshot_moved(tmp_path):
+    """
+    Test that the snapshot saved next to the grammar files is loaded after
+    the folder is moved.
+    """
+    folder = str(tmp_path / 'calc')
+    shutil.copytree(os.path.join(this_folder, 'calc_with_actions'), folder,
+                    ignore=shutil.ignore_patterns('*.pgt', '__pycache__'))
+    grammar = Grammar.from_file(os.path.join(folder, 'calc.pg'))
+    save_snapshot(os.path.join(folder, 'calc.pgs'), grammar,
+                  create_table(grammar))
+
+    moved_folder = str(tmp_path / 'moved')
+    shutil.move(folder, moved_folder)
+    loaded_grammar, loaded_table = load_snapshot(
+        os.path.join(moved_folder, 'calc.pgs'))
+    assert loaded_grammar.file_path == os.path.realpath(
+        os.path.join(moved_folder, 'calc.pg'))
+    assert loaded_grammar.actions_file == os.path.realpath(
+        os.path.join(moved_folder, 'calc_actions.py'))
+    parser = Parser(loaded_grammar, table=loaded_table)
+    assert parser.parse('a = 5   1 + 2 * a - 7') == 1 + 2 * 5 - 7
+
+
+def test_snapshot_recognizers_and_classes(tmp_path):
+    """
+    Test that recognizers from recognizers files, recognizers given during
+    grammar construction and classes created for named matches are restored.
+    """
+    grammar = Grammar.from_file(
+        os.path.join(tests_folder, 'import', 'imported_recognizers',
+                     'model.pg'),
+        recognizers={'base.COMMA': comma_recognizer})
+    snapshot_file = str(tmp_path / 'model.pgs')
+    save_snapshot(snapshot_file, grammar, create_table(grammar))
+
+    loaded_grammar, loaded_table = load_snapshot(snapshot_file)
+    assert loaded_grammar.get_terminal('base.COMMA').recognizer \
+        is comma_recognizer
+    assert loaded_grammar.get_terminal('base.FQN').recognizer.__name__ \
+        == 'FQN'
+
+    model_str = '''
+    modelID 42.23.5
+    component myComponent extends some.fqn.name {
+        in SomeInputSlot
+        out SomeOutputSlot
+    }
+    '''
+    model = Parser(grammar).parse(model_str)
+    loaded_model = Parser(loaded_grammar, table=loaded_table).parse(model_str)
+    assert type(loaded_model).__name__ == 'Model'
+    assert type(loaded_model) is loaded_grammar.classes['Model']
+    assert loaded_model.modelID == model.modelID
+    assert loaded_model.components[0].name == model.components[0].name
+    assert set(type(loaded_model)._pg_attrs) == set(type(model)._pg_attrs)
+
+
+def test_snapshot_unsupported_callable(tmp_path):
+    """
+    Test that callables which can't be imported can't be saved.
+    """
+    grammar = Grammar.from_string('''
+    S: A+;
+    terminals
+    A: ;
+    ''', recognizers={'A': lambda input, pos: None})
+
+    with pytest.raises(GrammarError, match='Can\'t save'):
+        save_snapshot(str(tmp_path / 'grammar.pgs'), grammar,
+                      create_table(grammar))
+    assert not os.listdir(str(tmp_path))
@@ -0,0 +1,355 @@
+import json
+import os
+import shutil
+import threading
+import time
+import pytest
+from parglare import Grammar, Parser, GLRParser
+from parglare.tables import create_load_table, create_table, \
+    get_table_key
+from parglare.tables.cache import table_cache_key, get_cache_dir, \
+    get_cached_table, save_cached_table
+from parglare.tables.persist import table_to_serializable, save_table, \
+    load_table
+
+this_folder = os.path.dirname(__file__)
+
+
+@pytest.fixture
+def grammar_file(tmp_path, monkeypatch):
+    """
+    Copy of the calc grammar in a temporary folder with its own cache dir.
+    """
+    monkeypatch.setenv('PARGLARE_CACHE_DIR', str(tmp_path / 'cache'))
+    folder = os.path.join(this_folder, 'calc_with_actions')
+    for file_name in ['calc.pg', 'variable.pg', 'calc_actions.py']:
+        shutil.copy(os.path.join(folder, file_name), str(tmp_path))
+    return str(tmp_path / 'calc.pg')
+
+
+def test_table_cache_key(grammar_file):
+    grammar = Grammar.from_file(grammar_file)
+    key = table_cache_key(grammar, prefer_shifts=False)
+    assert key == table_cache_key(Grammar.from_file(grammar_file),
+                                  prefer_shifts=False)
+    assert key != table_cache_key(grammar, prefer_shifts=True)
+
+    # Comments don't change the key.
+    with open(grammar_file, 'a') as f:
+        f.write('\n// Comment\n')
+    assert key == table_cache_key(Grammar.from_file(grammar_file),
+                                  prefer_shifts=False)
+
+    # Imported grammar files change the key.
+    variable_file = os.path.join(os.path.dirname(grammar_file), 'variable.pg')
+    with open(variable_file) as f:
+        content = f.read()
+    with open(variable_file, 'w') as f:
+        f.write(content.replace('VariableName: /[a-zA-Z_][_a-zA-Z0-9]*/',
+                                'VariableName: /[a-z_][_a-z0-9]*/'))
+    assert key != table_cache_key(Grammar.from_file(grammar_file),
+                                  prefer_shifts=False)
+
+
+def test_table_file_key(grammar_file):
+    """
+    Test that the table file created for a different grammar is not used even
+    if it is newer than the grammar.
+    """
+    table_file = os.path.splitext(grammar_file)[0] + '.pgt'
+    variable_file = os.path.join(os.path.dirname(grammar_file), 'variable.pg')
+    create_load_table(Grammar.from_file(grammar_file))
+    with open(table_file) as f:
+        stale_table = f.read()
+
+    with open(variable_file) as f:
+        content = f.read()
+    with open(variable_file, 'w') as f:
+        f.write(content.replace('VariableName: /[a-zA-Z_][_a-zA-Z0-9]*/',
+                                'VariableName: /[a-z_][_a-z0-9]*/'))
+    os.utime(variable_file, (0, 0))
+    grammar = Grammar.from_file(grammar_file)
+    key = get_table_key(grammar)
+
+    table = create_load_table(grammar)
+    assert table_to_serializable(table) == \
+        table_to_serializable(create_table(grammar))
+    # Table file newer than the grammar is not overwritten.
+    with open(table_file) as f:
+        assert f.read() == stale_table
+
+    # Table file older than the grammar is recalculated.
+    os.utime(variable_file, None)
+    os.utime(table_file, (0, 0))
+    create_load_table(grammar)
+    with open(table_file) as f:
+        assert json.load(f)['key'] == key
+
+    # Table file saved without the key is not used.
+    save_table(table_file, create_table(grammar), binary=True)
+    with pytest.raises(ValueError):
+        load_table(table_file, grammar, key)
+    assert create_load_table(grammar)
+
+    # With `force_load` the key is not checked.
+    with open(table_file, 'w') as f:
+        f.write(stale_table)
+    assert create_load_table(grammar, force_load=True)
+    with open(table_file) as f:
+        assert f.read() == stale_table
+
+
+def test_table_file_options(grammar_file):
+    """
+    Test that parsers with different table options don't overwrite the table
+    file of each other.
+    """
+    table_file = os.path.splitext(grammar_file)[0] + '.pgt'
+    grammar = Grammar.from_file(grammar_file)
+    GLRParser(grammar)
+    with open(table_file) as f:
+        glr_table = f.read()
+    assert json.loads(glr_table)['key'] == \
+        get_table_key(grammar, prefer_shifts_over_empty=False,
+                      lexical_disambiguation=False)
+
+    input_str = 'a = 5   1 + 2 * a - 7'
+    assert Parser(grammar).parse(input_str) == 1 + 2 * 5 - 7
+    with open(table_file) as f:
+        assert f.read() == glr_table
+
+    # Both tables are taken from the cache.
+    assert len(os.listdir(get_cache_dir())) == 2
+    assert Parser(grammar).parse(input_str) == 1 + 2 * 5 - 7
+
+
+def test_table_cache(grammar_file, monkeypatch):
+    """
+    Test that the table is calculated only once if it can't be persisted next
+    to the grammar file.
+    """
+    grammar = Grammar.from_file(grammar_file)
+    table_file = os.path.splitext(grammar_file)[0] + '.pgt'
+    table = create_load_table(grammar)
+    assert os.path.exists(table_file)
+    cache_files = os.listdir(get_cache_dir())
+    assert len(cache_files) == 1
+    assert cache_files[0].endswith('.pgt')
+
+    # Table file is not used but the cached table is.
+    os.remove(table_file)
+    calls = []
+    key = get_table_key(grammar)
+    cached_table = get_cached_table(key, grammar,
+                                    lambda: calls.append(1))
+    assert not calls
+    assert table_to_serializable(cached_table) == \
+        table_to_serializable(table)
+
+    input_str = 'a = 5   1 + 2 * a - 7'
+    assert Parser(grammar).parse(input_str) == 1 + 2 * 5 - 7
+
+    # Cache can be disabled.
+    monkeypatch.setenv('PARGLARE_CACHE_DIR', '')
+    assert get_cache_dir() is None
+    assert get_cached_table(key, grammar, lambda: 42) == 42
+
+
+def test_table_cache_grammar_from_string(tmp_path, monkeypatch):
+    """
+    Test that the tables of the grammars not loaded from file are cached.
+    """
+    monkeypatch.setenv('PARGLARE_CACHE_DIR', str(tmp_path))
+    grammar_str = r'''
+    E: E '+' E {left} | number;
+    terminals
+    number: /\d+/;
+    '''
+    parser = Parser(Grammar.from_string(grammar_str))
+    assert len(os.listdir(str(tmp_path))) == 1
+
+    def create_table(*args, **kwargs):
+        assert False, 'Table should be loaded from the cache.'
+    monkeypatch.setattr('parglare.tables.create_table', create_table)
+
+    cached_parser = Parser(Grammar.from_string(grammar_str))
+    assert table_to_serializable(cached_parser.table) == \
+        table_to_serializable(parser.table)
+    assert cached_parser.parse('1 + 2 + 3')
+
+    # Different options use different table.
+    with pytest.raises(AssertionError):
+        Parser(Grammar.from_string(grammar_str), prefer_shifts=False)
+
+
+def test_table_cache_lr1_tables(grammar_file, monkeypatch):
+    """
+    Test that LR(1) tables are persisted and cached as LALR tables.
+    """
+    from parglare import CANONICAL_LR, MINIMAL_LR
+    table_file = os.path.splitext(grammar_file)[0] + '.pgt'
+    tables = {}
+    for tables_type in [CANONICAL_LR, MINIMAL_LR]:
+        tables[tables_type] = Parser(Grammar.from_file(grammar_file),
+                                     tables=tables_type).table
+        assert os.path.exists(table_file)
+        os.remove(table_file)
+
+    def create_table(*args, **kwargs):
+        assert False, 'Table should be loaded from the cache.'
+    monkeypatch.setattr('parglare.tables.create_table', create_table)
+
+    for tables_type, table in tables.items():
+        cached_table = Parser(Grammar.from_file(grammar_file),
+                              tables=tables_type).table
+        assert table_to_serializable(cached_table) == \
+            table_to_serializable(table)
+    assert len(tables[CANONICAL_LR].states) \
+        > len(tables[MINIMAL_LR].states)
+
+
+def test_table_cache_lock(grammar_file):
+    """
+    Test that the table is not created while the lock is held by another
+    builder and that a stale lock is removed.
+    """
+    grammar = Grammar.from_file(grammar_file)
+    key = table_cache_key(grammar)
+    os.makedirs(get_cache_dir())
+    lock_file = os.path.join(get_cache_dir(), '{}.lock'.format(key))
+    open(lock_file, 'w').close()
+
+    def other_builder():
+        time.sleep(0.3)
+        save_cached_table(key, create_table(grammar))
+        os.remove(lock_file)
+
+    thread = threading.Thread(target=other_builder)
+    thread.start()
+    calls = []
+    table = get_cached_table(key, grammar, lambda: calls.append(1))
+    thread.join()
+    assert not calls
+    assert table.states
+
+    # Stale lock.
+    key = table_cache_key(grammar, prefer_shifts=True)
+    lock_file = os.path.join(get_cache_dir(), '{}.lock'.format(key))
+    open(lock_file, 'w').close()
+    os.utime(lock_file, (0, 0))
+    table = get_cached_table(
+        key, grammar,
+        lambda: calls.append(1) or create_table(grammar, prefer_shifts=True))
+    assert calls
+    assert not os.path.exists(lock_file)
+
+
+def test_table_cache_lock_refresh(grammar_file, monkeypatch):
+    """
+    Test that the lock is kept fresh while the table is created and that the
+    lock taken over by another process is not removed.
+    """
+    from parglare.tables import cache
+    monkeypatch.setattr(cache, 'LOCK_TIMEOUT', 0.4)
+    grammar = Grammar.from_file(grammar_file)
+    key = table_cache_key(grammar)
+    lock_file = os.path.join(get_cache_dir(), '{}.lock'.format(key))
+
+    def create():
+        # Build taking longer than the lock timeout.
+        time.sleep(1)
+        assert time.time() - os.path.getmtime(lock_file) < 0.4
+        with open(lock_file, 'w') as f:
+            f.write('other')
+        return create_table(grammar)
+
+    get_cached_table(key, grammar, create)
+    with open(lock_file) as f:
+        assert f.read() == 'other'
+
+
+def test_layout_table(tmp_path, monkeypatch):
+    """
+    Test that the table of the layout parser is persisted in a separate table
+    file and in the cache.
+    """
+    monkeypatch.setenv('PARGLARE_CACHE_DIR', str(tmp_path / 'cache'))
+    grammar_file = str(tmp_path / 'grammar.pg')
+    with open(grammar_file, 'w') as f:
+        f.write(r'''
+        S: 'a'+;
+        LAYOUT: LayoutItem*;
+        LayoutItem: WS | Comment;
+        Comment: '/*' CommentContent* '*/';
+        CommentContent: Comment | NotComment | WS;
+        terminals
+        WS: /\s+/;
+        NotComment: /((\*[^\/])|[^\s*\/]|\/[^\*])+/;
+        ''')
+    input_str = 'a /* comment /* nested */ */ a\n a'
+    parser = Parser(Grammar.from_file(grammar_file))
+    assert parser.parse(input_str) == ['a', 'a', 'a']
+    layout_table_file = str(tmp_path / 'grammar.LAYOUT.pgt')
+    assert os.path.exists(str(tmp_path / 'grammar.pgt'))
+    assert os.path.exists(layout_table_file)
+    assert len(os.listdir(get_cache_dir())) == 2
+
+    def create_table(*args, **kwargs):
+        assert False, 'Table should be loaded.'
+    monkeypatch.setattr('parglare.tables.create_table', create_table)
+
+    loaded_parser = Parser(Grammar.from_file(grammar_file))
+    assert table_to_serializable(loaded_parser.layout_parser.table) == \
+        table_to_serializable(parser.layout_parser.table)
+    assert loaded_parser.parse(input_str) == ['a', 'a', 'a']
+
+    # Layout table file is not used if older than the grammar. The table is
+    # loaded from the cache.
+    os.utime(layout_table_file, (0, 0))
+    loaded_parser = Parser(Grammar.from_file(grammar_file))
+    assert os.path.getmtime(layout_table_file) > 0
+    assert loaded_parser.parse(input_str) == ['a', 'a', 'a']
+
+    # Missing layout table file is recreated with `force_load_table`.
+    os.remove(layout_table_file)
+    loaded_parser = Parser(Grammar.from_file(grammar_file),
+                           force_load_table=True)
+    assert os.path.exists(layout_table_file)
+    assert loaded_parser.parse(input_str) == ['a', 'a', 'a']
+
+
+def test_table_cache_prune(grammar_file, monkeypatch):
+    """
+    Test that the tables not used for a long time and the least recently used
+    tables over the size limit are removed from the cache.
+    """
+    from parglare.tables import cache
+    grammar = Grammar.from_file(grammar_file)
+    table = create_table(grammar)
+    keys = [table_cache_key(grammar, prefer_shifts=i) for i in range(4)]
+    for key in keys[:3]:
+        save_cached_table(key, table)
+    table_size = os.path.getsize(cache._table_file(get_cache_dir(), keys[0]))
+
+    def cached_keys():
+        return {k for k in keys
+                if os.path.exists(cache._table_file(get_cache_dir(), k))}
+
+    # Table not used for a long time.
+    os.utime(cache._table_file(get_cache_dir(), keys[0]), (0, 0))
+    save_cached_table(keys[0], table)
+    assert cached_keys() == set(keys[:3])
+    os.utime(cache._table_file(get_cache_dir(), keys[0]), (0, 0))
+    cache.prune_cache()
+    assert cached_keys() == set(keys[1:3])
+
+    # Loaded table is recently used.
+    now = time.time()
+    os.utime(cache._table_file(get_cache_dir(), keys[1]), (now - 10,) * 2)
+    os.utime(cache._table_file(get_cache_dir(), keys[2]), (now - 5,) * 2)
+    assert cache.load_cached_table(keys[1], grammar)
+
+    # Least recently used table over the size limit.
+    monkeypatch.setattr(cache, 'CACHE_MAX_SIZE', 2 * table_size)
+    save_cached_table(keys[3], table)
+    assert cached_keys() == {keys[1], keys[3]}
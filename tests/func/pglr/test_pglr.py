@@ -34,3 +34,39 @@ def test_pglr_viz():
     assert result == 0
     assert os.path.exists(DOT_FILE)
     assert 'digraph grammar' in open(DOT_FILE, 'r').read()
+
+
+def test_pglr_compile_layout(tmp_path, monkeypatch):
+    """
+    Test that the table of the layout parser is also compiled and loaded by
+    the parser.
+    """
+    from click.testing import CliRunner
+    from parglare import Grammar, Parser
+    from parglare.cli import pglr
+    from parglare.tables.persist import is_binary_table
+    import parglare.tables
+    grammar_file = str(tmp_path / 'grammar.pg')
+    with open(grammar_file, 'w') as f:
+        f.write(r'''
+        S: ID+;
+        LAYOUT: LayoutItem*;
+        LayoutItem: WS | COMMENT;
+        terminals
+        ID: /\w+/;
+        WS: /\s+/;
+        COMMENT: /\/\/.*/;
+        ''')
+    # Parameters of the table must be the same as the parser uses.
+    result = CliRunner().invoke(pglr, ['--no-colors', '--prefer-shifts',
+                                       '--prefer-shifts-over-empty',
+                                       'compile', '--binary', grammar_file])
+    assert result.exit_code == 0
+    assert is_binary_table(str(tmp_path / 'grammar.pgt'))
+    assert is_binary_table(str(tmp_path / 'grammar.LAYOUT.pgt'))
+
+    def create_table(*args, **kwargs):
+        raise AssertionError('Table should be loaded from the file.')
+    monkeypatch.setattr(parglare.tables, 'create_table', create_table)
+    parser = Parser(Grammar.from_file(grammar_file))
+    assert parser.parse('a b // comment\n c') == ['a', 'b', 'c']
@@ -6,3 +6,15 @@ python test_speed_lr.py >> reports/${1}_speed_report_lr.txt
 
 python --version > reports/${1}_speed_report_glr.txt 2>&1
 python test_speed_glr.py >> reports/${1}_speed_report_glr.txt
+
+python --version > reports/${1}_speed_report_table_load.txt 2>&1
+python test_speed_table_load.py >> reports/${1}_speed_report_table_load.txt
+
+python --version > reports/${1}_speed_report_snapshot.txt 2>&1
+python test_speed_snapshot.py >> reports/${1}_speed_report_snapshot.txt
+
+python --version > reports/${1}_speed_report_import.txt 2>&1
+python test_speed_import.py >> reports/${1}_speed_report_import.txt
+
+python --version > reports/${1}_speed_report_compressed_table.txt 2>&1
+python test_speed_compressed_table.py >> reports/${1}_speed_report_compressed_table.txt
@@ -28,7 +28,12 @@ def timeit(parser_class, file_name, message, **kwargs):
 
     print('Elapsed time: {:.2f}'.format(t_end - t_start), 'sec')
     print('Speed = {:.2f}'.format(file_size/1000/(t_end - t_start)),
-          'KB/sec\n')
+          'KB/sec')
+    heads = getattr(parser, 'active_heads_per_level', None)
+    if heads:
+        print('Active heads: max = {}, avg = {:.2f}'.format(
+            max(heads), sum(heads)/len(heads)))
+    print()
 
 
 def run_tests(parser_class, **kwargs):
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#######################################################################
+# Testing the compressed LR table encoding against the binary table with
+# OrderedDict states: file size, load time, memory of the loaded table,
+# actions/gotos lookup speed and parsing speed.
+#######################################################################
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from os.path import dirname, join
+from parglare import Grammar, GLRParser
+from parglare.tables import create_table
+from parglare.tables.persist import save_table, load_table
+from test_speed_table_load import large_grammar
+
+
+def decode(table):
+    """
+    Decodes all states of the lazily loaded binary table.
+    """
+    for state in table.states:
+        state.actions, state.gotos
+    return table
+
+
+def load(file_name, grammar):
+    """
+    Returns the loaded table, load time and the size of memory allocated for
+    the table.
+    """
+    gc.collect()
+    tracemalloc.start()
+    t_start = time.time()
+    table = decode(load_table(file_name, grammar))
+    elapsed = time.time() - t_start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return table, elapsed, memory
+
+
+def lookup_time(table, repeat=3):
+    """
+    Returns the time of looking up all actions and gotos of the table.
+    """
+    keys = [(state.actions, state.gotos, list(state.actions),
+             list(state.gotos)) for state in table.states]
+    elapsed = []
+    for i in range(repeat):
+        t_start = time.time()
+        for actions, gotos, terminals, nonterminals in keys:
+            for terminal in terminals:
+                actions.get(terminal)
+            for nonterminal in nonterminals:
+                gotos[nonterminal]
+        elapsed.append(time.time() - t_start)
+    return min(elapsed), sum(len(k[2]) + len(k[3]) for k in keys)
+
+
+def parse_time(grammar, table, input_str, repeat=3):
+    parser = GLRParser(grammar, table=table)
+    elapsed = []
+    for i in range(repeat):
+        t_start = time.time()
+        parser.parse(input_str)
+        elapsed.append(time.time() - t_start)
+    return min(elapsed)
+
+
+def timeit(grammar, message, input_str=None):
+    print(message)
+    table = create_table(grammar, prefer_shifts=True)
+    print('States: {}'.format(len(table.states)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, options in [('Binary', {'binary': True}),
+                              ('Compressed', {'compressed': True})]:
+            file_name = join(tmp_dir, 'table.pgt')
+            save_table(file_name, table, **options)
+            loaded_table, elapsed, memory = load(file_name, grammar)
+            print('{} table: size = {:.2f} KB, load time = {:.4f} sec, '
+                  'memory = {:.2f} KB'.format(
+                      name, os.path.getsize(file_name) / 1000, elapsed,
+                      memory / 1000))
+            elapsed, lookups = lookup_time(loaded_table)
+            print('    {} lookups: {:.4f} sec, {:.0f} ns/lookup'.format(
+                lookups, elapsed, elapsed / lookups * 1e9))
+            if input_str is not None:
+                print('    Parse time: {:.4f} sec'.format(
+                    parse_time(grammar, loaded_table, input_str)))
+    print()
+
+
+if __name__ == '__main__':
+    timeit(Grammar.from_file(join(dirname(__file__), 'rhapsody.pg')),
+           'Rhapsody grammar.')
+    input_str = ' '.join('k{0} (a +{1} b * 2 +{1} c) ; k{0} x +{2} y ;'
+                         .format(i % 200, (i + 1) % 10, i % 10)
+                         for i in range(500))
+    timeit(large_grammar(200), 'Large generated grammar.',
+           input_str=input_str)
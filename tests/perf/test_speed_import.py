@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#######################################################################
+# Testing `import parglare` time using `python -X importtime`.
+# Each import is measured in a new process. Bytecode is cached in a
+# temporary directory so that compilation is not measured.
+#######################################################################
+import os
+import subprocess
+import sys
+import tempfile
+
+MODULES = ['parglare', 'parglare.cli']
+
+
+def import_times(module, pycache_prefix):
+    """
+    Returns a dict of the cumulative import times in microseconds keyed by
+    the module name.
+    """
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_prefix)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        env=env, stderr=subprocess.PIPE, check=True,
+        universal_newlines=True).stderr
+    times = {}
+    for line in output.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def timeit(module, pycache_prefix, repeat=5):
+    print('import {}'.format(module))
+    # Warm up bytecode cache.
+    import_times(module, pycache_prefix)
+    runs = [import_times(module, pycache_prefix) for i in range(repeat)]
+    times = {name: min(run.get(name, 0) for run in runs) for name in runs[0]}
+    print('Total: {:.2f} ms'.format(times[module] / 1000))
+    print('Loaded modules: {}'.format(len(times)))
+    for name in ['click', 'logging', 'tempfile', 'hashlib']:
+        print('{} imported: {}'.format(name, name in times))
+    print('Slowest parglare modules (cumulative):')
+    for name, time in sorted(((n, t) for n, t in times.items()
+                              if n.startswith('parglare')),
+                             key=lambda x: -x[1])[:5]:
+        print('    {:30} {:.2f} ms'.format(name, time / 1000))
+    print()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        for module in MODULES:
+            timeit(module, pycache_prefix)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#######################################################################
+# Testing parser startup time from the grammar file and the table file
+# vs startup from the grammar snapshot.
+# Each startup is measured in a new process. GLR parser is used as the
+# generated grammar has conflicts.
+#######################################################################
+import subprocess
+import sys
+import tempfile
+from os.path import dirname, join
+from parglare import Grammar
+from parglare.tables import create_table
+from parglare.tables.persist import save_table
+from parglare.snapshot import save_snapshot
+from test_speed_table_load import large_grammar_str
+
+# Time of parglare import is not included.
+FROM_FILE = '''
+import time
+from parglare import Grammar, GLRParser
+from parglare.tables.persist import load_table
+t_start = time.time()
+grammar = Grammar.from_file({grammar_file!r})
+GLRParser(grammar, table=load_table({table_file!r}, grammar))
+print(time.time() - t_start)
+'''
+
+FROM_SNAPSHOT = '''
+import time
+from parglare import GLRParser
+from parglare.snapshot import load_snapshot
+t_start = time.time()
+grammar, table = load_snapshot({snapshot_file!r})
+GLRParser(grammar, table=table)
+print(time.time() - t_start)
+'''
+
+
+def startup_time(code, repeat):
+    return min(float(subprocess.check_output([sys.executable, '-c', code]))
+               for i in range(repeat))
+
+
+def timeit(grammar_file, message, repeat=5):
+    print(message)
+    grammar = Grammar.from_file(grammar_file)
+    table = create_table(grammar, prefer_shifts=True)
+    print('States: {}'.format(len(table.states)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = {'grammar_file': grammar_file,
+                 'table_file': join(tmp_dir, 'table.pgt'),
+                 'snapshot_file': join(tmp_dir, 'grammar.pgs')}
+        save_table(files['table_file'], table, binary=True)
+        save_snapshot(files['snapshot_file'], grammar, table)
+        print('Grammar file and binary table: {:.4f} sec'.format(
+            startup_time(FROM_FILE.format(**files), repeat)))
+        print('Snapshot: {:.4f} sec'.format(
+            startup_time(FROM_SNAPSHOT.format(**files), repeat)))
+    print()
+
+
+if __name__ == '__main__':
+    timeit(join(dirname(__file__), 'rhapsody.pg'), 'Rhapsody grammar.')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        grammar_file = join(tmp_dir, 'large.pg')
+        with open(grammar_file, 'w') as f:
+            f.write(large_grammar_str(200))
+        timeit(grammar_file, 'Large generated grammar.')
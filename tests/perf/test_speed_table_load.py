@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#######################################################################
+# Testing LR table loading speed for JSON and binary table files and the
+# time to the first parse with the loaded table. States are decoded lazily
+# so the first parse decodes only the visited states.
+#######################################################################
+import os
+import tempfile
+import time
+from os.path import dirname, join
+from parglare import Grammar, GLRParser
+from parglare.tables import create_table
+from parglare.tables.persist import save_table, load_table
+
+
+def large_grammar(size):
+    return Grammar.from_string(large_grammar_str(size))
+
+
+def large_grammar_str(size):
+    """
+    Generates a grammar with a large number of states.
+    """
+    rules = ['S: stmt+;',
+             'stmt: {};'.format(' | '.join('s{}'.format(i)
+                                           for i in range(size)))]
+    for i in range(size):
+        rules.append('s{0}: "k{0}" e{1} ";" | "k{0}" "(" e{2} ")" ";";'
+                     .format(i, i % 10, (i + 1) % 10))
+    for i in range(10):
+        rules.append('e{0}: e{0} "+{0}" t | t;'.format(i))
+    rules.append('t: t "*" f | f; f: "(" e0 ")" | ID | NUM;')
+    rules.append('terminals\nID: /[a-z]+/; NUM: /\\d+/;')
+    return '\n'.join(rules)
+
+
+def timeit(grammar, message, input_str=None, repeat=3):
+    print(message)
+    table = create_table(grammar, prefer_shifts=True)
+    print('States: {}'.format(len(table.states)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for binary in [False, True]:
+            file_name = join(tmp_dir, 'table.pgt')
+            save_table(file_name, table, binary=binary)
+            elapsed = []
+            first_parse = []
+            for i in range(repeat):
+                t_start = time.time()
+                loaded_table = load_table(file_name, grammar)
+                elapsed.append(time.time() - t_start)
+                if input_str is not None:
+                    GLRParser(grammar, table=loaded_table).parse(input_str)
+                    first_parse.append(time.time() - t_start)
+            print('{} table: size = {:.2f} KB, load time = {:.4f} sec'.format(
+                'Binary' if binary else 'JSON',
+                os.path.getsize(file_name) / 1000, min(elapsed)))
+            if first_parse:
+                print('    Time to first parse = {:.4f} sec, decoded states = '
+                      '{}'.format(min(first_parse),
+                                  sum(1 for state in loaded_table.states
+                                      if state.decode is None)))
+    print()
+
+
+if __name__ == '__main__':
+    timeit(Grammar.from_file(join(dirname(__file__), 'rhapsody.pg')),
+           'Rhapsody grammar.')
+    timeit(large_grammar(200), 'Large generated grammar.',
+           input_str='k1 (a +2 b * 2) ; k7 x ;')